@@ -0,0 +1,186 @@
+"""
+Conversion engine micro-benchmarks.
+
+    python -m benchmarks.bench_convert -o bench.json
+    python -m benchmarks.bench_convert --full -o bench.json           # up to 50 MB
+    python -m benchmarks.bench_convert --compare baseline.json        # exit 1 on regression
+    python -m benchmarks.bench_convert -k 'dollars|escaped' --sizes 16k,1m --max-growth 1.3
+
+Every case runs on generated corpora (see corpus.py) and reports the best
+and median of several runs. Results are written as JSON keyed by
+"case/corpus/size", so two runs from different commits can be compared.
+The "dollars" and "escaped" corpora are adversarial inputs for the math
+tokenizer; --max-growth checks that time grows (near) linearly with size.
+"""
+import argparse
+import json
+import math
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import frontmatter
+import mistune
+
+from latexrender.convert import convert_markdown
+from latexrender.renderer import get_markdown_parser
+from latexrender.utils import escape_latex
+
+from .corpus import format_size, generate, parse_size
+
+SCHEMA_VERSION = 1
+DEFAULT_SIZES = ["10k", "1m"]
+FULL_SIZES = ["10k", "100k", "1m", "10m", "50m"]
+
+
+def _body(text: str) -> str:
+    return frontmatter.loads(text).content
+
+
+# case -> (corpora it runs on, setup(document) -> zero-argument callable)
+CASES: Dict[str, tuple] = {
+    "escape_latex": (["mixed", "cjk"], lambda doc: (lambda body=_body(doc): escape_latex(body))),
+    "parse": (["inline", "display", "math", "table", "lists", "cjk", "mixed", "dollars", "escaped"],
+              lambda doc: (lambda body=_body(doc): get_markdown_parser()(body))),
+    "frontmatter": (["mixed"], lambda doc: (lambda: frontmatter.loads(doc))),
+    "convert_markdown": (["mixed"], lambda doc: (lambda: convert_markdown(doc))),
+}
+
+
+def time_call(fn: Callable[[], object], repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                             text=True, cwd=Path(__file__).parent, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(sizes: List[int], repeat: int = 5, pattern: Optional[str] = None, seed: int = 0,
+        log=print) -> dict:
+    """Runs all selected cases and returns the JSON-serializable report."""
+    selected = re.compile(pattern) if pattern else None
+    results = []
+    for size in sizes:
+        # Large inputs take seconds per run, so they are measured fewer times
+        runs = max(1, repeat if size <= (1 << 20) else repeat // 3)
+        for case, (corpora, setup) in CASES.items():
+            for kind in corpora:
+                key = f"{case}/{kind}/{format_size(size)}"
+                if selected and not selected.search(key):
+                    continue
+                doc = generate(kind, size, seed)
+                fn = setup(doc)
+                if size <= (1 << 20):
+                    fn()  # warm-up
+                times = time_call(fn, runs)
+                nbytes = len(doc.encode("utf-8"))
+                best = min(times)
+                results.append({
+                    "key": key, "case": case, "corpus": kind, "size": size, "bytes": nbytes,
+                    "repeat": runs, "min": best, "median": statistics.median(times),
+                    "mb_per_s": nbytes / (1 << 20) / best if best else None,
+                })
+                log(f"{key:<32} {best * 1000:10.2f} ms  {results[-1]['mb_per_s']:8.2f} MB/s")
+    return {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "mistune": getattr(mistune, "__version__", None),
+            "platform": platform.platform(),
+            "seed": seed,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.15) -> List[dict]:
+    """
+    Compares best times per key. A case regresses when it is more than
+    `threshold` (fraction) slower than the baseline.
+    """
+    base = {r["key"]: r for r in baseline.get("results", [])}
+    rows = []
+    for r in current["results"]:
+        old = base.get(r["key"])
+        if not old or not old["min"]:
+            continue
+        ratio = r["min"] / old["min"]
+        rows.append({"key": r["key"], "baseline": old["min"], "current": r["min"],
+                     "ratio": ratio, "regression": ratio > 1 + threshold})
+    return rows
+
+
+def growth(report: dict) -> Dict[str, float]:
+    """
+    Exponent k in time ~ size**k per "case/corpus", between the smallest and
+    largest size measured: about 1 for linear work, 2 for quadratic.
+    """
+    by_key: Dict[str, List[dict]] = {}
+    for r in report["results"]:
+        by_key.setdefault(f"{r['case']}/{r['corpus']}", []).append(r)
+    exponents = {}
+    for key, rows in by_key.items():
+        small, large = min(rows, key=lambda r: r["bytes"]), max(rows, key=lambda r: r["bytes"])
+        if large["bytes"] > small["bytes"] and small["min"] and large["min"]:
+            exponents[key] = math.log(large["min"] / small["min"]) / math.log(large["bytes"] / small["bytes"])
+    return exponents
+
+
+def print_comparison(rows: List[dict]):
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['key']:<32} {row['baseline'] * 1000:10.2f} -> {row['current'] * 1000:10.2f} ms"
+              f"  x{row['ratio']:.2f}{flag}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the Markdown -> LaTeX conversion engine")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES), help="Comma-separated corpus sizes, e.g. 10k,1m")
+    parser.add_argument("--full", action="store_true", help=f"Use all sizes ({','.join(FULL_SIZES)})")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case (fewer for inputs over 1 MB)")
+    parser.add_argument("-k", "--filter", help="Only run cases whose case/corpus/size key matches this regex")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown before a case is a regression")
+    parser.add_argument("--max-growth", type=float,
+                        help="Exit 1 if time grows faster than size**N between the smallest and largest size")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in (FULL_SIZES if args.full else args.sizes.split(","))]
+    report = run(sizes, repeat=args.repeat, pattern=args.filter, seed=args.seed)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    exponents = growth(report)
+    for key, k in exponents.items():
+        print(f"{key:<32} time ~ size^{k:.2f}")
+    if args.max_growth and any(k > args.max_growth for k in exponents.values()):
+        sys.exit(1)
+
+    if args.compare:
+        rows = compare(report, json.loads(Path(args.compare).read_text(encoding="utf-8")), args.threshold)
+        print_comparison(rows)
+        if any(r["regression"] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Deterministic synthetic Markdown corpora for the conversion benchmarks.
+
+Each generator produces paragraphs of one flavour until the requested size
+is reached, so the same (kind, size, seed) always yields the same document.
+"""
+import random
+
+WORDS = ("matrix vector eigenvalue integral limit series function domain proof lemma "
+         "theorem convergence derivative continuity space basis kernel image rank").split()
+SPECIALS = ["50%", "a_b", "R&D", "#1", "{x}", "~", "^", "C:\\tmp", "$5"]
+CJK = "微积分线性代数概率论数学分析函数极限导数积分矩阵向量特征值收敛连续空间定理证明引理"
+GREEK = ["\\alpha", "\\beta", "\\gamma", "\\lambda", "\\mu", "\\sigma", "\\theta", "\\omega"]
+
+
+def _sentence(rng: random.Random, n: int = 12) -> str:
+    words = [rng.choice(WORDS) for _ in range(n)]
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), rng.choice(SPECIALS))
+    return " ".join(words).capitalize() + "."
+
+
+def _formula(rng: random.Random) -> str:
+    a, b = rng.sample(GREEK, 2)
+    return rng.choice([
+        f"\\int_0^{{{rng.randint(1, 9)}}} {a} x^{rng.randint(2, 5)} \\, dx",
+        f"\\sum_{{n=1}}^{{\\infty}} \\frac{{{a}^n}}{{n!}}",
+        f"{a}_{{i j}} = {b}^{{-1}} \\cdot \\lim_{{t \\to 0}} \\frac{{f(t)}}{{t}}",
+        f"\\det(A - {a} I) = 0",
+    ])
+
+
+def math_block(rng: random.Random) -> str:
+    inline = " ".join(f"{_sentence(rng, 6)} ${_formula(rng)}$" for _ in range(3))
+    return f"{inline}\n\n$$\n{_formula(rng)}\n$$\n\n"
+
+
+def inline_math_block(rng: random.Random) -> str:
+    return " ".join(f"{_sentence(rng, 5)} ${_formula(rng)}$" for _ in range(4)) + "\n\n"
+
+
+def display_math_block(rng: random.Random) -> str:
+    return f"$$\n{_formula(rng)} \\\\\n{_formula(rng)}\n$$\n\n"
+
+
+def table_block(rng: random.Random) -> str:
+    cols = rng.randint(3, 6)
+    header = "| " + " | ".join(rng.choice(WORDS).title() for _ in range(cols)) + " |"
+    align = "|" + "|".join(rng.choice([" --- ", ":---:", " ---:"]) for _ in range(cols)) + "|"
+    rows = ["| " + " | ".join(rng.choice([rng.choice(WORDS), f"${rng.randint(0, 99)}$",
+                                          rng.choice(SPECIALS)]) for _ in range(cols)) + " |"
+            for _ in range(rng.randint(4, 12))]
+    return "\n".join([header, align] + rows) + "\n\n"
+
+
+def cjk_block(rng: random.Random) -> str:
+    text = "".join(rng.choice(CJK) for _ in range(rng.randint(60, 160)))
+    return f"{text}，其中 ${_formula(rng)}$。\n\n"
+
+
+def list_block(rng: random.Random) -> str:
+    lines = []
+    for _ in range(rng.randint(3, 6)):
+        depth = rng.randint(0, 3)
+        marker = "1." if rng.random() < 0.4 else "-"
+        lines.append("    " * depth + f"{marker} {_sentence(rng, 6)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def prose_block(rng: random.Random) -> str:
+    heading = f"## {rng.choice(WORDS).title()}\n\n" if rng.random() < 0.2 else ""
+    return heading + " ".join(_sentence(rng) for _ in range(4)) + "\n\n"
+
+
+# Adversarial inputs for the math tokenizer: one long paragraph (no blank lines),
+# so the inline scanner sees the whole document as a single text
+
+
+def dollars_block(rng: random.Random) -> str:
+    # Prices and shell variables: many "$" that mostly pair up by accident
+    return rng.choice([f"Costs ${rng.randint(1, 999)}.{rng.randint(0, 99):02d} ", "echo $HOME ",
+                       f"{rng.choice(WORDS)} $$ ", f"${rng.choice(WORDS)} ", "\\$ "])
+
+
+def escaped_block(rng: random.Random) -> str:
+    # Escaped dollars inside math and openers that never close
+    return rng.choice([f"${rng.choice(WORDS)} \\$ {rng.randint(0, 9)}$ ", "\\$\\$ ", "$$\\$ ",
+                       f"{rng.choice(WORDS)} "])
+
+
+KINDS = {
+    "inline": [inline_math_block],
+    "display": [display_math_block],
+    "math": [math_block],
+    "table": [table_block],
+    "cjk": [cjk_block],
+    "lists": [list_block],
+    "mixed": [prose_block, math_block, table_block, cjk_block, list_block],
+    "dollars": [dollars_block],
+    "escaped": [escaped_block],
+}
+
+FRONTMATTER = """---
+title: Benchmark Document
+subtitle: Synthetic corpus
+author: MatNoble
+course: 数学分析
+---
+"""
+
+
+def generate(kind: str, size: int, seed: int = 0, frontmatter: bool = True) -> str:
+    """Returns a Markdown document of roughly `size` bytes (UTF-8) of the given kind."""
+    rng = random.Random(f"{kind}:{seed}")
+    blocks = KINDS[kind]
+    parts = [FRONTMATTER if frontmatter else ""]
+    total = len(parts[0].encode("utf-8"))
+    while total < size:
+        block = rng.choice(blocks)(rng)
+        parts.append(block)
+        total += len(block.encode("utf-8"))
+    return "".join(parts)
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10240, '50m' -> 52428800."""
+    text = text.strip().lower()
+    units = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(size: int) -> str:
+    for unit, scale in (("m", 1 << 20), ("k", 1 << 10)):
+        if size >= scale and size % scale == 0:
+            return f"{size // scale}{unit}"
+    return str(size)
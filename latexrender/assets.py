@@ -0,0 +1,151 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import uuid
+from pathlib import Path, PurePosixPath
+from typing import Iterable, List, Optional
+
+# ioctl request for reflink (copy-on-write clone) on Linux filesystems that support it
+FICLONE = 0x40049409
+
+# Tried in this order for image names without an extension
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.pdf', '.svg')
+
+INCLUDEGRAPHICS_RE = re.compile(r"\\includegraphics\s*(?:\[[^\]]*\])?\s*\{([^}]+)\}")
+
+
+def _reflink(src: Path, dest: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as s, open(dest, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        try:
+            dest.unlink()
+        except OSError:
+            pass
+        return False
+
+
+def _symlink(src: Path, dest: Path) -> bool:
+    try:
+        os.symlink(Path(src).resolve(), dest)
+        return True
+    except OSError:
+        return False
+
+
+def link_or_copy(src: Path, dest: Path, symlink: bool = False) -> str:
+    """
+    Places `src` at `dest` as a hardlink, else a reflink, else (with
+    `symlink`, for sources that never change) a symlink, else a plain copy.
+    The file is renamed into place, so concurrent builds never see partial data.
+    Returns the method that was used.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists() and os.path.samefile(src, dest):
+        return "existing"
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        os.link(src, tmp)
+        method = "hardlink"
+    except OSError:
+        if _reflink(src, tmp):
+            method = "reflink"
+        elif symlink and _symlink(src, tmp):
+            # e.g. a build dir on tmpfs: no copy of the stored file per build
+            method = "symlink"
+        else:
+            shutil.copy2(src, tmp)
+            method = "copy"
+    os.replace(tmp, dest)
+    return method
+
+
+def safe_relative(url: str) -> Optional[PurePosixPath]:
+    """Returns a URL as a relative path inside the build dir, or None for remote/absolute/escaping URLs."""
+    if "://" in url or url.startswith(("/", "\\")):
+        return None
+    path = PurePosixPath(url.replace("\\", "/"))
+    if path.is_absolute() or ".." in path.parts or not path.parts:
+        return None
+    return path
+
+
+def template_image_refs(*sources: str) -> List[str]:
+    """Image names used by \\includegraphics in template or class source."""
+    refs = []
+    for text in sources:
+        for name in INCLUDEGRAPHICS_RE.findall(text):
+            if name not in refs:
+                refs.append(name.strip())
+    return refs
+
+
+def resolve_image(resource_dir: Path, name: str, extensions: Iterable[str]) -> Optional[Path]:
+    """Finds an image in resource_dir by file name, trying known extensions if it has none."""
+    candidate = Path(resource_dir) / PurePosixPath(name).name
+    if candidate.is_file():
+        return candidate
+    if not candidate.suffix:
+        for ext in extensions:
+            with_ext = candidate.with_suffix(ext)
+            if with_ext.is_file():
+                return with_ext
+    return None
+
+
+class AssetStore:
+    """
+    Hash-deduplicated store of build resources. Files are stored read-only
+    under their SHA-256 and linked into build directories, so identical
+    images are kept once however many builds or names refer to them.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def _digest(self, src: Path) -> str:
+        st = src.stat()
+        sig = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._digests.get(src)
+        if cached and cached[0] == sig:
+            return cached[1]
+        h = hashlib.sha256()
+        with open(src, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._digests[src] = (sig, digest)
+        return digest
+
+    def add(self, src: Path) -> Path:
+        """Stores a file (if not already present) and returns its path in the store."""
+        src = Path(src).resolve()
+        digest = self._digest(src)
+        stored = self.root / digest[:2] / f"{digest}{src.suffix.lower()}"
+        if not stored.exists():
+            stored.parent.mkdir(parents=True, exist_ok=True)
+            tmp = stored.with_name(f".{stored.name}.{uuid.uuid4().hex[:8]}.tmp")
+            shutil.copy2(src, tmp)
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, stored)
+        return stored
+
+    def materialize(self, src: Path, dest: Path) -> str:
+        dest = Path(dest)
+        # Never replace the source itself, e.g. when building inside the resource dir
+        if dest.exists() and os.path.samefile(src, dest):
+            return "existing"
+        # Stored files are read-only and never rewritten, so a symlink is as good as a link
+        return link_or_copy(self.add(src), dest, symlink=True)
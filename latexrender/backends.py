@@ -0,0 +1,226 @@
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+
+from .assets import link_or_copy
+from .compiler import CompileCancelled, CompileTimeout, run_latexmk
+
+# Spool layout shared by the API and the workers:
+#   pending/<id>/   job.json, output.log, work/   (written by the API, renamed into place)
+#   running/<id>/   claimed by a worker with a rename; heartbeat, cancel
+#   done/<id>/      result.json plus the work dir after the run
+SPOOL_DIRS = ("pending", "running", "done")
+JOB_FILE = "job.json"
+RESULT_FILE = "result.json"
+LOG_FILE = "output.log"
+HEARTBEAT_FILE = "heartbeat"
+CANCEL_FILE = "cancel"
+
+# Read-only inputs that are safe to hardlink into a job; anything TeX may rewrite is copied
+SHARED_SUFFIXES = {".fmt", ".cls", ".png", ".jpg", ".jpeg", ".svg"}
+
+
+class WorkerLost(Exception):
+    """Raised when the worker running a job stops updating its heartbeat."""
+
+
+class CompileBackend:
+    """
+    Runs a TeX command in a prepared work dir and leaves its outputs there.
+    Same contract as run_latexmk: lines go to `on_line` as they arrive,
+    CompileTimeout / CompileCancelled are raised after the run is killed.
+    """
+
+    name = "base"
+
+    def run(self, cmd: List[str], work_dir: Path, timeout: Optional[float] = None,
+            on_line: Optional[Callable[[str], None]] = None,
+            cancel: Optional[threading.Event] = None) -> subprocess.CompletedProcess:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class LocalBackend(CompileBackend):
+    """Runs TeX as a subprocess of this process."""
+
+    name = "local"
+
+    def run(self, cmd, work_dir, timeout=None, on_line=None, cancel=None):
+        return run_latexmk(cmd, cwd=work_dir, timeout=timeout, on_line=on_line, cancel=cancel)
+
+
+def init_spool(spool_dir: Path) -> Path:
+    spool_dir = Path(spool_dir)
+    for name in SPOOL_DIRS:
+        (spool_dir / name).mkdir(parents=True, exist_ok=True)
+    return spool_dir
+
+
+def snapshot(work_dir: Path) -> Dict[str, tuple]:
+    """Relative path -> (size, mtime_ns) of every file under `work_dir`."""
+    files = {}
+    for path in work_dir.rglob("*"):
+        if path.is_file():
+            st = path.stat()
+            files[path.relative_to(work_dir).as_posix()] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def _copy_tree(src: Path, dest: Path):
+    for rel in snapshot(src):
+        target = dest / rel
+        if Path(rel).suffix.lower() in SHARED_SUFFIXES:
+            link_or_copy(src / rel, target)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(src / rel, target)
+
+
+class SpoolBackend(CompileBackend):
+    """
+    Hands compiles to stateless worker processes (see worker.py) through a
+    spool directory on storage shared with them. The work dir is copied into
+    a job, a worker claims it by renaming it to running/, streams the TeX
+    output into the job's log and moves the finished job to done/, from
+    where the files the run created or changed are moved back.
+    """
+
+    name = "spool"
+
+    def __init__(self, spool_dir: Path, poll: float = 0.05, lease: float = 30.0):
+        self.spool_dir = init_spool(spool_dir)
+        self.poll = poll
+        # A running job whose heartbeat is older than this is considered lost
+        self.lease = lease
+
+    def _path(self, state: str, job_id: str) -> Path:
+        return self.spool_dir / state / job_id
+
+    def submit(self, cmd: List[str], work_dir: Path, timeout: Optional[float] = None) -> Tuple[str, TextIO]:
+        """Queues a job; returns its id and an open handle on its log."""
+        job_id = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:12]}"
+        staging = self.spool_dir / "pending" / f".{job_id}.tmp"
+        _copy_tree(Path(work_dir), staging / "work")
+        (staging / LOG_FILE).touch()
+        (staging / JOB_FILE).write_text(json.dumps({"id": job_id, "cmd": cmd, "timeout": timeout}),
+                                        encoding="utf-8")
+        # Opened before any worker can see the job; the inode follows it through the renames
+        log = open(staging / LOG_FILE, encoding="utf-8", errors="replace")
+        # Workers only look at complete jobs
+        os.rename(staging, self._path("pending", job_id))
+        return job_id, log
+
+    def run(self, cmd, work_dir, timeout=None, on_line=None, cancel=None):
+        work_dir = Path(work_dir)
+        job_id, log = self.submit(cmd, work_dir, timeout)
+        lines = []
+        partial = ""
+        # The time budget includes waiting for a free worker
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            while True:
+                chunk = log.read()
+                if chunk:
+                    partial += chunk
+                    *complete, partial = partial.split("\n")
+                    for line in complete:
+                        lines.append(line + "\n")
+                        if on_line:
+                            on_line(line)
+                done = self._path("done", job_id)
+                if (done / RESULT_FILE).exists():
+                    break
+                if cancel is not None and cancel.is_set():
+                    self._withdraw(job_id)
+                    raise CompileCancelled(f"{cmd[0]} was cancelled")
+                if deadline is not None and time.monotonic() > deadline:
+                    self._withdraw(job_id)
+                    raise CompileTimeout(f"{cmd[0]} exceeded {timeout:g}s and was killed")
+                self._check_heartbeat(job_id)
+                time.sleep(self.poll)
+            # Anything written between the last read and the result
+            rest = partial + log.read()
+            for line in rest.splitlines():
+                lines.append(line + "\n")
+                if on_line:
+                    on_line(line)
+        finally:
+            log.close()
+        return self._collect(job_id, cmd, work_dir, "".join(lines))
+
+    def _check_heartbeat(self, job_id: str):
+        beat = self._path("running", job_id) / HEARTBEAT_FILE
+        try:
+            age = time.time() - beat.stat().st_mtime
+        except OSError:
+            return
+        if age > self.lease:
+            # Nobody will finish the job, so it is removed rather than cancelled
+            trash = self.spool_dir / f".trash-{job_id}"
+            try:
+                os.rename(self._path("running", job_id), trash)
+                shutil.rmtree(trash, ignore_errors=True)
+            except OSError:
+                pass
+            raise WorkerLost(f"Compile worker stopped responding ({age:.0f}s without a heartbeat)")
+
+    def _withdraw(self, job_id: str):
+        """Takes a job back from the queue, or asks its worker to kill the run."""
+        trash = self.spool_dir / f".trash-{job_id}"
+        try:
+            os.rename(self._path("pending", job_id), trash)
+        except OSError:
+            running = self._path("running", job_id)
+            if running.exists():
+                try:
+                    (running / CANCEL_FILE).touch()
+                except OSError:
+                    pass
+            # A job that finished meanwhile is simply dropped
+            try:
+                os.rename(self._path("done", job_id), trash)
+            except OSError:
+                return
+        shutil.rmtree(trash, ignore_errors=True)
+
+    def _collect(self, job_id: str, cmd: List[str], work_dir: Path, output: str) -> subprocess.CompletedProcess:
+        done = self._path("done", job_id)
+        try:
+            result = json.loads((done / RESULT_FILE).read_text(encoding="utf-8"))
+            for rel in result.get("outputs", []):
+                target = work_dir / rel
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(done / "work" / rel), str(target))
+        finally:
+            shutil.rmtree(done, ignore_errors=True)
+        if result.get("error"):
+            output += f"{result['error']}\n"
+        return subprocess.CompletedProcess(cmd, result.get("returncode", 1), output, "")
+
+    def stats(self) -> dict:
+        counts = {}
+        for state in SPOOL_DIRS:
+            counts[state] = sum(1 for p in (self.spool_dir / state).iterdir() if not p.name.startswith("."))
+        workers = self.spool_dir / "workers"
+        now = time.time()
+        alive = [p.name for p in workers.iterdir() if now - p.stat().st_mtime < self.lease] \
+            if workers.exists() else []
+        return {"backend": self.name, "jobs": counts, "workers": sorted(alive)}
+
+
+def create_backend(name: str, spool_dir: Optional[Path] = None) -> CompileBackend:
+    if name == "local":
+        return LocalBackend()
+    if name == "spool":
+        if spool_dir is None:
+            raise ValueError("The spool backend needs a spool directory")
+        return SpoolBackend(spool_dir)
+    raise ValueError(f"Unknown compile backend: {name}")
@@ -0,0 +1,209 @@
+import glob
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+MARKDOWN_EXTENSIONS = {".md", ".markdown"}
+
+
+def expand_inputs(patterns: Iterable[str]) -> List[Path]:
+    """
+    Expands files, directories (searched recursively for Markdown) and glob
+    patterns into a sorted, de-duplicated list of Markdown files.
+    """
+    found = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            candidates = [p for p in path.rglob("*") if p.suffix.lower() in MARKDOWN_EXTENSIONS]
+        elif path.exists():
+            candidates = [path]
+        else:
+            candidates = [Path(p) for p in glob.glob(pattern, recursive=True)]
+        found.extend(p for p in candidates if p.is_file())
+
+    seen = set()
+    files = []
+    for p in sorted(found):
+        key = p.resolve()
+        if key not in seen:
+            seen.add(key)
+            files.append(p)
+    return files
+
+
+def _stamp_path(target: Path) -> Path:
+    return target.with_name(f".{target.name}.lxhash")
+
+
+def _mode_path(target: Path) -> Path:
+    return target.with_name(f".{target.name}.lxmode")
+
+
+def _dependencies(input_path: Path, template: str, resource_dir: Path, compile: bool) -> List[Path]:
+    """
+    Files besides the input that the output depends on: the template .cls,
+    .yml and layout and, for PDFs, the images the document and the template
+    reference, resolved as the build resolves them.
+    """
+    import frontmatter
+    from .assets import IMAGE_EXTENSIONS, resolve_image, safe_relative, template_image_refs
+    from .renderer import collect_image_urls
+    from .templates import Template
+
+    resource_dir = Path(resource_dir)
+    try:
+        spec = Template.load(template, resource_dir)
+    except Exception:
+        # No .cls (or unreadable settings): the build reports it, nothing to compare against
+        spec = None
+    paths = list(spec.sources) if spec else []
+    if not compile or not resource_dir.exists():
+        return paths
+    try:
+        urls = [u for u in collect_image_urls(frontmatter.loads(input_path.read_text(encoding="utf-8")).content)
+                if safe_relative(u)]
+    except Exception:
+        urls = []
+    if spec:
+        urls += template_image_refs(spec.layout, spec.cls_source)
+    for url in urls:
+        image = resolve_image(resource_dir, url, IMAGE_EXTENSIONS)
+        if image is not None and image not in paths:
+            paths.append(image)
+    return paths
+
+
+def _input_hash(input_path: Path, template: str, resource_dir: Path, compile: bool,
+                mode: str = "final") -> str:
+    h = hashlib.sha256()
+    h.update(input_path.read_bytes())
+    h.update(f"{template}|{compile}|{mode}".encode("utf-8"))
+    for path in _dependencies(input_path, template, resource_dir, compile):
+        h.update(f"|{path.name}|".encode("utf-8"))
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def is_up_to_date(input_path: Path, target: Path, template: str, resource_dir: Path,
+                  compile: bool, check: str = "mtime", mode: str = "final") -> bool:
+    """
+    `check="mtime"`: target is newer than the input, the template files and
+    the referenced images, and a sidecar next to it records that it was
+    built in the same `mode`.
+    `check="hash"`: a stamp next to the target records the same input hash.
+    """
+    if not target.exists():
+        return False
+    if check == "hash":
+        stamp = _stamp_path(target)
+        return stamp.exists() and stamp.read_text() == _input_hash(input_path, template, resource_dir,
+                                                                   compile, mode)
+    # A draft PDF (boxed images, no contents) must not pass for a final one, or vice versa
+    mode_file = _mode_path(target)
+    if not mode_file.exists() or mode_file.read_text() != mode:
+        return False
+    newest = input_path.stat().st_mtime
+    for path in _dependencies(input_path, template, resource_dir, compile):
+        newest = max(newest, path.stat().st_mtime)
+    return target.stat().st_mtime >= newest
+
+
+def build_one(input_path: str, output_path: str, template: str, compile: bool, clean: bool,
+              fmt: Optional[str], resource_dir: str, check: str, force: bool,
+              assets: Optional[str] = None, image_dpi: Optional[int] = None,
+              mode: str = "final", streaming: bool = False) -> dict:
+    """Converts (and optionally compiles) one file. Runs in a pool worker process."""
+    # Imported here so worker processes pay for the parser only when they run
+    from .assets import AssetStore
+    from .images import ImageOptimizer
+    from .main import DEFAULT_IMAGE_DIR, LaTeXRenderer
+
+    start = time.perf_counter()
+    src, tex = Path(input_path), Path(output_path)
+    target = tex.with_suffix(".pdf") if compile else tex
+    result = {"input": input_path, "output": str(target), "status": "ok", "error": None}
+    try:
+        if not force and is_up_to_date(src, target, template, Path(resource_dir), compile, check, mode):
+            result["status"] = "skipped"
+        else:
+            renderer = LaTeXRenderer(input_path, output_path, template, fmt=fmt,
+                                     assets=AssetStore(Path(assets)) if assets else None,
+                                     images=ImageOptimizer(DEFAULT_IMAGE_DIR, dpi=image_dpi) if image_dpi else None,
+                                     mode=mode, streaming=streaming)
+            ok = renderer.render()
+            if ok and compile:
+                # Resources are linked into place atomically, so workers sharing a dir don't race
+                ok = renderer.compile(clean=clean, resource_dir=Path(resource_dir))
+            if not ok:
+                result["status"] = "failed"
+                result["error"] = "compilation failed" if compile else "conversion failed"
+            else:
+                _mode_path(target).write_text(mode)
+                if check == "hash":
+                    _stamp_path(target).write_text(_input_hash(src, template, Path(resource_dir), compile, mode))
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def plan_outputs(inputs: List[Path], outdir: Optional[Path]) -> List[Path]:
+    """Output .tex per input: next to the input, or flat in `outdir`."""
+    if outdir is None:
+        return [p.with_suffix(".tex") for p in inputs]
+    return [outdir / f"{p.stem}.tex" for p in inputs]
+
+
+def run_batch(inputs: List[Path], outdir: Optional[Path] = None, template: str = "matnoble",
+              compile: bool = False, clean: bool = False, jobs: Optional[int] = None,
+              fmt: Optional[Path] = None, resource_dir: Path = Path("doc"),
+              check: str = "mtime", force: bool = False, assets: Optional[Path] = None,
+              image_dpi: Optional[int] = None, mode: str = "final",
+              streaming: bool = False) -> List[dict]:
+    """
+    Builds many files across a process pool. A failing file is reported in
+    its result and never aborts the rest of the batch.
+    """
+    outputs = plan_outputs(inputs, outdir)
+    results = []
+    tasks = []
+    claimed = {}
+    for src, out in zip(inputs, outputs):
+        if out.resolve() in claimed:
+            results.append({"input": str(src), "output": str(out), "status": "failed", "seconds": 0.0,
+                            "error": f"output clashes with {claimed[out.resolve()]}"})
+            continue
+        claimed[out.resolve()] = src
+        tasks.append((str(src), str(out), template, compile, clean,
+                      str(fmt) if fmt else None, str(resource_dir), check, force,
+                      str(assets) if assets else None, image_dpi, mode, streaming))
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) <= 1:
+        results.extend(build_one(*t) for t in tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(build_one, *t) for t in tasks]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+    order = {str(p): i for i, p in enumerate(inputs)}
+    results.sort(key=lambda r: order.get(r["input"], 0))
+    return results
+
+
+def print_summary(results: List[dict], elapsed: float):
+    width = max((len(r["input"]) for r in results), default=0)
+    for r in results:
+        line = f"{r['status']:<8} {r['seconds']:7.2f}s  {r['input']:<{width}}"
+        if r["error"]:
+            line += f"  ({r['error']})"
+        print(line)
+    counts = {s: sum(1 for r in results if r["status"] == s) for s in ("ok", "skipped", "failed")}
+    print(f"{len(results)} files in {elapsed:.2f}s: "
+          f"{counts['ok']} built, {counts['skipped']} up to date, {counts['failed']} failed")
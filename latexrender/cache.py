@@ -0,0 +1,317 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import frontmatter
+
+from .assets import IMAGE_EXTENSIONS, resolve_image, safe_relative, template_image_refs
+from .renderer import collect_image_urls
+from .templates import ARTICLE_TEMPLATE
+
+# Bump when the conversion pipeline changes in a way that alters output.
+CACHE_VERSION = "1"
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _Entry:
+    __slots__ = ("files", "digests", "size", "atime", "pins", "dirty")
+
+    def __init__(self, files: dict, atime: float):
+        # file name -> size
+        self.files = files
+        # file name -> SHA-256 of its bytes, filled in on publish or first use
+        self.digests = {}
+        self.size = sum(files.values())
+        self.atime = atime
+        self.pins = 0
+        # atime changed since it was last written to the directory mtime
+        self.dirty = False
+
+
+class ArtifactCache:
+    """
+    Content-addressed store for build artifacts.
+
+    Each entry is a directory named after the hash of everything that
+    influences the PDF: Markdown source, template .cls, referenced images
+    and engine options. Entries are evicted by total size and by age.
+
+    Sizes and access times live in an in-memory index, loaded from disk
+    once, so lookups and publishes never scan the directory. Eviction runs
+    on a background janitor thread (see `start`) and never removes pinned
+    entries or entries accessed within the last `min_idle` seconds.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = 512 * 1024 * 1024, max_age: float = 7 * 24 * 3600,
+                 min_idle: float = 300):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_idle = min_idle
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> _Entry, least recently used first
+        self._index = OrderedDict()
+        self._bytes = 0
+        self._wake = threading.Event()
+        self._janitor = None
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def compute_key(content: str, template: str, resource_dir: Optional[Path] = None,
+                    options: Iterable[str] = (), template_digest: Optional[str] = None,
+                    layout: Optional[str] = None) -> str:
+        """
+        `template_digest` (Template.digest from a registry) stands in for
+        reading the template's .cls from resource_dir. `layout` is the
+        template's document layout when it is not ARTICLE_TEMPLATE.
+        Images are looked up the way the build places them, so a key changes
+        with every file the compile can actually see.
+        """
+        h = hashlib.sha256()
+
+        def feed(label: str, data: bytes):
+            h.update(label.encode("utf-8"))
+            h.update(len(data).to_bytes(8, "big"))
+            h.update(data)
+
+        feed("version", CACHE_VERSION.encode("utf-8"))
+        layout = layout or ARTICLE_TEMPLATE
+        feed("layout", layout.encode("utf-8"))
+        feed("content", content.encode("utf-8"))
+        feed("template", template.encode("utf-8"))
+        for opt in options:
+            feed("option", str(opt).encode("utf-8"))
+        if template_digest:
+            feed("template-digest", template_digest.encode("utf-8"))
+
+        if resource_dir:
+            resource_dir = Path(resource_dir)
+            cls_file = resource_dir / f"{template}.cls"
+            cls_bytes = cls_file.read_bytes() if cls_file.exists() else b""
+            if template_digest is None and cls_bytes:
+                feed("cls", cls_bytes)
+
+            # Only images that the document actually references matter.
+            try:
+                body = frontmatter.loads(content).content
+            except Exception:
+                body = content
+            for url in collect_image_urls(body):
+                image = resolve_image(resource_dir, url, IMAGE_EXTENSIONS) if safe_relative(url) else None
+                if image is not None:
+                    feed(f"image:{url}:{image.name}", image.read_bytes())
+            # Logos and other images the layout or class pulls in themselves
+            for name in template_image_refs(layout, cls_bytes.decode("utf-8", errors="replace")):
+                image = resolve_image(resource_dir, name, IMAGE_EXTENSIONS)
+                if image is not None:
+                    feed(f"template-image:{name}:{image.name}", image.read_bytes())
+        return h.hexdigest()
+
+    def entry_dir(self, key: str) -> Path:
+        return self.root / key
+
+    def _load_index(self):
+        """Builds the index from disk; directory mtimes persist access times across restarts."""
+        for d in self.root.iterdir():
+            if d.name.startswith(".trash-"):
+                shutil.rmtree(d, ignore_errors=True)
+            if not d.is_dir() or d.name.startswith("."):
+                continue
+            try:
+                files = {f.name: f.stat().st_size for f in d.iterdir()
+                         if f.is_file() and not f.name.startswith(".")}
+                self._index[d.name] = _Entry(files, d.stat().st_mtime)
+            except OSError:
+                continue
+        for key in sorted(self._index, key=lambda k: self._index[k].atime):
+            self._index.move_to_end(key)
+        self._bytes = sum(e.size for e in self._index.values())
+
+    def touch(self, key: str, at: Optional[float] = None):
+        """Marks an entry as used (e.g. its PDF was just served)."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None:
+                entry.atime = time.time() if at is None else at
+                entry.dirty = True
+                self._index.move_to_end(key)
+
+    def lookup(self, key: str, name: str = "document.pdf") -> Optional[Path]:
+        """Returns the cached artifact path, counting a hit or a miss."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None and name in entry.files:
+                self.hits += 1
+                entry.atime = time.time()
+                entry.dirty = True
+                self._index.move_to_end(key)
+                return self.entry_dir(key) / name
+            self.misses += 1
+            return None
+
+    def artifact(self, key: str, name: str) -> Optional[Tuple[Path, str]]:
+        """
+        Returns (path, sha256) of a published file and marks the entry as used.
+        Unlike lookup() this does not count towards hit/miss statistics.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or name not in entry.files:
+                return None
+            entry.atime = time.time()
+            entry.dirty = True
+            self._index.move_to_end(key)
+            digest = entry.digests.get(name)
+        path = self.entry_dir(key) / name
+        if digest is None:
+            # Entry loaded from disk at startup; hash it once
+            try:
+                digest = file_digest(path)
+            except OSError:
+                return None
+            with self._lock:
+                entry.digests[name] = digest
+        return path, digest
+
+    @contextmanager
+    def pin(self, key: str):
+        """Protects an entry from eviction while it is being built, published or served."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                entry = self._index[key] = _Entry({}, time.time())
+            entry.pins += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                entry.pins -= 1
+                entry.atime = time.time()
+                entry.dirty = True
+                if not entry.files and not entry.pins and self._index.get(key) is entry:
+                    del self._index[key]
+
+    def publish(self, key: str, work_dir: Path, names: Iterable[str]) -> Path:
+        """
+        Copies finished artifacts from a work directory (possibly on another
+        filesystem, e.g. tmpfs) into the cache entry. Each file is written to
+        a temp name and renamed into place, so readers never see partial files.
+        """
+        entry_path = self.entry_dir(key)
+        with self.pin(key):
+            entry_path.mkdir(parents=True, exist_ok=True)
+            published, digests = {}, {}
+            for name in names:
+                src = Path(work_dir) / name
+                if not src.is_file():
+                    continue
+                tmp = entry_path / f".{name}.tmp"
+                shutil.copy2(src, tmp)
+                digests[name] = file_digest(tmp)
+                os.replace(tmp, entry_path / name)
+                published[name] = src.stat().st_size
+            with self._lock:
+                entry = self._index[key]
+                self._bytes -= entry.size
+                entry.files.update(published)
+                entry.digests.update(digests)
+                entry.size = sum(entry.files.values())
+                self._bytes += entry.size
+                self._index.move_to_end(key)
+                over_quota = self._bytes > self.max_bytes
+        if over_quota:
+            self._wake.set()
+        return entry_path
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """
+        Drops entries older than max_age, then the least recently used until
+        under max_bytes. Pinned and recently used entries are kept. Victims
+        are renamed aside under the lock and deleted after it is released.
+        Returns the number of evicted entries.
+        """
+        now = time.time() if now is None else now
+        victims, touched = [], []
+        with self._lock:
+            for key, entry in list(self._index.items()):
+                if entry.pins or now - entry.atime < self.min_idle:
+                    if entry.dirty:
+                        touched.append((key, entry.atime))
+                        entry.dirty = False
+                    continue
+                if now - entry.atime > self.max_age or self._bytes > self.max_bytes:
+                    trash = self.root / f".trash-{uuid.uuid4().hex}"
+                    try:
+                        os.rename(self.entry_dir(key), trash)
+                    except OSError:
+                        pass
+                    else:
+                        victims.append(trash)
+                    del self._index[key]
+                    self._bytes -= entry.size
+                    self.evictions += 1
+                elif entry.dirty:
+                    touched.append((key, entry.atime))
+                    entry.dirty = False
+        for trash in victims:
+            shutil.rmtree(trash, ignore_errors=True)
+        # Persist access times so a restart keeps the LRU order
+        for key, atime in touched:
+            try:
+                os.utime(self.entry_dir(key), (atime, atime))
+            except OSError:
+                pass
+        return len(victims)
+
+    def start(self, interval: float = 60) -> threading.Thread:
+        """
+        Starts the janitor thread. It sweeps every `interval` seconds, and
+        early when a publish takes the cache over its byte quota.
+        """
+        def run():
+            while True:
+                self._wake.wait(interval)
+                self._wake.clear()
+                try:
+                    self.evict()
+                except Exception as e:
+                    print(f"Cache Error: {e}")
+
+        if self._janitor is None:
+            self._janitor = threading.Thread(target=run, name="cache-janitor", daemon=True)
+            self._janitor.start()
+        return self._janitor
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": sum(1 for e in self._index.values() if e.files),
+                "pinned": sum(1 for e in self._index.values() if e.pins),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_age": self.max_age,
+                "min_idle": self.min_idle,
+            }
@@ -0,0 +1,124 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+
+class CompileTimeout(Exception):
+    """Raised when a TeX run exceeds its time budget and has been killed."""
+
+
+class CompileCancelled(Exception):
+    """Raised when a TeX run was cancelled by the caller and has been killed."""
+
+
+def latexmk_command(tex_name: str, fmt: Optional[str] = None) -> List[str]:
+    # Use -pdf and -pdflatex to ensure proper xelatex handling
+    # -file-line-error prefixes errors with file:line, which lint.parse_tex_log maps back to Markdown
+    engine = f"xelatex -file-line-error -fmt={fmt} %O %S" if fmt else "xelatex -file-line-error %O %S"
+    return ["latexmk", "-pdf", f"-pdflatex={engine}", "-interaction=nonstopmode", tex_name]
+
+
+# Files a TeX run leaves next to the document besides the PDF (what `latexmk -c` removes)
+INTERMEDIATE_SUFFIXES = (".aux", ".log", ".fls", ".fdb_latexmk", ".xdv", ".toc", ".out",
+                         ".lof", ".lot", ".synctex.gz")
+
+
+def remove_intermediates(work_dir: Path, tex_name: str) -> int:
+    """Deletes the intermediate files of `tex_name`; returns how many were removed."""
+    stem = Path(tex_name).stem
+    removed = 0
+    for suffix in INTERMEDIATE_SUFFIXES:
+        try:
+            (Path(work_dir) / f"{stem}{suffix}").unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+# "final": latexmk runs until references settle. "draft": one xelatex pass for previews.
+MODES = ("final", "draft")
+
+
+def draft_command(tex_name: str, fmt: Optional[str] = None) -> List[str]:
+    """
+    A single xelatex pass. The PDF driver runs without stream compression
+    (-z 0), which noticeably shortens the xdvipdfmx step on large documents.
+    """
+    cmd = ["xelatex", "-interaction=nonstopmode", "-file-line-error", "-output-driver=xdvipdfmx -z 0"]
+    if fmt:
+        cmd.append(f"-fmt={fmt}")
+    return cmd + [tex_name]
+
+
+def compile_command(tex_name: str, fmt: Optional[str] = None, mode: str = "final") -> List[str]:
+    if mode not in MODES:
+        raise ValueError(f"Unknown compile mode: {mode}")
+    return draft_command(tex_name, fmt) if mode == "draft" else latexmk_command(tex_name, fmt)
+
+
+def _kill_tree(proc: subprocess.Popen):
+    """latexmk spawns xelatex children, so kill the whole process group."""
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_latexmk(cmd: List[str], cwd: Path, timeout: Optional[float] = None,
+                on_line: Optional[Callable[[str], None]] = None,
+                cancel: Optional[threading.Event] = None) -> subprocess.CompletedProcess:
+    """
+    Runs a TeX command with stdout and stderr merged.
+
+    Output is read line by line on a helper thread and handed to `on_line`
+    as soon as TeX emits it. On timeout, or once `cancel` is set, the process
+    tree is killed and CompileTimeout / CompileCancelled is raised.
+    """
+    proc = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        stdin=subprocess.DEVNULL,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+        start_new_session=(os.name == "posix"),
+    )
+    lines = []
+
+    def pump():
+        for line in proc.stdout:
+            lines.append(line)
+            if on_line:
+                on_line(line.rstrip("\n"))
+
+    reader = threading.Thread(target=pump, daemon=True)
+    reader.start()
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while True:
+            try:
+                proc.wait(timeout=0.1)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_set():
+                    raise CompileCancelled(f"{cmd[0]} was cancelled")
+                if deadline is not None and time.monotonic() > deadline:
+                    raise CompileTimeout(f"{cmd[0]} exceeded {timeout:g}s and was killed")
+    except BaseException:
+        _kill_tree(proc)
+        proc.wait()
+        raise
+    finally:
+        reader.join(timeout=5)
+    return subprocess.CompletedProcess(cmd, proc.returncode, "".join(lines), "")
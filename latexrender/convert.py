@@ -0,0 +1,90 @@
+from typing import Optional, Tuple, Union
+
+import frontmatter
+
+from .formats import DUMP_MARKER
+from .incremental import IncrementalConverter
+from .renderer import get_markdown_parser
+from .templates import Template, default_registry
+
+# Stands in for the body so a filled template can be split around it
+BODY_SLOT = "\x00body\x00"
+
+TemplateLike = Union[str, Template]
+
+
+def resolve_template(template: TemplateLike) -> Template:
+    """A template name is looked up in the bundled templates; Template objects pass through."""
+    if isinstance(template, Template):
+        return template
+    return default_registry().resolve(template)
+
+
+def get_header(template: TemplateLike, metadata: dict) -> str:
+    return resolve_template(template).header(metadata)
+
+
+def get_extra_preamble(template: TemplateLike, metadata: dict) -> str:
+    return resolve_template(template).extra_preamble(metadata)
+
+
+def fill_template(metadata: dict, tex_body: str, template: TemplateLike = "matnoble", fmt: bool = False,
+                  mode: str = "final") -> str:
+    """
+    Wraps a converted body in the template's layout (ARTICLE_TEMPLATE unless
+    its settings name another one).
+    `fmt` marks the end of the preamble for a precompiled format.
+    `mode="draft"` drops the table of contents (it needs a second pass anyway)
+    and replaces images with graphicx draft boxes, so no image is decoded.
+    """
+    template = resolve_template(template)
+    extra_preamble = template.extra_preamble(metadata)
+    if mode == "draft":
+        # After the dump marker, so it also applies when graphicx comes from a format
+        extra_preamble = "\n".join(filter(None, [extra_preamble, r"\setkeys{Gin}{draft}"]))
+    return template.layout % {
+        "doc_class": template.name,
+        "dump_marker": DUMP_MARKER if fmt else "",
+        "title": metadata.get("title", "Untitled"),
+        "author": metadata.get("author", "MatNoble"),
+        "date": metadata.get("date", r"\today"),
+        "extra_preamble": extra_preamble,
+        "header": template.header(metadata),
+        "toc": "" if mode == "draft" else r"\tableofcontents",
+        "content": tex_body
+    }
+
+
+def template_parts(metadata: dict, template: TemplateLike = "matnoble", fmt: bool = False,
+                   mode: str = "final") -> Tuple[str, str]:
+    """fill_template() split into the text before and after the body, for writing the body in pieces."""
+    head, _, tail = fill_template(metadata, BODY_SLOT, template, fmt, mode).partition(BODY_SLOT)
+    return head, tail
+
+
+def convert_body(md_body: str) -> str:
+    """Converts Markdown (without frontmatter) to a LaTeX body fragment."""
+    return get_markdown_parser()(md_body)
+
+
+def convert_markdown(text: str, template: TemplateLike = "matnoble", fmt: bool = False,
+                     metadata: Optional[dict] = None,
+                     converter: Optional[IncrementalConverter] = None, mode: str = "final") -> str:
+    """
+    Converts a Markdown document (with optional YAML frontmatter) to a full
+    LaTeX document entirely in memory. `metadata` overrides frontmatter keys.
+    With a `converter`, only blocks changed since its last call are re-parsed.
+    """
+    post = frontmatter.loads(text)
+    return convert_post(post.metadata, post.content, template, fmt, metadata, converter, mode)
+
+
+def convert_post(frontmatter_meta: dict, md_body: str, template: TemplateLike = "matnoble", fmt: bool = False,
+                 metadata: Optional[dict] = None,
+                 converter: Optional[IncrementalConverter] = None, mode: str = "final") -> str:
+    """Same as convert_markdown, for a document whose frontmatter is already split off."""
+    meta = dict(frontmatter_meta)
+    if metadata:
+        meta.update(metadata)
+    body = converter.convert(md_body).tex if converter else convert_body(md_body)
+    return fill_template(meta, body, template, fmt, mode)
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+from .compiler import CompileTimeout, run_latexmk
+
+# Bump to invalidate every dumped format, e.g. after changing the build recipe.
+FORMAT_VERSION = "1"
+
+# Everything up to this marker is served from the format instead of being re-read.
+DUMP_MARKER = r"\endofdump"
+
+PREAMBLE = "\\documentclass{%s}\n\\begin{document}\n\\end{document}\n"
+
+# What TeX prints when it cannot use a format, e.g. one dumped by an older TeX Live
+FORMAT_ERROR_RE = re.compile(r"Fatal format file error|---! \S+ (?:was written by|doesn't match)|"
+                             r"I can't find the format file")
+
+# Loading an OpenType font (fontspec, xeCJK, ctex, ...) before the dump point makes XeTeX refuse
+# to \dump, so such classes are compiled without a format instead of failing a dump each time
+NATIVE_FONT_RE = re.compile(r"\\(?:RequirePackage|usepackage)\s*(?:\[[^\]]*\])?\s*\{[^}]*"
+                            r"\b(?:fontspec|xeCJK|ctex|unicode-math|mathspec)\b|"
+                            r"\\(?:new(?:CJK)?fontfamily|setCJKfamilyfont|set(?:CJK)?(?:main|sans|mono|math)font)\b")
+TEX_COMMENT_RE = re.compile(r"(?<!\\)%.*")
+
+
+def _output(cmd) -> str:
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=30).stdout
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+class FormatCache:
+    """
+    Builds and caches precompiled preamble formats (mylatexformat style), one
+    per template and .cls content hash.
+
+    A format is rebuilt automatically when the .cls changes. A class that
+    loads native OpenType fonts (fontspec, xeCJK), as both bundled classes
+    do, cannot be dumped by XeTeX; get() returns None for it without trying,
+    and callers compile from the plain preamble. Font setup placed in the
+    template's .yml `preamble` comes after the dump point and does not
+    prevent a format. If a dump fails anyway, a .failed marker is kept for
+    that hash so the attempt is not repeated.
+    """
+
+    def __init__(self, cache_dir: Path, engine: str = "xelatex", timeout: float = 300):
+        self.cache_dir = Path(cache_dir)
+        self.engine = engine
+        self.timeout = timeout
+        self._locks = {}
+        self._guard = threading.Lock()
+        self._toolchain = None
+        # Formats found to be undumpable from the class source, reported once each
+        self._skipped = set()
+
+    def toolchain(self) -> str:
+        """
+        Fingerprint of the TeX installation a format depends on: the engine
+        version plus size and mtime of the system format and of every ls-R
+        database (rewritten by mktexlsr on each package install or TeX Live
+        upgrade). Probed once per FormatCache.
+        """
+        if self._toolchain is None:
+            version = _output([self.engine, "--version"])
+            files = _output(["kpsewhich", f"-engine={self.engine}", f"{Path(self.engine).name}.fmt"])
+            files += _output(["kpsewhich", "-all", "ls-R"])
+            parts = version.splitlines()[:1]
+            for name in files.splitlines():
+                try:
+                    st = os.stat(name)
+                except OSError:
+                    continue
+                parts.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+            self._toolchain = "\n".join(parts)
+        return self._toolchain
+
+    def format_name(self, template: str, resource_dir: Path) -> Optional[str]:
+        cls_file = Path(resource_dir) / f"{template}.cls"
+        if not cls_file.exists():
+            return None
+        h = hashlib.sha256()
+        h.update(FORMAT_VERSION.encode("utf-8"))
+        h.update(self.engine.encode("utf-8"))
+        h.update(self.toolchain().encode("utf-8"))
+        h.update(cls_file.read_bytes())
+        return f"{template}-{h.hexdigest()[:16]}"
+
+    def _lock_for(self, name: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def get(self, template: str, resource_dir: Path) -> Optional[Path]:
+        """Returns the .fmt for a template, building it on first use; None if unavailable."""
+        name = self.format_name(template, resource_dir)
+        if name is None:
+            return None
+        fmt = self.cache_dir / f"{name}.fmt"
+        if fmt.exists():
+            return fmt
+        if (self.cache_dir / f"{name}.failed").exists():
+            return None
+        cls_source = (Path(resource_dir) / f"{template}.cls").read_text(encoding="utf-8", errors="replace")
+        if not self.dumpable(cls_source):
+            if name not in self._skipped:
+                self._skipped.add(name)
+                print(f"Format: {template}.cls loads native fonts, compiling without a precompiled preamble.")
+            return None
+
+        with self._lock_for(name):
+            if fmt.exists():
+                return fmt
+            return self._build(template, name, Path(resource_dir))
+
+    def _build(self, template: str, name: str, resource_dir: Path) -> Optional[Path]:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix="lxrender-fmt-") as tmp:
+            tmp = Path(tmp)
+            shutil.copy2(resource_dir / f"{template}.cls", tmp / f"{template}.cls")
+            (tmp / "preamble.tex").write_text(PREAMBLE % template, encoding="utf-8")
+            cmd = [self.engine, "-ini", "-interaction=nonstopmode", f"-jobname={name}",
+                   f"&{self.engine}", "mylatexformat.ltx", "preamble.tex"]
+            try:
+                result = run_latexmk(cmd, cwd=tmp, timeout=self.timeout)
+            except (OSError, CompileTimeout) as e:
+                # Missing binary, slow first run, full disk: worth another try next time
+                print(f"Format Error: could not dump {name} ({e}), compiling without it.")
+                return None
+            built = tmp / f"{name}.fmt"
+            if result.returncode != 0 or not built.exists():
+                # TeX rejected the dump; it will again until the .cls or toolchain changes
+                print(f"Format Error: could not dump {name}, compiling without it.")
+                try:
+                    (self.cache_dir / f"{name}.failed").write_text(result.stdout[-4000:], encoding="utf-8")
+                except OSError:
+                    pass
+                return None
+
+            # Drop stale formats of this template before publishing the new one
+            for old in self.cache_dir.glob(f"{template}-*"):
+                if old.stem.rsplit("-", 1)[0] == template:
+                    old.unlink()
+            target = self.cache_dir / f"{name}.fmt"
+            shutil.move(str(built), str(target))
+            return target
+
+    @staticmethod
+    def dumpable(cls_source: str) -> bool:
+        """False if a class loads native fonts before the dump point, which XeTeX cannot \\dump."""
+        return NATIVE_FONT_RE.search(TEX_COMMENT_RE.sub("", cls_source)) is None
+
+    @staticmethod
+    def is_format_error(log: str) -> bool:
+        """True if a compile failed because TeX could not load its -fmt format."""
+        return FORMAT_ERROR_RE.search(log) is not None
+
+    @staticmethod
+    def discard(fmt: Path):
+        """Drops a format TeX refused; the next get() dumps it again."""
+        try:
+            Path(fmt).unlink()
+        except OSError:
+            pass
+
+    @staticmethod
+    def install(fmt: Path, work_dir: Path) -> str:
+        """Links the format into a build directory and returns the name to pass to -fmt."""
+        target = Path(work_dir) / fmt.name
+        if not target.exists():
+            try:
+                os.link(fmt, target)
+            except OSError:
+                # Across filesystems (e.g. a tmpfs work dir); formats are never rewritten in place
+                try:
+                    os.symlink(fmt.resolve(), target)
+                except OSError:
+                    shutil.copy2(fmt, target)
+        return fmt.stem
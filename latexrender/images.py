@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:  # Optional dependency: pip install latexrender[images]
+    Image = None
+
+# Bump when the re-encoding recipe changes, so old derivatives are not reused.
+PIPELINE_VERSION = "1"
+
+# \textwidth of the bundled templates: A4 (21cm) minus 2cm margins on each side
+TEXT_WIDTH_INCHES = 17 / 2.54
+# renderer.image() places pictures at 0.8\textwidth
+FIGURE_WIDTH_FRACTION = 0.8
+
+RASTER_FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG"}
+
+
+class ImageOptimizer:
+    """
+    Pre-compile stage that re-encodes raster images for their printed size.
+
+    Images wider than the figure width at `dpi` are downsampled, converted
+    to 8-bit RGB(A) and saved without EXIF/ICC metadata. Derivatives are
+    cached by source hash and parameters; the original is used whenever the
+    derivative would not be smaller. The file format is kept so the
+    \\includegraphics path in the .tex stays valid.
+    """
+
+    def __init__(self, cache_dir: Path, dpi: int = 200, quality: int = 85):
+        self.cache_dir = Path(cache_dir)
+        self.dpi = dpi
+        self.quality = quality
+        self.max_width = int(TEXT_WIDTH_INCHES * FIGURE_WIDTH_FRACTION * dpi)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.processed = 0
+        self.reused = 0
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return Image is not None
+
+    def signature(self) -> str:
+        """Identifies the recipe, for cache keys of builds that use optimized images."""
+        return f"images:{PIPELINE_VERSION}:{self.dpi}:{self.quality}"
+
+    def _derivative_path(self, src: Path) -> Path:
+        st = src.stat()
+        sig = (src.resolve(), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if sig in self._paths:
+                return self._paths[sig]
+        h = hashlib.sha256()
+        h.update(self.signature().encode("utf-8"))
+        with open(src, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        dest = self.cache_dir / f"{h.hexdigest()}{src.suffix.lower()}"
+        with self._lock:
+            self._paths[sig] = dest
+        return dest
+
+    def _encode(self, src: Path, dest: Path, fmt: str):
+        with Image.open(src) as img:
+            img.load()
+            if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                # CMYK, 16-bit and other modes xelatex decodes slowly or not at all
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            if img.width > self.max_width:
+                height = max(1, round(img.height * self.max_width / img.width))
+                img = img.resize((self.max_width, height), Image.LANCZOS)
+            tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+            # No exif/icc_profile arguments: metadata is dropped
+            if fmt == "JPEG":
+                img.save(tmp, "JPEG", quality=self.quality, optimize=True, progressive=True,
+                         dpi=(self.dpi, self.dpi))
+            else:
+                img.save(tmp, "PNG", optimize=True, dpi=(self.dpi, self.dpi))
+            os.replace(tmp, dest)
+
+    def process(self, src: Path) -> Path:
+        """Returns the path to use for `src`: a cached derivative, or `src` itself."""
+        src = Path(src)
+        fmt = RASTER_FORMATS.get(src.suffix.lower())
+        if Image is None or fmt is None:
+            return src
+
+        original = src.stat().st_size
+        dest = self._derivative_path(src)
+        reused = dest.exists()
+        if not reused:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                self._encode(src, dest, fmt)
+            except Exception as e:
+                print(f"Image Error: {src.name}: {e}")
+                return src
+
+        size = dest.stat().st_size
+        if size >= original:
+            # Re-encoding did not help. The derivative stays cached so later builds
+            # skip the attempt, but the original is used.
+            chosen, size = src, original
+        else:
+            chosen = dest
+
+        with self._lock:
+            self.bytes_in += original
+            self.bytes_out += size
+            self.processed += 1
+            self.reused += int(reused)
+        return chosen
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "dpi": self.dpi,
+                "max_width_px": self.max_width,
+                "processed": self.processed,
+                "reused": self.reused,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+            }
@@ -0,0 +1,156 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional
+
+from .renderer import get_markdown_parser
+
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+LIST_ITEM_RE = re.compile(r"^ {0,3}([*+-]|\d{1,9}[.)])(\s|$)")
+# Reference link definitions apply document-wide, so such documents are not split
+LINK_DEF_RE = re.compile(r"^ {0,3}\[[^\]]+\]:", re.M)
+
+
+def split_blocks(md_body: str) -> List[str]:
+    """
+    Splits Markdown at top-level block boundaries (blank lines outside of
+    fenced code and $$ math). Indented groups and consecutive list groups
+    stay attached to the block before them, so every block renders exactly
+    as it would inside the full document. "".join(blocks) == md_body.
+    """
+    if LINK_DEF_RE.search(md_body):
+        return [md_body] if md_body else []
+    return list(iter_blocks(md_body.splitlines(keepends=True)))
+
+
+def _iter_groups(lines: Iterable[str]) -> Iterator[str]:
+    # Runs of lines separated by blank lines, never splitting fences or $$ math
+    current = []
+    fence = None
+    in_math = False
+    seen_blank = False
+
+    for line in lines:
+        if fence:
+            current.append(line)
+            stripped = line.strip()
+            if stripped.startswith(fence) and set(stripped) == {fence[0]}:
+                fence = None
+            continue
+
+        is_blank = not line.strip()
+        if seen_blank and not is_blank and not in_math:
+            yield "".join(current)
+            current = []
+        seen_blank = is_blank and not in_math
+        current.append(line)
+
+        m = FENCE_RE.match(line)
+        if m and not in_math:
+            fence = m.group(1)
+        elif line.count("$$") % 2:
+            in_math = not in_math
+    if current:
+        yield "".join(current)
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[str]:
+    """
+    split_blocks() over an iterable of lines (with line endings), holding
+    only the current block in memory. Unlike split_blocks() it does not
+    check for reference link definitions.
+    """
+    block = []
+    prev_is_list = False
+    for group in _iter_groups(lines):
+        first = group.lstrip("\n")
+        is_list = bool(LIST_ITEM_RE.match(first))
+        continues = first[:1] in (" ", "\t") or (is_list and prev_is_list)
+        if block and not continues:
+            yield "".join(block)
+            block = []
+        if not block:
+            prev_is_list = is_list
+        block.append(group)
+    if block:
+        yield "".join(block)
+
+
+def block_hash(block: str) -> str:
+    return hashlib.sha1(block.encode("utf-8")).hexdigest()
+
+
+class BlockCache:
+    """Bounded LRU mapping block content hash -> rendered LaTeX, safe to share across threads."""
+
+    def __init__(self, max_blocks: int = 20000):
+        self.max_blocks = max_blocks
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            tex = self._items.get(key)
+            if tex is not None:
+                self._items.move_to_end(key)
+            return tex
+
+    def put(self, key: str, tex: str):
+        with self._lock:
+            self._items[key] = tex
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_blocks:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ConversionResult:
+    """Output of IncrementalConverter.convert."""
+
+    def __init__(self, tex: str, blocks: List[str], changed: List[int], rendered: int):
+        self.tex = tex
+        # Content hash of each block, in document order
+        self.blocks = blocks
+        # Indices of blocks that were not present in the previous version
+        self.changed = changed
+        # Number of blocks that actually went through the parser
+        self.rendered = rendered
+
+    def to_dict(self) -> dict:
+        return {"total": len(self.blocks), "changed": self.changed, "rendered": self.rendered}
+
+
+class IncrementalConverter:
+    """
+    Converts a document block by block, re-rendering only blocks whose
+    content hash is not already in the (possibly shared) BlockCache.
+    One converter tracks one document, so `changed` is relative to the
+    previous call on the same instance.
+    """
+
+    def __init__(self, cache: Optional[BlockCache] = None):
+        self.cache = cache if cache is not None else BlockCache()
+        self.previous = set()
+        self.last = None
+
+    def convert(self, md_body: str) -> ConversionResult:
+        parser = get_markdown_parser()
+        parts, hashes, changed = [], [], []
+        rendered = 0
+        for i, block in enumerate(split_blocks(md_body)):
+            key = block_hash(block)
+            tex = self.cache.get(key)
+            if tex is None:
+                tex = parser(block)
+                self.cache.put(key, tex)
+                rendered += 1
+            if key not in self.previous:
+                changed.append(i)
+            parts.append(tex)
+            hashes.append(key)
+        self.previous = set(hashes)
+        self.last = ConversionResult("".join(parts), hashes, changed, rendered)
+        return self.last
@@ -0,0 +1,244 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when no more jobs can be accepted."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    """
+    A unit of work tracked by JobQueue. Handlers append progress lines to
+    `logs`; the final return value resolves `future`.
+    """
+
+    def __init__(self, payload: Any, timeout: Optional[float] = None):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.timeout = timeout
+        self.status = "queued"
+        self.logs = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = Future()
+        self.cancel_event = threading.Event()
+        # Identity of the work, shared by coalesced submissions (see JobQueue.submit)
+        self.dedupe_key = None
+        # Sessions (supersede keys) still waiting for this result; None counts
+        # submitters without a session, who can never supersede it
+        self.owners = {}
+        # Id of the newer job that replaced this one
+        self.superseded_by = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def cancel(self):
+        """Asks the handler to stop; queued jobs are skipped entirely."""
+        self.cancel_event.set()
+
+    def log(self, line: str):
+        self.logs.append(line)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "superseded_by": self.superseded_by,
+        }
+
+
+class JobQueue:
+    """
+    Bounded FIFO of jobs served by a fixed pool of worker threads.
+
+    `handler(job)` runs on a worker thread and its return value becomes the
+    job result. When `max_pending` jobs are already waiting, submit() raises
+    QueueFull with a Retry-After estimate instead of queueing more work.
+
+    Submissions with the `dedupe_key` of an unfinished job attach to that
+    job instead of queueing a second one. A submission with a
+    `supersede_key` (e.g. an editing session) cancels the previous unfinished
+    job of that key, unless another submitter is still waiting for it.
+    """
+
+    def __init__(self, handler: Callable[[Job], Any], workers: int = 2, max_pending: int = 16,
+                 timeout: Optional[float] = 120, keep: int = 256):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.keep = keep
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = 0
+        self._avg_duration = 5.0
+        # dedupe key -> unfinished job; supersede key -> its latest unfinished job
+        self._inflight = {}
+        self._latest = {}
+        self.coalesced = 0
+        self.superseded = 0
+        self._threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"lxrender-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, payload: Any, timeout: Optional[float] = None, dedupe_key: Optional[Hashable] = None,
+               supersede_key: Optional[Hashable] = None) -> Job:
+        with self._lock:
+            job = self._inflight.get(dedupe_key) if dedupe_key is not None else None
+            if job is not None and not job.done and not job.cancel_event.is_set():
+                self.coalesced += 1
+            else:
+                job = Job(payload, timeout=timeout if timeout is not None else self.timeout)
+                job.dedupe_key = dedupe_key
+                try:
+                    self._pending.put_nowait(job)
+                except queue.Full:
+                    raise QueueFull(self.retry_after())
+                self._jobs[job.id] = job
+                if dedupe_key is not None:
+                    self._inflight[dedupe_key] = job
+                self._trim()
+            job.owners[supersede_key] = job.owners.get(supersede_key, 0) + 1
+            if supersede_key is not None:
+                self._supersede(supersede_key, job)
+        return job
+
+    def _supersede(self, key: Hashable, job: Job):
+        old = self._latest.get(key)
+        self._latest[key] = job
+        if old is None or old is job or old.done:
+            return
+        old.owners.pop(key, None)
+        if not old.owners:
+            # Nobody is waiting for it any more: drop it from the queue or kill its run
+            old.superseded_by = job.id
+            old.cancel()
+            self.superseded += 1
+
+    def add_finished(self, payload: Any, result: Any, supersede_key: Optional[Hashable] = None) -> Job:
+        """
+        Records a job that was satisfied without running, e.g. from a cache.
+        Like a submission, it supersedes the unfinished job of `supersede_key`.
+        """
+        job = Job(payload)
+        job.status = "done"
+        job.started_at = job.finished_at = job.created_at
+        job.result = result
+        job.future.set_result(result)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+            if supersede_key is not None:
+                self._supersede(supersede_key, job)
+                # Already finished, so it must not be superseded itself later
+                del self._latest[supersede_key]
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str, owner: Optional[Hashable] = None) -> Optional[Job]:
+        """
+        Withdraws `owner` (a supersede key, None for submitters without one)
+        from a job; the job is cancelled once nobody is waiting for it. A
+        caller that is not among the owners stands for the job's only owner.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return job
+            if owner not in job.owners and len(job.owners) == 1:
+                owner = next(iter(job.owners))
+            if owner in job.owners:
+                job.owners[owner] -= 1
+                if job.owners[owner] <= 0:
+                    del job.owners[owner]
+            if not job.owners:
+                job.cancel()
+        return job
+
+    def retry_after(self) -> int:
+        """Rough time until a slot frees up, based on recent job durations."""
+        backlog = self._pending.qsize() + self._running
+        return max(1, int(self._avg_duration * backlog / self.workers))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._pending.qsize(),
+            "running": self._running,
+            "max_pending": self._pending.maxsize,
+            "coalesced": self.coalesced,
+            "superseded": self.superseded,
+        }
+
+    def _trim(self):
+        # Forget the oldest finished jobs once more than `keep` are tracked
+        excess = len(self._jobs) - self.keep
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].done:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _finished(self, job: Job):
+        with self._lock:
+            if job.dedupe_key is not None and self._inflight.get(job.dedupe_key) is job:
+                del self._inflight[job.dedupe_key]
+            for key in job.owners:
+                if key is not None and self._latest.get(key) is job:
+                    del self._latest[key]
+
+    def _worker(self):
+        while True:
+            job = self._pending.get()
+            if job.cancel_event.is_set():
+                job.status = "cancelled"
+                job.started_at = job.finished_at = time.time()
+                self._finished(job)
+                job.future.set_result(None)
+                self._pending.task_done()
+                continue
+            with self._lock:
+                self._running += 1
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = self.handler(job)
+                job.status = "cancelled" if job.cancel_event.is_set() else "done"
+                self._finished(job)
+                job.future.set_result(job.result)
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+                self._finished(job)
+                job.future.set_exception(e)
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self._running -= 1
+                    duration = job.finished_at - job.started_at
+                    self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+                self._pending.task_done()
@@ -0,0 +1,259 @@
+import re
+from bisect import bisect_right
+from typing import Iterator, List, Optional, Tuple
+
+import frontmatter
+
+from .incremental import split_blocks
+from .mathspans import iter_math
+from .renderer import collect_math, get_markdown_parser
+
+FENCE_BLOCK_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})[^\n]*\n[\s\S]*?(?:^ {0,3}\1[^\n]*$|\Z)", re.M)
+CODESPAN_RE = re.compile(r"(`+)[\s\S]*?\1")
+# Link destinations and autolinks, which may hold dollars of their own
+LINK_TARGET_RE = re.compile(r"\]\([^)\s]*|<[A-Za-z][A-Za-z0-9.+-]{1,31}:[^<>\s]*>")
+# A control sequence, an escaped character, or a single significant character
+MATH_TOKEN_RE = re.compile(r"\\[A-Za-z]+\*?|\\.|[{}#&%^_]", re.S)
+ENV_RE = re.compile(r"\{([A-Za-z*]+)\}")
+
+# Environments in which & separates columns
+ALIGN_ENVS = {"aligned", "align", "align*", "array", "matrix", "pmatrix", "bmatrix", "Bmatrix",
+              "vmatrix", "Vmatrix", "smallmatrix", "cases", "split", "gathered", "alignedat",
+              "tabular", "eqnarray", "eqnarray*", "alignat", "alignat*", "dcases", "rcases"}
+
+# TeX log: "! Message" ... "l.123 context", or "./file.tex:123: Message" with -file-line-error
+LOG_ERROR_RE = re.compile(r"^! (.*)$")
+LOG_LINE_RE = re.compile(r"^l\.(\d+) ?(.*)$")
+LOG_FILE_LINE_RE = re.compile(r"^(?:\./)?([^\s:][^:]*\.tex):(\d+): (.*)$")
+
+
+class SourceError:
+    """A problem located in the Markdown source (1-based line and column)."""
+
+    def __init__(self, message: str, line: Optional[int] = None, column: Optional[int] = None,
+                 context: str = "", source: str = "lint"):
+        self.message = message
+        self.line = line
+        self.column = column
+        self.context = context
+        # "lint" for pre-flight checks, "tex" for errors parsed from the TeX log
+        self.source = source
+
+    def __str__(self):
+        where = f"{self.line}:{self.column}" if self.column else f"{self.line}" if self.line else "?"
+        text = f"{where}: {self.message}"
+        return f"{text}  [{self.context}]" if self.context else text
+
+    def to_dict(self) -> dict:
+        return {"line": self.line, "column": self.column, "message": self.message,
+                "context": self.context, "source": self.source}
+
+
+def _mask(text: str, pattern: re.Pattern) -> str:
+    # Replaces matches with spaces (keeping newlines) so offsets stay valid
+    return pattern.sub(lambda m: re.sub(r"[^\n]", " ", m.group(0)), text)
+
+
+def math_spans(md_body: str) -> Iterator[Tuple[int, str, bool]]:
+    """
+    Yields (offset of the formula text, formula, is_display) for every
+    formula the parser finds, so dollars in indented code, link targets or
+    raw HTML are never linted. Offsets come from matching the parser's
+    formulas, in order, against the dollar spans of each block.
+    """
+    offset = 0
+    for block in split_blocks(md_body):
+        if "$" in block:
+            for start, formula, display in _block_spans(block):
+                yield offset + start, formula, display
+        offset += len(block)
+
+
+def _block_spans(block: str) -> Iterator[Tuple[int, str, bool]]:
+    masked = _mask(_mask(_mask(block, FENCE_BLOCK_RE), CODESPAN_RE), LINK_TARGET_RE)
+    candidates = list(iter_math(masked))
+    i = 0
+    cursor = 0
+    for formula, display in collect_math(block):
+        for j in range(i, len(candidates)):
+            start, end, is_display = candidates[j]
+            if is_display == display and block[start:end] == formula:
+                i, cursor = j + 1, end
+                yield start, formula, display
+                break
+        else:
+            # A formula continued on a quoted or indented line reads differently in the source
+            found = block.find(formula.split("\n", 1)[0], cursor)
+            yield (found if found >= 0 else cursor), formula, display
+
+
+def check_formula(formula: str, display: bool) -> List[Tuple[int, str]]:
+    """Returns (offset within formula, message) for each problem found."""
+    problems = []
+    braces = []
+    envs = []
+    lefts = []
+    for m in MATH_TOKEN_RE.finditer(formula):
+        tok, pos = m.group(0), m.start()
+        if tok == "{":
+            braces.append(pos)
+        elif tok == "}":
+            if braces:
+                braces.pop()
+            else:
+                problems.append((pos, "Unmatched closing brace '}'"))
+        elif tok == "#":
+            problems.append((pos, "'#' is not allowed in math, write \\#"))
+        elif tok == "%":
+            problems.append((pos, "'%' starts a TeX comment and hides the rest of the line, write \\%"))
+        elif tok == "&":
+            if not any(env in ALIGN_ENVS for env, _ in envs):
+                problems.append((pos, "'&' outside an alignment environment, write \\& or use aligned"))
+        elif tok in ("^", "_"):
+            rest = formula[m.end():].lstrip()
+            if not rest or rest[0] in "}^_":
+                problems.append((pos, f"'{tok}' is missing its argument"))
+        elif tok in ("\\begin", "\\end"):
+            env = ENV_RE.match(formula, m.end())
+            if not env:
+                problems.append((pos, f"{tok} without an environment name"))
+            elif tok == "\\begin":
+                envs.append((env.group(1), pos))
+            elif not envs:
+                problems.append((pos, f"\\end{{{env.group(1)}}} without \\begin"))
+            elif envs[-1][0] != env.group(1):
+                problems.append((pos, f"\\end{{{env.group(1)}}} closes \\begin{{{envs[-1][0]}}}"))
+                envs.pop()
+            else:
+                envs.pop()
+        elif tok == "\\left":
+            lefts.append(pos)
+        elif tok == "\\right":
+            if lefts:
+                lefts.pop()
+            else:
+                problems.append((pos, "\\right without \\left"))
+    problems += [(pos, "Unclosed brace '{'") for pos in braces]
+    problems += [(pos, f"\\begin{{{env}}} is never closed") for env, pos in envs]
+    problems += [(pos, "\\left without \\right") for pos in lefts]
+    if formula.rstrip().endswith("\\") and not formula.rstrip().endswith("\\\\"):
+        problems.append((len(formula.rstrip()) - 1, "Formula ends with a lone backslash"))
+    if not display and "\n\n" in formula:
+        problems.append((formula.index("\n\n"), "Inline math spans a blank line"))
+    return sorted(problems)
+
+
+def _line_starts(text: str) -> List[int]:
+    starts = [0]
+    starts.extend(i + 1 for i, ch in enumerate(text) if ch == "\n")
+    return starts
+
+
+def _locate(starts: List[int], offset: int) -> Tuple[int, int]:
+    line = bisect_right(starts, offset)
+    return line, offset - starts[line - 1] + 1
+
+
+def body_line_offset(text: str, body: str) -> int:
+    """Number of lines before the Markdown body in a document with frontmatter."""
+    if not body:
+        return 0
+    index = text.find(body)
+    return text[:index].count("\n") if index > 0 else 0
+
+
+def lint_markdown(text: str) -> List[SourceError]:
+    """
+    Checks every $...$ and $$...$$ span of a Markdown document (frontmatter
+    allowed) for errors TeX would stop on. Lines and columns refer to `text`.
+    """
+    try:
+        body = frontmatter.loads(text).content
+    except Exception as e:
+        return [SourceError(f"Invalid frontmatter: {e}", line=1)]
+    return lint_body(body, body_line_offset(text, body))
+
+
+def lint_body(md_body: str, line_offset: int = 0) -> List[SourceError]:
+    """lint_markdown() for a body without frontmatter that starts after `line_offset` lines."""
+    starts = _line_starts(md_body)
+    errors = []
+    for start, formula, display in math_spans(md_body):
+        for pos, message in check_formula(formula, display):
+            line, column = _locate(starts, start + pos)
+            snippet = formula.strip().replace("\n", " ")
+            errors.append(SourceError(message, line + line_offset, column,
+                                      snippet[:60] + ("..." if len(snippet) > 60 else "")))
+    return errors
+
+
+class SourceMap:
+    """
+    Maps lines of the converted LaTeX body back to Markdown lines, at the
+    granularity of the top-level blocks from split_blocks().
+    """
+
+    def __init__(self, md_body: str = "", md_line_offset: int = 0):
+        parser = get_markdown_parser()
+        self.tex_starts, self.md_starts = [], []
+        self._tex_line, self._md_line = 1, 1 + md_line_offset
+        for block in split_blocks(md_body):
+            self.add(block, parser(block))
+
+    def add(self, block: str, tex: str):
+        """Appends the next block and its converted LaTeX (for maps built while converting)."""
+        self.tex_starts.append(self._tex_line)
+        self.md_starts.append(self._md_line)
+        self._tex_line += tex.count("\n")
+        self._md_line += block.count("\n")
+
+    def md_line(self, body_line: int) -> Optional[int]:
+        i = bisect_right(self.tex_starts, body_line) - 1
+        return self.md_starts[i] if i >= 0 else None
+
+
+def parse_tex_log(log: str) -> List[Tuple[Optional[str], Optional[int], str, str]]:
+    """
+    Extracts errors from a TeX log or latexmk output as
+    (file, line, message, context). `file` is None when the log has no
+    -file-line-error prefix.
+    """
+    errors = []
+    lines = log.splitlines()
+    i = 0
+    while i < len(lines):
+        text = lines[i]
+        m = LOG_FILE_LINE_RE.match(text)
+        bang = LOG_ERROR_RE.match(text)
+        if m or bang:
+            file, line, message = (m.group(1), int(m.group(2)), m.group(3)) if m else (None, None, bang.group(1))
+            context = ""
+            # The "l.<n> <context>" line follows within a few lines
+            for j in range(i + 1, min(i + 12, len(lines))):
+                lm = LOG_LINE_RE.match(lines[j])
+                if lm:
+                    line = line or int(lm.group(1))
+                    context = lm.group(2).strip()
+                    i = j
+                    break
+            entry = (file, line, message.strip(), context)
+            if entry not in errors:
+                errors.append(entry)
+        i += 1
+    return errors
+
+
+def map_tex_errors(log: str, source_map: SourceMap, body_start: int,
+                   main: str = "document.tex") -> List[SourceError]:
+    """
+    Turns TeX log errors into SourceErrors on Markdown lines. `body_start`
+    is the line of the main .tex where the body begins.
+    """
+    errors = []
+    for file, line, message, context in parse_tex_log(log):
+        md = None
+        if line is not None and (file is None or file.endswith(main)):
+            if line >= body_start:
+                md = source_map.md_line(line - body_start + 1)
+        errors.append(SourceError(message, md, None, context, source="tex"))
+    return errors
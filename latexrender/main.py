@@ -1,23 +1,77 @@
 import argparse
-import shutil
-import subprocess
+import sys
+import time
 from pathlib import Path
 from typing import Optional, List
 
 import frontmatter
-from .renderer import get_markdown_parser
-from .templates import ARTICLE_TEMPLATE
+from .assets import IMAGE_EXTENSIONS, AssetStore, link_or_copy, resolve_image, safe_relative, template_image_refs
+from .backends import CompileBackend, LocalBackend
+from .batch import expand_inputs, print_summary, run_batch
+from .compiler import MODES, CompileTimeout, compile_command, remove_intermediates
+from .convert import convert_body, fill_template
+from .formats import FormatCache
+from .images import ImageOptimizer
+from .incremental import BlockCache, IncrementalConverter
+from .lint import SourceMap, body_line_offset, lint_markdown, map_tex_errors
+from .metrics import StageTimer, TexPasses
+from .renderer import collect_image_urls, get_markdown_parser
+from .streaming import StreamingConverter, lint_file
+from .templates import TemplateRegistry, default_registry
+from .watch import Watcher
+
+DEFAULT_FORMAT_DIR = Path.home() / ".cache" / "lxrender" / "formats"
+DEFAULT_ASSET_DIR = Path.home() / ".cache" / "lxrender" / "assets"
+DEFAULT_IMAGE_DIR = Path.home() / ".cache" / "lxrender" / "images"
 
 class LaTeXRenderer:
     """
     Core engine to convert Markdown to LaTeX and manage compilation.
     """
     
-    IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.pdf', '.svg'}
+    IMAGE_EXTENSIONS = IMAGE_EXTENSIONS
 
-    def __init__(self, input_path: str, output_path: Optional[str] = None, template: str = 'matnoble'):
+    def __init__(self, input_path: str, output_path: Optional[str] = None, template: str = 'matnoble',
+                 fmt: Optional[Path] = None, converter: Optional[IncrementalConverter] = None,
+                 assets: Optional[AssetStore] = None, images: Optional[ImageOptimizer] = None,
+                 mode: str = "final", streaming: bool = False,
+                 backend: Optional[CompileBackend] = None, templates: Optional[TemplateRegistry] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown compile mode: {mode}")
         self.input_path = Path(input_path)
         self.template = template
+        # Where the template's settings (header, preamble fields, layout) come from
+        self.templates = templates or default_registry()
+        # "final": full latexmk build; "draft": one pass, no TOC, image placeholders
+        self.mode = mode
+        # Precompiled preamble format; when set the preamble is loaded from it
+        self.fmt = Path(fmt) if fmt else None
+        # Block-level converter; when set only changed blocks are re-parsed
+        self.converter = converter
+        # Convert the input file block by block, never holding the whole document
+        self.streaming = streaming
+        # Where TeX runs; a SpoolBackend hands the work dir to worker processes
+        self.backend = backend or LocalBackend()
+        # Shared resource store; resources are copied straight from resource_dir without one
+        self.assets = assets
+        # Downsamples Markdown images for print before they are placed in the build dir
+        self.images = images
+        # Bytes saved by image optimization in the last _copy_resources()
+        self.image_bytes_saved = 0
+        # Image URLs found by the last render()
+        self.image_urls = None
+        # Seconds per stage (frontmatter, scan, convert, template, write, resources, compile, clean)
+        self.timings = StageTimer()
+        # Duration of each TeX engine run in the last compile()
+        self.tex_passes = []
+        # Source of the last render(), None when it was read from input_path
+        self._source = None
+        # Where the Markdown body sits in the source and the converted body in the .tex,
+        # recorded by render() so TeX errors can be mapped back (see tex_errors)
+        self._md_body = ""
+        self._md_line_offset = 0
+        self._body_start = 1
+        self._source_map = None
         self.output_path = Path(output_path) if output_path else self._get_default_output()
         self.output_dir = self.output_path.parent
         self.parser = get_markdown_parser()
@@ -30,125 +84,230 @@ class LaTeXRenderer:
 
     def _copy_resources(self, resource_dir: Path):
         """
-        Copies resources while maintaining path compatibility for Markdown.
+        Materializes the .cls and only the images the document and template
+        actually use, while maintaining path compatibility for Markdown.
+        Files are hardlinked (or reflinked) from the asset store when possible.
         """
+        with self.timings.stage("resources"):
+            self._place_resources(Path(resource_dir))
+
+    def _place_resources(self, resource_dir: Path):
         if not resource_dir.exists():
             return
-            
-        # 1. Copy .cls file to the root of output_dir (where .tex is)
+        place = self.assets.materialize if self.assets else link_or_copy
+
+        # 1. .cls file goes to the root of output_dir (where .tex is)
         cls_file = resource_dir / f"{self.template}.cls"
+        spec = self._spec()
+        cls_source = ""
         if cls_file.exists():
-            shutil.copy2(cls_file, self.output_dir / cls_file.name)
+            place(cls_file, self.output_dir / cls_file.name)
+            # The registry already holds the source when it manages this resource dir
+            same = spec.cls_path is not None and spec.cls_path.parent.resolve() == resource_dir.resolve()
+            cls_source = spec.cls_source if same else cls_file.read_text(encoding="utf-8", errors="replace")
+
+        # 2. Images referenced from Markdown keep their relative path, so 'doc/image.png' still resolves
+        urls = self.image_urls
+        if urls is None:
+            source = self.input_path.read_text(encoding="utf-8") if self.input_path.exists() else ""
+            urls = collect_image_urls(frontmatter.loads(source).content)
+        self.image_bytes_saved = 0
+        for url in urls:
+            rel = safe_relative(url)
+            src = resolve_image(resource_dir, url, self.IMAGE_EXTENSIONS)
+            if rel and src:
+                # Draft builds only draw boxes, so the images are never decoded
+                if self.images and self.mode != "draft":
+                    optimized = self.images.process(src)
+                    self.image_bytes_saved += src.stat().st_size - optimized.stat().st_size
+                    src = optimized
+                place(src, self.output_dir / rel)
+
+        # 3. Images used by the template or class itself (logos) are looked up next to the .tex
+        for name in template_image_refs(spec.layout, cls_source):
+            src = resolve_image(resource_dir, name, self.IMAGE_EXTENSIONS)
+            if src:
+                place(src, self.output_dir / src.name)
 
-        # 2. Recreate 'doc' directory in output_dir to support 'doc/image.png' paths
-        # This is a 'First Principles' fix for relative path consistency.
-        target_doc_dir = self.output_dir / "doc"
-        target_doc_dir.mkdir(exist_ok=True)
-        
-        for item in resource_dir.iterdir():
-            if item.suffix.lower() in self.IMAGE_EXTENSIONS:
-                shutil.copy2(item, target_doc_dir / item.name)
+    def _spec(self):
+        return self.templates.resolve(self.template)
 
     def _get_header(self, metadata: dict) -> str:
-        title = metadata.get("title", "Untitled Document")
-        subtitle = metadata.get("subtitle", "")
-        author = metadata.get("author", "MatNoble")
-        
-        if self.template == "matnoble-teaching":
-            return r"\maketitle"
-            
-        subtitle_fmt = rf"\large \textsf{{—— {subtitle} ——}}" if subtitle else ""
-        return rf"""
-\begin{{center}}
-    \vspace*{{1cm}}
-    \huge \bfseries {title}
-    \vspace{{0.5em}} \\
-    {subtitle_fmt}
-    \vspace{{1.5cm}}
-    
-    %% 个人信息卡片
-    \begin{{tcolorbox}}[colback=gray!5!white, colframe=black, width=0.8\textwidth, sharp corners]
-        \centering
-        \textbf{{整理：{author}}} \\[0.5em]
-        \small
-        微信公众号：\textbf{{数学思维探究社}} 	 | 	 博客：\url{{blog.matnoble.top}}
-    \end{{tcolorbox}}
-\end{{center}}
-"""
-
-    def render(self) -> bool:
+        return self._spec().header(metadata)
+
+    def render(self, source: Optional[str] = None) -> bool:
+        """
+        Converts the input file, or `source` if given, and writes the .tex output.
+        """
         try:
             self._ensure_output_dir()
-            with open(self.input_path, 'r', encoding='utf-8') as f:
-                post = frontmatter.load(f)
-            
-            metadata = post.metadata
-            md_body = post.content
-            tex_body = self.parser(md_body)
-            
-            extra_preamble = []
-            if self.template == "matnoble-teaching":
-                fields = {
-                    "course": "course",
-                    "teaching_class": "teachingclass",
-                    "teaching_time": "teachingtime",
-                    "lesson_type": "lessonType"
-                }
-                for key, cmd in fields.items():
-                    if val := metadata.get(key):
-                        extra_preamble.append(rf"\{cmd}{{{val}}}")
-
-            full_tex = ARTICLE_TEMPLATE % {
-                "doc_class": self.template,
-                "title": metadata.get("title", "Untitled"),
-                "author": metadata.get("author", "MatNoble"),
-                "date": metadata.get("date", r"\today"),
-                "extra_preamble": "\n".join(extra_preamble),
-                "header": self._get_header(metadata),
-                "content": tex_body
-            }
-
-            with open(self.output_path, 'w', encoding='utf-8') as f:
+            self._source = source
+            if source is None and self.streaming:
+                return self._render_stream()
+            if source is None:
+                source = self.input_path.read_text(encoding='utf-8')
+            with self.timings.stage("frontmatter"):
+                post = frontmatter.loads(source)
+            with self.timings.stage("scan"):
+                self.image_urls = collect_image_urls(post.content)
+            with self.timings.stage("convert"):
+                body = self.converter.convert(post.content).tex if self.converter else convert_body(post.content)
+            with self.timings.stage("template"):
+                fmt = self.fmt is not None
+                spec = self._spec()
+                full_tex = fill_template(post.metadata, body, spec, fmt=fmt, mode=self.mode)
+            self._md_body = post.content
+            self._source_map = None
+            self._md_line_offset = body_line_offset(source, post.content)
+            self._body_start = full_tex[:full_tex.find(body)].count("\n") + 1 if body else 1
+
+            with self.timings.stage("write"), open(self.output_path, 'w', encoding='utf-8') as f:
                 f.write(full_tex)
             return True
         except Exception as e:
             print(f"Render Error: {e}")
             return False
 
-    def compile(self, clean: bool = True, resource_dir: Optional[Path] = None) -> bool:
+    def _render_stream(self) -> bool:
+        stream = StreamingConverter(self.timings)
+        stream.convert(self.input_path, self.output_path, self._spec(), fmt=self.fmt is not None,
+                       mode=self.mode)
+        self.image_urls = stream.image_urls
+        self._source_map = stream.source_map
+        self._body_start = stream.body_start
+        return True
+
+    def compile(self, clean: bool = True, resource_dir: Optional[Path] = None,
+                timeout: Optional[float] = None) -> bool:
         if resource_dir:
             self._copy_resources(resource_dir)
             
-        # Use -pdf and -pdflatex to ensure proper xelatex handling
-        cmd = ["latexmk", "-pdf", "-pdflatex=xelatex %O %S", "-interaction=nonstopmode", self.output_path.name]
+        fmt_name = FormatCache.install(self.fmt, self.output_dir) if self.fmt else None
+        cmd = compile_command(self.output_path.name, fmt=fmt_name, mode=self.mode)
+        passes = TexPasses()
         try:
-            # Capture both stdout and stderr for better debugging
-            result = subprocess.run(cmd, cwd=self.output_dir, check=True, capture_output=True, text=True)
+            # stdout and stderr are merged for better debugging
+            with self.timings.stage("compile"):
+                result = self.backend.run(cmd, self.output_dir, timeout=timeout, on_line=passes)
+            passes.finish()
+            self.tex_passes = passes.durations
+            if result.returncode != 0 and self.fmt and FormatCache.is_format_error(result.stdout):
+                # e.g. dumped before a TeX Live upgrade: drop it and build from the plain preamble
+                print(f"Format Error: {self.fmt.name} was rejected, compiling without it.")
+                FormatCache.discard(self.fmt)
+                self.fmt = None
+                if not self.render(source=self._source):
+                    return False
+                return self.compile(clean=clean, timeout=timeout)
+            if result.returncode != 0:
+                errors = self.tex_errors(result.stdout)
+                if errors:
+                    for err in errors:
+                        print(f"Compile Error: {self.input_path}:{err}")
+                else:
+                    print(f"Compile Error:\n{result.stdout}")
+                return False
             if clean:
                 self.clean()
             return True
-        except subprocess.CalledProcessError as e:
-            print(f"Compile Error:\nSTDOUT: {e.stdout}\nSTDERR: {e.stderr}")
+        except CompileTimeout as e:
+            print(f"Compile Error: {e}")
             return False
         except Exception as e:
             print(f"System Error: {e}")
             return False
 
+    def lint(self, source: Optional[str] = None) -> list:
+        """Pre-flight math check of the input file (or `source`); returns SourceErrors."""
+        if source is None and self.streaming:
+            return lint_file(self.input_path)
+        if source is None:
+            source = self.input_path.read_text(encoding='utf-8')
+        return lint_markdown(source)
+
+    def tex_errors(self, log: str) -> list:
+        """Errors from a failed TeX run, located on Markdown lines of the last render()."""
+        source_map = self._source_map or SourceMap(self._md_body, self._md_line_offset)
+        return map_tex_errors(log, source_map, self._body_start, main=self.output_path.name)
+
     def clean(self):
-        cmd = ["latexmk", "-c", self.output_path.name]
-        subprocess.run(cmd, cwd=self.output_dir, capture_output=True)
+        """Removes the intermediate files of the last compile (in-process, no `latexmk -c`)."""
+        with self.timings.stage("clean"):
+            remove_intermediates(self.output_dir, self.output_path.name)
+
+def convert_md_to_tex(input_path: str, output_path: Optional[str] = None, template: str = 'matnoble') -> bool:
+    """Converts a Markdown file to a .tex file without compiling it."""
+    return LaTeXRenderer(input_path, output_path, template).render()
 
 def main():
     parser = argparse.ArgumentParser(description="LaTeX Renderer Core")
-    parser.add_argument("input", help="Input Markdown file")
-    parser.add_argument("-o", "--output", help="Output TeX file")
+    parser.add_argument("input", nargs="+", help="Input Markdown files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="Output TeX file (output directory in batch mode)")
     parser.add_argument("-t", "--template", default="matnoble", help="Template name")
     parser.add_argument("--compile", action="store_true")
     parser.add_argument("--clean", action="store_true")
+    parser.add_argument("--mode", choices=MODES, default="final",
+                        help="draft: single xelatex pass, no table of contents, image placeholders")
+    parser.add_argument("--no-fmt", action="store_true", help="Do not use a precompiled preamble format")
+    parser.add_argument("--stream", action="store_true",
+                        help="Convert block by block with bounded memory, for very large inputs")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Parallel workers in batch mode (default: CPU count)")
+    parser.add_argument("--check", choices=["mtime", "hash"], default="mtime",
+                        help="How batch mode decides an output is up to date")
+    parser.add_argument("--force", action="store_true", help="Rebuild outputs even if up to date")
+    parser.add_argument("--optimize-images", action="store_true",
+                        help="Downsample and re-encode images for print before compiling (needs Pillow)")
+    parser.add_argument("--image-dpi", type=int, default=200, help="Target resolution for --optimize-images")
+    parser.add_argument("--watch", action="store_true",
+                        help="Stay running and rebuild whenever the file, its images or the template change")
     args = parser.parse_args()
-    renderer = LaTeXRenderer(args.input, args.output, args.template)
+    fmt = None
+    if args.compile and not args.no_fmt:
+        fmt = FormatCache(DEFAULT_FORMAT_DIR).get(args.template, Path("doc"))
+    image_dpi = args.image_dpi if args.optimize_images else None
+    if image_dpi and not ImageOptimizer.available():
+        print("Image Error: Pillow is not installed, images are used as-is")
+        image_dpi = None
+
+    batch = len(args.input) > 1 or not Path(args.input[0]).is_file()
+    if args.watch and batch:
+        parser.error("--watch takes a single Markdown file")
+    if batch:
+        start = time.perf_counter()
+        inputs = expand_inputs(args.input)
+        if not inputs:
+            parser.error("no Markdown files matched")
+        results = run_batch(
+            inputs, outdir=Path(args.output) if args.output else None, template=args.template,
+            compile=args.compile, clean=args.clean, jobs=args.jobs, fmt=fmt,
+            resource_dir=Path("doc"), check=args.check, force=args.force, assets=DEFAULT_ASSET_DIR,
+            image_dpi=image_dpi, mode=args.mode, streaming=args.stream
+        )
+        print_summary(results, time.perf_counter() - start)
+        sys.exit(1 if any(r["status"] == "failed" for r in results) else 0)
+
+    renderer = LaTeXRenderer(args.input[0], args.output, args.template, fmt=fmt,
+                             assets=AssetStore(DEFAULT_ASSET_DIR),
+                             images=ImageOptimizer(DEFAULT_IMAGE_DIR, dpi=image_dpi) if image_dpi else None,
+                             mode=args.mode, streaming=args.stream,
+                             converter=IncrementalConverter(BlockCache()) if args.watch and not args.stream else None)
+    if args.watch:
+        watcher = Watcher(renderer, Path("doc"), compile=args.compile,
+                          formats=FormatCache(DEFAULT_FORMAT_DIR) if fmt else None)
+        try:
+            watcher.serve()
+        except KeyboardInterrupt:
+            pass
+        if args.clean:
+            renderer.clean()
+        return
     if renderer.render():
         if args.compile:
+            errors = renderer.lint()
+            if errors:
+                for err in errors:
+                    print(f"Math Error: {args.input[0]}:{err}")
+                sys.exit(1)
             renderer.compile(clean=args.clean, resource_dir=Path("doc"))
         elif args.clean:
             renderer.clean()
@@ -0,0 +1,55 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Iterator, Optional, Tuple
+
+# An escaped character (so "\$" is skipped but the "$" of "\\$" is not), or a dollar sign
+DOLLAR_RE = re.compile(r"\\.|\$", re.S)
+
+
+class DollarIndex:
+    """
+    Positions of the unescaped "$" in a text, collected in one pass. Finding
+    the delimiter that closes an opener is then a binary search, so a text
+    with many unmatched dollars (prices, shell variables) costs O(n log n)
+    instead of a scan to the end of the text per opener.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.singles = [m.start() for m in DOLLAR_RE.finditer(text) if m.group() == "$"]
+        # "$$" pairs; the second "$" is never escaped since it follows a "$"
+        self.doubles = [p for p, q in zip(self.singles, self.singles[1:]) if q == p + 1]
+
+    def inline_close(self, start: int) -> Optional[int]:
+        """Position of the "$" closing inline math opened at `start`."""
+        i = bisect_right(self.singles, start)
+        return self.singles[i] if i < len(self.singles) else None
+
+    def display_close(self, start: int) -> Optional[int]:
+        """Position of the "$$" closing display math opened at `start`; the formula is never empty."""
+        i = bisect_left(self.doubles, start + 3)
+        return self.doubles[i] if i < len(self.doubles) else None
+
+
+def iter_math(text: str) -> Iterator[Tuple[int, int, bool]]:
+    """
+    Yields (formula start, formula end, is_display) from left to right with
+    the same rules as the parser plugins: "$$" is tried first, an unclosed
+    "$$" leaves its second "$" free to open inline math.
+    """
+    index = DollarIndex(text)
+    pos = 0
+    for p in index.singles:
+        if p < pos:
+            continue
+        if text.startswith("$$", p):
+            q = index.display_close(p)
+            if q is not None:
+                yield p + 2, q, True
+                pos = q + 2
+            continue
+        q = index.inline_close(p)
+        if q is None:
+            return
+        yield p + 1, q, False
+        pos = q + 1
@@ -0,0 +1,173 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Every TeX engine run prints its banner first, whichever latexmk version drives it
+TEX_BANNER_RE = re.compile(r"^This is (?:XeTeX|pdfTeX|LuaHBTeX|LuaTeX|e-TeX|TeX)\b")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class StageTimer:
+    """Wall-clock seconds per named stage, in the order the stages first ran."""
+
+    def __init__(self):
+        self.stages = OrderedDict()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: round(seconds, 4) for name, seconds in self.stages.items()}
+
+
+class TexPasses:
+    """
+    `on_line` callback for run_latexmk that counts TeX engine runs and times
+    each one from its banner to the next banner (or to `finish()`).
+    Lines are forwarded to `forward` unchanged.
+    """
+
+    def __init__(self, forward: Optional[Callable[[str], None]] = None):
+        self.forward = forward
+        self.durations: List[float] = []
+        self._started = None
+
+    def __call__(self, line: str):
+        if TEX_BANNER_RE.match(line):
+            now = time.perf_counter()
+            if self._started is not None:
+                self.durations.append(now - self._started)
+            self._started = now
+        if self.forward:
+            self.forward(line)
+
+    def finish(self):
+        if self._started is not None:
+            self.durations.append(time.perf_counter() - self._started)
+            self._started = None
+
+    @property
+    def count(self) -> int:
+        return len(self.durations) + (self._started is not None)
+
+
+# --- Prometheus text exposition (format 0.0.4) ---
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name, self.help = name, help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(value)}")
+        return lines
+
+
+class Gauge:
+    """A value read from `func` at scrape time."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, func: Callable[[], float]):
+        self.name, self.help, self.func = name, help, func
+
+    def collect(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}",
+                f"{self.name} {_num(self.func())}"]
+
+
+class CounterFunc(Gauge):
+    """A running total kept elsewhere (e.g. cache hits), read from `func` at scrape time."""
+
+    type = "counter"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name, self.help = name, help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            counts, total = self._series.get(labels, ([0] * len(self.buckets), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[labels] = (counts, total + value)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    le = _labels(self.labelnames, labels, f'le="{_num(bound)}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                base = _labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{base} {_num(total)}")
+                lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collects metrics and renders them for a Prometheus scrape."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
@@ -1,5 +1,6 @@
 import mistune
 from mistune import HTMLRenderer
+from .mathspans import DollarIndex
 from .utils import escape_latex
 
 
@@ -172,28 +173,45 @@ class LaTeXRenderer(HTMLRenderer):
 # --- 自定义插件逻辑 ---
 
 
+def _dollar_index(state):
+    """
+    Dollar positions of the text being parsed, computed once per inline
+    state (nested states such as link text get their own).
+    """
+    index = getattr(state, "_dollar_index", None)
+    if index is None or index.text is not state.src:
+        index = DollarIndex(state.src)
+        state._dollar_index = index
+    return index
+
+
 def parse_inline_display_math(inline, m, state):
     """
     解析行内的 $$ ... $$
     """
-    # 提取公式内容
-    formula_content = m.group(0)[2:-2]  # Manual extraction
+    # 正则只匹配开头的 $$，结尾由 DollarIndex 二分查找（跳过转义的 \$）
+    end = _dollar_index(state).display_close(m.start())
+    if end is None:
+        return None
+    formula_content = state.src[m.end():end]
 
     # 我们不使用 'raw'，因为 Mistune 的 render_token 对 'raw' 的处理可能不包含传递位置参数。
     # 我们将内容放入 'attrs' 字典中，Key 叫 'content'。
     # Mistune 渲染时会调用：renderer.display_math(**attrs) -> display_math(content=...)
     state.append_token({"type": "display_math", "attrs": {"content": formula_content}})
-    return m.end()
+    return end + 2
 
 
-def plugin_display_math(md):
-    # 正则：匹配 $...$，[\s\S] 允许跨行
-    PATTERN = r"\$\$([\s\S]+?)\$\$"
+# 正则：只匹配开头的 $$ 或单个 $，避免回溯扫描到文末
+DISPLAY_MATH_OPEN = r"\$\$"
+INLINE_MATH_OPEN = r"\$(?!\$)"
+
 
+def plugin_display_math(md):
     # 注册插件
 
     md.inline.register(
-        "display_math", PATTERN, parse_inline_display_math, before="inline_math"
+        "display_math", DISPLAY_MATH_OPEN, parse_inline_display_math, before="inline_math"
     )
 
 
@@ -204,24 +222,25 @@ def parse_inline_math(inline, m, state):
 
     """
 
-    formula_content = m.group(0)[1:-1]  # Manual extraction
+    end = _dollar_index(state).inline_close(m.start())
+    if end is None:
+        return None
+    formula_content = state.src[m.end():end]
 
     state.append_token({"type": "inline_math", "attrs": {"content": formula_content}})
 
-    return m.end()
+    return end + 1
 
 
 def plugin_inline_math(md):
 
-    # 正则：匹配 $...$
-
-    PATTERN = r"\$(?!\$)([^$]+?)(?<!\$)\$"
+    md.inline.register("inline_math", INLINE_MATH_OPEN, parse_inline_math, before="codespan")
 
-    md.inline.register("inline_math", PATTERN, parse_inline_math, before="codespan")
-
-
-def get_markdown_parser():
 
+def create_markdown_parser():
+    """
+    构建一个新的 Markdown -> LaTeX 解析器实例。
+    """
     markdown = mistune.create_markdown(renderer=LaTeXRenderer(), plugins=["table", "strikethrough"])
 
     plugin_display_math(markdown)
@@ -229,3 +248,55 @@ def get_markdown_parser():
     plugin_inline_math(markdown)
 
     return markdown
+
+
+# 模块级共享实例：mistune 每次调用都新建解析状态，渲染器本身无状态，
+# 因此同一实例可以在多个线程间安全复用。
+_PARSER = create_markdown_parser()
+_AST_PARSER = mistune.create_markdown(renderer=None, plugins=["table", "strikethrough"])
+_MATH_AST_PARSER = mistune.create_markdown(renderer=None, plugins=["table", "strikethrough"])
+plugin_display_math(_MATH_AST_PARSER)
+plugin_inline_math(_MATH_AST_PARSER)
+
+
+def get_markdown_parser():
+    """
+    返回共享的解析器实例（不再为每次转换重新构建）。
+    """
+    return _PARSER
+
+
+def collect_image_urls(md_body):
+    """
+    从 Markdown AST 中收集所有图片 URL（按出现顺序去重）。
+    """
+    urls = []
+
+    def walk(tokens):
+        for token in tokens:
+            if token.get("type") == "image":
+                url = token.get("attrs", {}).get("url")
+                if url and url not in urls:
+                    urls.append(url)
+            walk(token.get("children") or [])
+
+    walk(_AST_PARSER(md_body))
+    return urls
+
+
+def collect_math(md_body):
+    """
+    按出现顺序返回解析器识别出的公式 (formula, is_display)。
+    代码块、链接地址、HTML 中的 $ 不会被当作公式，与转换结果一致。
+    """
+    formulas = []
+
+    def walk(tokens):
+        for token in tokens:
+            kind = token.get("type")
+            if kind in ("inline_math", "display_math"):
+                formulas.append((token["attrs"]["content"], kind == "display_math"))
+            walk(token.get("children") or [])
+
+    walk(_MATH_AST_PARSER(md_body))
+    return formulas
@@ -0,0 +1,74 @@
+from typing import Iterator, Optional, Tuple
+
+# Artifact URLs contain the content hash, so a given URL never changes meaning
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+CHUNK_SIZE = 64 * 1024
+
+
+def strong_etag(digest: str) -> str:
+    return f'"{digest}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak comparison, as RFC 9110 requires for this header)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(_strip_weak(t.strip()) == etag for t in header.split(","))
+
+
+def _strip_weak(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a Range header into an inclusive (start, end) byte range.
+
+    Returns None when the whole file should be sent: no header, a unit other
+    than bytes, or several ranges (answering those with the full file is
+    allowed and PDF viewers only ask for one). Raises RangeNotSatisfiable
+    when the range lies outside the file.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    first, sep, last = spec.partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+def iter_file(path, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """Yields bytes start..end (inclusive) of a file in chunks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,135 @@
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import frontmatter
+
+from .convert import TemplateLike, template_parts
+from .incremental import FENCE_RE, LINK_DEF_RE, iter_blocks
+from .lint import SourceError, SourceMap, lint_body
+from .metrics import StageTimer
+from .renderer import collect_image_urls, get_markdown_parser
+
+FRONTMATTER_DELIM = "---"
+
+
+def read_frontmatter(lines: Iterator[str]) -> Tuple[dict, int, Iterator[str]]:
+    """
+    Consumes a leading YAML frontmatter block from `lines`. Returns the
+    metadata, the number of lines before the body and an iterator over the
+    body lines. Like frontmatter.loads(), leading whitespace of the body is
+    dropped.
+    """
+    first = next(lines, None)
+    if first is None:
+        return {}, 0, iter(())
+    if first.strip() != FRONTMATTER_DELIM:
+        return _strip_leading({}, 0, _chain(first, lines))
+    head = [first]
+    for line in lines:
+        head.append(line)
+        if line.strip() == FRONTMATTER_DELIM:
+            return _strip_leading(frontmatter.loads("".join(head)).metadata, len(head), lines)
+    # No closing delimiter: frontmatter.loads() treats the whole text as body
+    return _strip_leading({}, 0, iter(head))
+
+
+def _strip_leading(metadata: dict, skipped: int, lines: Iterator[str]) -> Tuple[dict, int, Iterator[str]]:
+    for line in lines:
+        if line.strip():
+            return metadata, skipped, _chain(line.lstrip(), lines)
+        skipped += 1
+    return metadata, skipped, iter(())
+
+
+def _chain(first: str, rest: Iterable[str]) -> Iterator[str]:
+    yield first
+    yield from rest
+
+
+def link_definitions(path: Path) -> str:
+    """Reference link definitions of a file (outside fenced code), read line by line."""
+    defs = []
+    fence = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if fence:
+                if line.strip().startswith(fence) and set(line.strip()) == {fence[0]}:
+                    fence = None
+                continue
+            m = FENCE_RE.match(line)
+            if m:
+                fence = m.group(1)
+            elif LINK_DEF_RE.match(line):
+                defs.append(line if line.endswith("\n") else line + "\n")
+    return "".join(defs)
+
+
+def lint_file(path: Path) -> List[SourceError]:
+    """lint_markdown() one block at a time; formulas never span blocks."""
+    errors = []
+    with open(path, encoding="utf-8") as f:
+        _, line, body = read_frontmatter(f)
+        for block in iter_blocks(body):
+            errors.extend(lint_body(block, line))
+            line += block.count("\n")
+    return errors
+
+
+class StreamingConverter:
+    """
+    Converts a Markdown file block by block and writes the LaTeX as it goes,
+    so memory stays bounded by the largest block instead of the document.
+    Output matches convert_markdown() except that reference links need their
+    definition in a separate pass over the file, which is done up front.
+    """
+
+    def __init__(self, timings: Optional[StageTimer] = None):
+        self.timings = timings if timings is not None else StageTimer()
+        self.metadata = {}
+        # Filled by convert(): image URLs in order, blocks converted, and a body line map
+        self.image_urls: List[str] = []
+        self.blocks = 0
+        self.source_map = SourceMap()
+        # Line of the output where the body starts
+        self.body_start = 1
+
+    def convert(self, input_path: Path, output_path: Path, template: TemplateLike = "matnoble",
+                fmt: bool = False, mode: str = "final"):
+        parser = get_markdown_parser()
+        with self.timings.stage("scan"):
+            defs = link_definitions(input_path)
+        tmp = output_path.with_name(f".{output_path.name}.part")
+        try:
+            with open(input_path, encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as out:
+                with self.timings.stage("frontmatter"):
+                    self.metadata, offset, body = read_frontmatter(src)
+                    head, tail = template_parts(self.metadata, template, fmt, mode)
+                self.source_map = SourceMap(md_line_offset=offset)
+                self.body_start = head.count("\n") + 1
+                out.write(head)
+                self._convert_blocks(iter_blocks(body), parser, defs, out)
+                out.write(tail)
+            os.replace(tmp, output_path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    def _convert_blocks(self, blocks: Iterator[str], parser, defs: str, out: TextIO):
+        timings = self.timings
+        seen = set()
+        for block in blocks:
+            # Definitions render to nothing but let references in this block resolve
+            text = f"{block}\n\n{defs}" if defs and "]" in block else block
+            with timings.stage("scan"):
+                if "![" in block:
+                    for url in collect_image_urls(text):
+                        if url not in seen:
+                            seen.add(url)
+                            self.image_urls.append(url)
+            with timings.stage("convert"):
+                tex = parser(text)
+            self.source_map.add(block, tex)
+            with timings.stage("write"):
+                out.write(tex)
+            self.blocks += 1
@@ -1,8 +1,17 @@
 # templates.py
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
 
 # 通用文章模版
 ARTICLE_TEMPLATE = r"""
 \documentclass{%(doc_class)s}
+%(dump_marker)s
 
 %% --- 核心元数据 ---
 \title{%(title)s}
@@ -20,7 +29,7 @@ ARTICLE_TEMPLATE = r"""
 %% --- 抬头/封面区 ---
 %(header)s
 
-\tableofcontents
+%(toc)s
 
 \vfill
 {\centering
@@ -36,3 +45,190 @@ ARTICLE_TEMPLATE = r"""
 
 \end{document}
 """
+
+
+# 默认抬头: 标题 + 个人信息卡片。模板可在 <name>.yml 中用 `header:` 改为
+# "maketitle"，或直接给出一段 TeX (可用 %(title)s %(subtitle)s %(author)s)
+CARD_HEADER = r"""
+\begin{center}
+    \vspace*{1cm}
+    \huge \bfseries %(title)s
+    \vspace{0.5em} \\
+    %(subtitle)s
+    \vspace{1.5cm}
+
+    %% 个人信息卡片
+    \begin{tcolorbox}[colback=gray!5!white, colframe=black, width=0.8\textwidth, sharp corners]
+        \centering
+        \textbf{整理：%(author)s} \\[0.5em]
+        \small
+        微信公众号：\textbf{数学思维探究社} 	 | 	 博客：\url{blog.matnoble.top}
+    \end{tcolorbox}
+\end{center}
+"""
+
+HEADERS = {
+    "card": CARD_HEADER,
+    "maketitle": r"\maketitle",
+}
+
+# Where the bundled templates live (the repository's doc/ directory)
+DEFAULT_RESOURCE_DIR = Path(__file__).resolve().parent.parent / "doc"
+
+
+class Template:
+    """
+    One document class and its settings, loaded from `<name>.cls` plus an
+    optional `<name>.yml` next to it:
+
+        header: maketitle          # "card" (default), "maketitle" or raw TeX
+        fields:                    # frontmatter key -> preamble command
+          course: course
+        preamble: |                # raw TeX added to every preamble
+          \\setlength{\\parskip}{0pt}
+        layout: layout.tex         # %-format document layout (default ARTICLE_TEMPLATE)
+
+    `digest` covers all of these files, so it changes whenever the output could.
+    """
+
+    def __init__(self, name: str, cls_path: Optional[Path] = None, settings: Optional[dict] = None,
+                 layout: str = ARTICLE_TEMPLATE, cls_source: str = "", digest: str = ""):
+        settings = settings or {}
+        self.name = name
+        self.cls_path = cls_path
+        self.cls_source = cls_source
+        self.layout = layout
+        self.header_tex = HEADERS.get(settings.get("header", "card"), settings.get("header"))
+        self.fields = dict(settings.get("fields") or {})
+        self.preamble = str(settings.get("preamble") or "").strip()
+        self.digest = digest
+        # Files this template was loaded from, watched for hot reload
+        self.sources = [cls_path] if cls_path else []
+
+    def header(self, metadata: dict) -> str:
+        subtitle = metadata.get("subtitle", "")
+        return self.header_tex % {
+            "title": metadata.get("title", "Untitled Document"),
+            "subtitle": rf"\large \textsf{{—— {subtitle} ——}}" if subtitle else "",
+            "author": metadata.get("author", "MatNoble"),
+        }
+
+    def extra_preamble(self, metadata: dict) -> str:
+        lines = [self.preamble] if self.preamble else []
+        for key, cmd in self.fields.items():
+            if val := metadata.get(key):
+                lines.append(rf"\{cmd}{{{val}}}")
+        return "\n".join(lines)
+
+    @classmethod
+    def load(cls, name: str, resource_dir: Path) -> "Template":
+        resource_dir = Path(resource_dir)
+        cls_path = resource_dir / f"{name}.cls"
+        h = hashlib.sha256()
+        cls_bytes = cls_path.read_bytes()
+        h.update(cls_bytes)
+        settings, sources = {}, []
+        settings_path = resource_dir / f"{name}.yml"
+        if settings_path.exists():
+            data = settings_path.read_bytes()
+            h.update(data)
+            settings = yaml.safe_load(data) or {}
+            if not isinstance(settings, dict):
+                raise ValueError(f"{settings_path.name} must be a mapping")
+            sources.append(settings_path)
+        layout = ARTICLE_TEMPLATE
+        if settings.get("layout"):
+            layout_path = resource_dir / settings["layout"]
+            layout = layout_path.read_text(encoding="utf-8")
+            sources.append(layout_path)
+        h.update(layout.encode("utf-8"))
+        template = cls(name, cls_path, settings, layout, cls_bytes.decode("utf-8", errors="replace"),
+                       h.hexdigest())
+        template.sources += sources
+        return template
+
+
+class TemplateRegistry:
+    """
+    The templates of a resource dir, loaded once and kept in memory.
+
+    Every `check_interval` seconds (at most, and only when asked for a
+    template) the files are stat'ed again: new .cls files appear, removed
+    ones disappear and a template whose .cls, .yml or layout changed is
+    reloaded. A template whose settings fail to load keeps its last good
+    version and the error is printed.
+    """
+
+    def __init__(self, resource_dir: Path, check_interval: float = 1.0):
+        self.resource_dir = Path(resource_dir)
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._templates: Dict[str, Template] = {}
+        # name -> stat signature of the files it was loaded from
+        self._signatures: Dict[str, tuple] = {}
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _signature(self, name: str) -> tuple:
+        paths = [self.resource_dir / f"{name}.cls", self.resource_dir / f"{name}.yml"]
+        if name in self._templates:
+            paths += [p for p in self._templates[name].sources if p not in paths]
+        sig = []
+        for path in paths:
+            try:
+                st = path.stat()
+                sig.append((st.st_size, st.st_mtime_ns))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def refresh(self, force: bool = False):
+        """Picks up added, removed and changed templates."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._checked is not None and now - self._checked < self.check_interval:
+                return
+            self._checked = now
+            names = {p.stem for p in self.resource_dir.glob("*.cls")} if self.resource_dir.is_dir() else set()
+            for name in set(self._templates) - names:
+                del self._templates[name]
+                del self._signatures[name]
+            for name in sorted(names):
+                sig = self._signature(name)
+                if self._signatures.get(name) == sig:
+                    continue
+                try:
+                    self._templates[name] = Template.load(name, self.resource_dir)
+                except (OSError, ValueError, yaml.YAMLError) as e:
+                    print(f"Template Error: {name}: {e}")
+                    if name not in self._templates:
+                        continue
+                else:
+                    if name in self._signatures:
+                        self.reloads += 1
+                    # Now including the layout file the settings point at
+                    sig = self._signature(name)
+                self._signatures[name] = sig
+
+    def names(self) -> List[str]:
+        self.refresh()
+        return sorted(self._templates)
+
+    def get(self, name: str) -> Optional[Template]:
+        self.refresh()
+        return self._templates.get(name)
+
+    def resolve(self, name: str) -> Template:
+        """The named template, or one with default settings if it is not in this registry."""
+        return self.get(name) or Template(name)
+
+
+_default_registry = None
+
+
+def default_registry() -> TemplateRegistry:
+    """Registry of the bundled templates, used when no other registry is given."""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = TemplateRegistry(DEFAULT_RESOURCE_DIR)
+    return _default_registry
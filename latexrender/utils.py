@@ -1,22 +1,22 @@
 # utils.py
-import re
+
+# 一次性构建转义表，避免每个文本节点重复编译正则和字典
+LATEX_ESCAPES = str.maketrans({
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\textasciicircum{}',
+    '\\': r'\textbackslash{}',
+})
 
 def escape_latex(text):
     """
     转义 LaTeX 中的特殊字符。
     仅用于普通文本节点，不用于公式或代码块。
     """
-    replacements = {
-        '&': r'\&',
-        '%': r'\%',
-        '$': r'\$',
-        '#': r'\#',
-        '_': r'\_',
-        '{': r'\{',
-        '}': r'\}',
-        '~': r'\textasciitilde{}',
-        '^': r'\textasciicircum{}',
-        '\\': r'\textbackslash{}',
-    }
-    pattern = re.compile("|".join(re.escape(k) for k in replacements))
-    return pattern.sub(lambda m: replacements[m.group(0)], text)
\ No newline at end of file
+    return text.translate(LATEX_ESCAPES)
@@ -0,0 +1,96 @@
+import shutil
+import subprocess
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# Fonts the bundled templates look up through fontconfig (see doc/*.cls)
+CJK_FONTS = ("Noto Serif CJK SC", "Noto Sans CJK SC", "Source Han Serif SC", "Source Han Sans SC")
+
+# Small document that still touches everything a first real compile loads lazily:
+# the class, CJK and math fonts, hyperref and the table of contents
+WARMUP_DOCUMENT = """---
+title: Warmup
+---
+
+# 预热 Warmup
+
+中文正文 with **bold**, *italic* and `code`, inline $e^{i\\pi} + 1 = 0$ and
+
+$$\\int_0^1 x^2 \\, dx = \\frac{1}{3}$$
+"""
+
+
+def prime_fonts(families=CJK_FONTS, timeout: float = 120) -> bool:
+    """
+    Builds the fontconfig cache and resolves each family once, so the first
+    xelatex run does not pay for scanning the (large) CJK font files.
+    Returns False if fontconfig is not installed.
+    """
+    if shutil.which("fc-cache") is None:
+        return False
+    result = subprocess.run(["fc-cache"], capture_output=True, timeout=timeout)
+    if shutil.which("fc-match"):
+        for family in families:
+            subprocess.run(["fc-match", family], capture_output=True, timeout=timeout)
+    return result.returncode == 0
+
+
+class Warmup:
+    """
+    Runs named startup steps once, in order, on a background thread and
+    records how each went. `ready` turns true only when every step has
+    finished (successfully or not: a failed step is reported, not retried),
+    which is what a readiness probe should wait for.
+
+    A step returns a falsy value or raises to mark itself failed.
+    """
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], object]]]):
+        self.steps = list(steps)
+        self.results = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def run(self):
+        self.started_at = time.time()
+        try:
+            for name, step in self.steps:
+                start = time.perf_counter()
+                error = None
+                try:
+                    ok = bool(step())
+                except Exception as e:
+                    ok, error = False, str(e)
+                self.results.append({"step": name, "ok": ok, "seconds": round(time.perf_counter() - start, 3),
+                                     "error": error})
+                if not ok:
+                    print(f"Warmup Error: {name} failed" + (f": {error}" if error else ""))
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        if self.ready:
+            status = "ready"
+        else:
+            status = "warming" if self.started_at else "pending"
+        return {
+            "status": status,
+            "steps": list(self.results),
+            "remaining": len(self.steps) - len(self.results),
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+        }
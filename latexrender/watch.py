@@ -0,0 +1,130 @@
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .assets import resolve_image
+from .cache import file_digest
+from .formats import FormatCache
+
+
+class Watcher:
+    """
+    Keeps one renderer warm and rebuilds whenever its inputs change: the
+    Markdown file, the images it references and the template .cls/.yml.
+
+    Files are polled (no extra dependency), and a burst of saves is
+    debounced into one build once nothing has changed for `debounce`
+    seconds. A save that leaves the bytes as they were (editor touch,
+    `git checkout` of the same content) does not trigger a build. The
+    Markdown is only re-converted when its text changed; a changed image or
+    class alone goes straight to the compile. Intermediate files are kept
+    between compiles, so latexmk reruns incrementally in the same directory.
+    """
+
+    def __init__(self, renderer, resource_dir: Path, compile: bool = True,
+                 formats: Optional[FormatCache] = None, debounce: float = 0.3, poll: float = 0.2):
+        self.renderer = renderer
+        self.resource_dir = Path(resource_dir)
+        self.compile = compile
+        # Re-checked before each compile, so an edited .cls gets a fresh format
+        self.formats = formats
+        self.debounce = debounce
+        self.poll = poll
+        self.builds = 0
+        # path -> (size, mtime_ns) when last looked at, and content digest when last built
+        self._stats: Dict[Path, Optional[tuple]] = {}
+        self._digests: Dict[Path, Optional[str]] = {}
+        self._source_digest = None
+
+    def watched_paths(self) -> List[Path]:
+        template = self.renderer.template
+        paths = [self.renderer.input_path,
+                 self.resource_dir / f"{template}.cls",
+                 self.resource_dir / f"{template}.yml"]
+        for url in self.renderer.image_urls or []:
+            image = resolve_image(self.resource_dir, url, self.renderer.IMAGE_EXTENSIONS)
+            if image is not None:
+                paths.append(image)
+        return paths
+
+    @staticmethod
+    def _stat(path: Path) -> Optional[tuple]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def changed(self) -> bool:
+        """True if any watched file was written, created or removed since the last look."""
+        stats = {path: self._stat(path) for path in self.watched_paths()}
+        changed = stats != self._stats
+        self._stats = stats
+        return changed
+
+    def build(self, force: bool = False) -> Optional[bool]:
+        """
+        Rebuilds if the content of any watched file changed (always with
+        `force`). Returns the outcome, or None when there was nothing to do.
+        """
+        try:
+            source = self.renderer.input_path.read_text(encoding="utf-8")
+        except OSError as e:
+            # Editors that save by rename briefly leave no file behind
+            print(f"Watch Error: {e}")
+            return None
+        source_digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        converted = source_digest != self._source_digest
+        resources = {}
+        for path in self.watched_paths()[1:]:
+            resources[path] = file_digest(path) if path.is_file() else None
+        if not force and not converted and resources == self._digests:
+            return None
+
+        start = time.perf_counter()
+        self.builds += 1
+        if self.compile and self.formats is not None:
+            # An edited .cls gets a fresh format; the .tex must be rewritten for it
+            fmt = self.formats.get(self.renderer.template, self.resource_dir)
+            converted = converted or fmt != self.renderer.fmt
+            self.renderer.fmt = fmt
+        if converted or force:
+            if not self.renderer.render(source=source):
+                return False
+            # The new source may reference other images
+            resources = {path: file_digest(path) if path.is_file() else None
+                         for path in self.watched_paths()[1:]}
+        self._source_digest = source_digest
+        self._digests = resources
+        self._stats = {path: self._stat(path) for path in self.watched_paths()}
+
+        ok = True
+        if self.compile:
+            errors = self.renderer.lint(source)
+            if errors:
+                for err in errors:
+                    print(f"Math Error: {self.renderer.input_path}:{err}")
+                return False
+            # Intermediates stay, so latexmk only reruns what the change requires
+            ok = self.renderer.compile(clean=False, resource_dir=self.resource_dir)
+        seconds = time.perf_counter() - start
+        what = "Rebuilt" if self.compile else "Converted"
+        print(f"Watch: {what} {self.renderer.output_path} in {seconds:.2f}s" if ok
+              else f"Watch: build failed after {seconds:.2f}s, waiting for changes")
+        return ok
+
+    def serve(self, stop: Optional[threading.Event] = None):
+        """Builds once, then after every debounced change until `stop` is set."""
+        stop = stop or threading.Event()
+        self.build(force=True)
+        self.changed()
+        print(f"Watch: watching {self.renderer.input_path} (Ctrl+C to stop)")
+        last_change = None
+        while not stop.wait(self.poll):
+            if self.changed():
+                last_change = time.monotonic()
+            elif last_change is not None and time.monotonic() - last_change >= self.debounce:
+                last_change = None
+                self.build()
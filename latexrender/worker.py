@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .backends import (CANCEL_FILE, HEARTBEAT_FILE, JOB_FILE, LOG_FILE, RESULT_FILE, init_spool,
+                       snapshot)
+from .compiler import CompileCancelled, CompileTimeout, run_latexmk
+
+
+class Worker:
+    """
+    A stateless compile worker for SpoolBackend. Claims the oldest pending
+    job with a rename (so each job goes to exactly one worker), runs its
+    command in the job's work dir and moves the job to done/. Any number of
+    workers on any host can share one spool directory.
+    """
+
+    def __init__(self, spool_dir: Path, name: Optional[str] = None, heartbeat: float = 2.0):
+        self.spool_dir = init_spool(spool_dir)
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat = heartbeat
+        self.completed = 0
+        (self.spool_dir / "workers").mkdir(exist_ok=True)
+
+    def _beat(self, path: Path):
+        try:
+            path.touch()
+        except OSError:
+            pass
+
+    def claim(self) -> Optional[Path]:
+        """Moves the oldest pending job to running/ and returns its dir, or None."""
+        pending = self.spool_dir / "pending"
+        for name in sorted(n for n in os.listdir(pending) if not n.startswith(".")):
+            target = self.spool_dir / "running" / name
+            try:
+                os.rename(pending / name, target)
+            except OSError:
+                # Another worker got it first, or the API withdrew it
+                continue
+            self._beat(target / HEARTBEAT_FILE)
+            return target
+        return None
+
+    def run_job(self, job_dir: Path):
+        job = json.loads((job_dir / JOB_FILE).read_text(encoding="utf-8"))
+        work = job_dir / "work"
+        before = snapshot(work)
+        cancel = threading.Event()
+        stop = threading.Event()
+
+        def watch():
+            # The API's cancel request for us, and a heartbeat for the API
+            last = time.monotonic()
+            while not stop.wait(0.2):
+                if (job_dir / CANCEL_FILE).exists():
+                    cancel.set()
+                if time.monotonic() - last >= self.heartbeat:
+                    self._beat(job_dir / HEARTBEAT_FILE)
+                    last = time.monotonic()
+
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+        result = {"worker": self.name, "returncode": 1, "error": None}
+        start = time.perf_counter()
+        try:
+            with open(job_dir / LOG_FILE, "a", encoding="utf-8") as log:
+                def on_line(line: str):
+                    log.write(line + "\n")
+                    log.flush()
+
+                process = run_latexmk(job["cmd"], cwd=work, timeout=job.get("timeout"),
+                                      on_line=on_line, cancel=cancel)
+            result["returncode"] = process.returncode
+        except (CompileTimeout, CompileCancelled) as e:
+            result["error"] = str(e)
+        except Exception as e:
+            result["error"] = f"Worker Error: {e}"
+        finally:
+            stop.set()
+            watcher.join()
+        result["seconds"] = time.perf_counter() - start
+        after = snapshot(work)
+        result["outputs"] = sorted(rel for rel, stat in after.items() if before.get(rel) != stat)
+
+        if (job_dir / CANCEL_FILE).exists():
+            # Nobody is waiting for this result any more
+            shutil.rmtree(job_dir, ignore_errors=True)
+            return
+        try:
+            (job_dir / RESULT_FILE).write_text(json.dumps(result), encoding="utf-8")
+            os.rename(job_dir, self.spool_dir / "done" / job_dir.name)
+        except OSError:
+            # The API gave up on us (missed heartbeats) and removed the job
+            return
+        self.completed += 1
+
+    def serve(self, poll: float = 0.1, stop: Optional[threading.Event] = None, max_jobs: Optional[int] = None):
+        """Processes jobs until `stop` is set or `max_jobs` jobs are done."""
+        alive = self.spool_dir / "workers" / self.name
+        try:
+            while not (stop and stop.is_set()) and not (max_jobs and self.completed >= max_jobs):
+                self._beat(alive)
+                job_dir = self.claim()
+                if job_dir is None:
+                    time.sleep(poll)
+                    continue
+                self.run_job(job_dir)
+        finally:
+            try:
+                alive.unlink()
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LaTeX compile worker for a shared spool directory")
+    parser.add_argument("spool", help="Spool directory shared with the API (LXR_SPOOL_DIR)")
+    parser.add_argument("--name", help="Worker name (default: host-pid)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Jobs to run concurrently")
+    parser.add_argument("--poll", type=float, default=0.1, help="Seconds between checks for new jobs")
+    args = parser.parse_args()
+
+    base = args.name or f"{socket.gethostname()}-{os.getpid()}"
+    workers = [Worker(Path(args.spool), name=base if args.jobs == 1 else f"{base}-{i}")
+               for i in range(args.jobs)]
+    print(f"Worker: serving {args.spool} with {args.jobs} slot(s)")
+    threads = [threading.Thread(target=w.serve, kwargs={"poll": args.poll}, daemon=True) for w in workers]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            t.join()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# RAM-backed filesystem used for scratch builds when nothing else is configured
+SHM_DIR = Path("/dev/shm")
+
+
+def scratch_root(configured: Optional[str], fallback: Path, min_free: int = 256 * 1024 * 1024) -> Path:
+    """
+    Where builds keep their intermediate files: `configured` if set,
+    else /dev/shm when it exists, is writable and has `min_free` bytes
+    free, else `fallback` (the persistent build dir).
+    """
+    if configured:
+        return Path(configured)
+    try:
+        st = os.statvfs(SHM_DIR)
+        if os.access(SHM_DIR, os.W_OK) and st.f_bavail * st.f_frsize >= min_free:
+            return SHM_DIR / f"lxrender-{os.getuid()}"
+    except (OSError, AttributeError):
+        pass
+    return Path(fallback)
+
+
+class Workspace:
+    """A persistent build directory owned by one editing session."""
+
+    def __init__(self, path: Path, last_used: float):
+        self.path = path
+        self.last_used = last_used
+        self.lock = threading.Lock()
+        # In-memory state that lives as long as the workspace (e.g. converters)
+        self.state = {}
+
+
+class WorkspaceManager:
+    """
+    Keeps one build directory per editing session so latexmk can reuse
+    .aux/.toc/.out/.xdv files between saves and usually needs a single pass.
+
+    Builds in the same workspace are serialized by a per-session lock.
+    Workspaces idle for longer than `idle_timeout` seconds are removed.
+    """
+
+    def __init__(self, root: Path, idle_timeout: float = 30 * 60):
+        self.root = Path(root)
+        self.idle_timeout = idle_timeout
+        self._workspaces = {}
+        self._guard = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Adopt workspaces left over from a previous process
+        for d in self.root.iterdir():
+            if d.is_dir() and SESSION_ID_RE.match(d.name):
+                self._workspaces[d.name] = Workspace(d, d.stat().st_mtime)
+
+    @staticmethod
+    def validate(session_id: str) -> str:
+        if not SESSION_ID_RE.match(session_id or ""):
+            raise ValueError("session_id must be 1-64 characters of [A-Za-z0-9_-]")
+        return session_id
+
+    @contextmanager
+    def acquire(self, session_id: str) -> Iterator[Workspace]:
+        """Locks the session's workspace and yields it."""
+        self.validate(session_id)
+        self.expire()
+        with self._guard:
+            ws = self._workspaces.get(session_id)
+            if ws is None:
+                ws = Workspace(self.root / session_id, time.time())
+                self._workspaces[session_id] = ws
+            # Claim it now so a concurrent expire() cannot drop it before we lock
+            ws.last_used = time.time()
+        with ws.lock:
+            ws.path.mkdir(parents=True, exist_ok=True)
+            ws.last_used = time.time()
+            try:
+                yield ws
+            finally:
+                ws.last_used = time.time()
+
+    def expire(self):
+        """Removes workspaces that have been idle too long and are not in use."""
+        now = time.time()
+        with self._guard:
+            for session_id, ws in list(self._workspaces.items()):
+                if now - ws.last_used <= self.idle_timeout:
+                    continue
+                if not ws.lock.acquire(blocking=False):
+                    continue
+                try:
+                    shutil.rmtree(ws.path, ignore_errors=True)
+                    del self._workspaces[session_id]
+                finally:
+                    ws.lock.release()
+
+    def stats(self) -> dict:
+        with self._guard:
+            return {
+                "workspaces": len(self._workspaces),
+                "busy": sum(1 for ws in self._workspaces.values() if ws.lock.locked()),
+                "idle_timeout": self.idle_timeout,
+            }
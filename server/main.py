@@ -1,15 +1,37 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from pathlib import Path
+from typing import Literal, Optional
+import asyncio
+import json
+import mimetypes
 import os
 import uuid
-import subprocess
 import shutil
+import time
 
 # Import the core renderer
 from latexrender.main import LaTeXRenderer
+from latexrender.assets import AssetStore
+from latexrender.backends import create_backend
+from latexrender.cache import ArtifactCache
+from latexrender.convert import convert_markdown
+from latexrender.compiler import CompileCancelled, CompileTimeout, compile_command
+from latexrender.formats import FormatCache
+from latexrender.images import ImageOptimizer
+from latexrender.incremental import BlockCache, IncrementalConverter
+from latexrender.jobs import JobQueue, QueueFull
+from latexrender.lint import lint_markdown
+from latexrender.metrics import Counter, CounterFunc, Gauge, Histogram, Registry, TexPasses
+from latexrender.serving import (IMMUTABLE, RangeNotSatisfiable, etag_matches, iter_file,
+                                 parse_range, strong_etag)
+from latexrender.templates import TemplateRegistry
+from latexrender.warmup import WARMUP_DOCUMENT, Warmup, prime_fonts
+from latexrender.workspace import WorkspaceManager, scratch_root
 
 app = FastAPI(title="MatNoble LaTeX Renderer API")
 
@@ -17,24 +39,88 @@ app = FastAPI(title="MatNoble LaTeX Renderer API")
 BASE_DIR = Path(__file__).parent.parent
 BUILD_DIR = BASE_DIR / "build"
 DOC_DIR = BASE_DIR / "doc"
+FORMAT_DIR = BUILD_DIR / ".formats"
+ASSET_DIR = BUILD_DIR / ".assets"
+IMAGE_DIR = BUILD_DIR / ".images"
 BUILD_DIR.mkdir(exist_ok=True)
 
-MAX_JOBS = 20
+# Compiles write .aux/.log/.xdv into scratch dirs that never need to survive a restart, so by
+# default they live on tmpfs (/dev/shm) and only the published PDF/.tex reach BUILD_DIR.
+# LXR_SCRATCH_DIR overrides; without a usable /dev/shm they fall back to BUILD_DIR.
+SCRATCH_DIR = scratch_root(os.environ.get("LXR_SCRATCH_DIR"), BUILD_DIR)
+WORK_DIR = SCRATCH_DIR / ".work"
+SESSION_DIR = SCRATCH_DIR / ".sessions"
 
-def cleanup_old_jobs():
-    """Keep only the most recent MAX_JOBS in the build directory."""
-    try:
-        # Get all subdirectories in BUILD_DIR
-        dirs = [d for d in BUILD_DIR.iterdir() if d.is_dir()]
-        # Sort by modification time (oldest first)
-        dirs.sort(key=lambda x: x.stat().st_mtime)
-        
-        # Remove oldest if count exceeds MAX_JOBS
-        if len(dirs) > MAX_JOBS:
-            for d in dirs[:-MAX_JOBS]:
-                shutil.rmtree(d, ignore_errors=True)
-    except Exception as e:
-        print(f"Cleanup error: {e}")
+# Cache limits: total artifact bytes and entry age (seconds)
+CACHE_MAX_BYTES = int(os.environ.get("LXR_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CACHE_MAX_AGE = float(os.environ.get("LXR_CACHE_MAX_AGE", 7 * 24 * 3600))
+# Entries served or built within this many seconds are never evicted
+CACHE_MIN_IDLE = float(os.environ.get("LXR_CACHE_MIN_IDLE", 300))
+# Seconds between background eviction sweeps (earlier when over quota)
+JANITOR_INTERVAL = float(os.environ.get("LXR_JANITOR_INTERVAL", 60))
+
+# Compile worker pool: concurrent latexmk runs, waiting jobs before 429, per-job timeout (seconds)
+COMPILE_WORKERS = int(os.environ.get("LXR_WORKERS", 2))
+QUEUE_SIZE = int(os.environ.get("LXR_QUEUE_SIZE", 8))
+JOB_TIMEOUT = float(os.environ.get("LXR_JOB_TIMEOUT", 120))
+
+# Where TeX runs: "local" (subprocess of this process) or "spool" (worker processes, see
+# latexrender/worker.py, sharing LXR_SPOOL_DIR). With "spool", LXR_WORKERS bounds the
+# compiles in flight, so set it to the total number of worker slots.
+COMPILE_BACKEND = os.environ.get("LXR_COMPILE_BACKEND", "local")
+SPOOL_DIR = Path(os.environ.get("LXR_SPOOL_DIR", BUILD_DIR / ".spool"))
+
+# Editing-session workspaces are dropped after this many idle seconds
+SESSION_IDLE_TIMEOUT = float(os.environ.get("LXR_SESSION_IDLE_TIMEOUT", 30 * 60))
+
+# Prime font caches and compile a dummy document per template before reporting ready
+WARMUP = os.environ.get("LXR_WARMUP", "1") != "0"
+
+# Downsample images to the printed size before compiling (needs Pillow); 0 disables
+IMAGE_DPI = int(os.environ.get("LXR_IMAGE_DPI", 200))
+
+# Finished builds live in BUILD_DIR/<content hash>/, so identical inputs share one entry
+cache = ArtifactCache(BUILD_DIR, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE,
+                      min_idle=CACHE_MIN_IDLE)
+cache.start(JANITOR_INTERVAL)
+
+# Scratch dirs left behind by a previous process are never going to be finished
+shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+backend = create_backend(COMPILE_BACKEND, SPOOL_DIR)
+
+# Templates in DOC_DIR (.cls plus optional .yml settings), loaded once and reloaded when they change
+templates = TemplateRegistry(DOC_DIR)
+
+# Precompiled preamble per template, rebuilt when its .cls changes
+formats = FormatCache(FORMAT_DIR)
+
+# Per-session build dirs so latexmk can reuse .aux/.toc between saves
+workspaces = WorkspaceManager(SESSION_DIR, idle_timeout=SESSION_IDLE_TIMEOUT)
+
+# Deduplicated .cls/images, hardlinked into build dirs instead of copied
+assets = AssetStore(ASSET_DIR)
+
+# Print-sized derivatives of uploaded images, cached by source hash
+images = ImageOptimizer(IMAGE_DIR, dpi=IMAGE_DPI) if IMAGE_DPI and ImageOptimizer.available() else None
+
+# Rendered LaTeX of Markdown blocks by content hash, shared by all documents
+block_cache = BlockCache()
+
+# Prometheus metrics, served at /metrics
+metrics = Registry()
+STAGE_SECONDS = metrics.register(Histogram(
+    "lxr_stage_seconds", "Time spent in each build stage", ["stage"]))
+RENDER_SECONDS = metrics.register(Histogram(
+    "lxr_render_seconds", "End-to-end build time, excluding queue wait", ["compile"]))
+QUEUE_WAIT_SECONDS = metrics.register(Histogram(
+    "lxr_queue_wait_seconds", "Time compile jobs spent waiting for a worker"))
+TEX_PASS_SECONDS = metrics.register(Histogram(
+    "lxr_tex_pass_seconds", "Duration of a single TeX engine run"))
+TEX_PASSES = metrics.register(Histogram(
+    "lxr_tex_passes", "TeX engine runs per compile", buckets=(1, 2, 3, 4, 5, 6)))
+RENDERS = metrics.register(Counter(
+    "lxr_renders_total", "Finished builds by outcome", ["status"]))
 
 # Configure CORS
 app.add_middleware(
@@ -45,100 +131,475 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class ConvertRequest(BaseModel):
+    content: str
+    template: str = "matnoble"
+
 class RenderRequest(BaseModel):
     content: str
     template: str
     compile: bool = False
+    session_id: Optional[str] = None
+    # "draft": single xelatex pass, no table of contents, image placeholders
+    mode: Literal["final", "draft"] = "final"
 
 @app.get("/api/templates")
 async def get_templates():
     """Returns a list of available LaTeX templates."""
-    if not DOC_DIR.exists():
-        return {"templates": []}
-    
-    cls_files = list(DOC_DIR.glob("*.cls"))
-    templates = [f.stem for f in cls_files]
-    return {"templates": templates}
+    return {"templates": templates.names()}
 
-@app.post("/api/render")
-async def render_pdf(request: RenderRequest):
+@app.post("/api/convert")
+async def convert(request: ConvertRequest):
+    """Converts Markdown to LaTeX in memory and returns the source directly."""
+    try:
+        tex = await run_in_threadpool(convert_markdown, request.content,
+                                       templates.resolve(request.template))
+    except Exception as e:
+        return {"success": False, "detail": f"Conversion failed: {e}"}
+    return {"success": True, "tex": tex}
+
+@app.get("/api/cache")
+async def get_cache_stats():
+    """Returns hit/miss counters and disk usage of the artifact cache."""
+    stats = cache.stats()
+    stats["images"] = images.stats() if images else None
+    return stats
+
+@app.get("/api/backend")
+async def get_backend_stats():
+    """Returns the compile backend in use and, for the spool backend, its jobs and live workers."""
+    return await run_in_threadpool(backend.stats)
+
+def _cache_key(request: RenderRequest) -> str:
+    options = compile_command("document.tex", mode=request.mode)
+    if images and request.mode == "final":
+        options.append(images.signature())
+    spec = templates.get(request.template)
+    return ArtifactCache.compute_key(request.content, request.template, DOC_DIR, options,
+                                     template_digest=spec.digest if spec else None,
+                                     layout=spec.layout if spec else None)
+
+def _artifact_url(key: str, name: str = "document.pdf") -> Optional[str]:
+    """Immutable URL of a published artifact; it changes whenever the file's bytes do."""
+    found = cache.artifact(key, name)
+    if found is None:
+        return None
+    return f"/artifacts/{key}/{found[1][:16]}/{name}"
+
+def _cached_result(key: str) -> dict:
+    return {
+        "success": True,
+        "job_id": key,
+        "cached": True,
+        "logs": "> Cache hit: inputs unchanged, reusing previous PDF.\n> Ready.",
+        "pdf_url": _artifact_url(key)
+    }
+
+def run_build(request: RenderRequest, key: str, logs: list, timeout: float = None,
+              cancel=None) -> dict:
     """
-    Main endpoint for rendering. Captures and returns real-time logs.
+    Converts (and optionally compiles) one document, then publishes the
+    artifacts under BUILD_DIR/<key>. Runs on a worker thread.
+
+    With a session_id the build runs in that session's persistent workspace,
+    otherwise in a throwaway scratch directory. The cache entry is pinned
+    for the whole build so the janitor leaves it alone.
     """
-    cleanup_old_jobs()
-    job_id = str(uuid.uuid4())[:8]
-    job_dir = BUILD_DIR / job_id
-    job_dir.mkdir(parents=True, exist_ok=True)
-    
-    md_path = job_dir / "document.md"
-    tex_path = job_dir / "document.tex"
-    pdf_path = job_dir / "document.pdf"
+    with cache.pin(key):
+        if request.session_id:
+            with workspaces.acquire(request.session_id) as ws:
+                converter = ws.state.setdefault("converter", IncrementalConverter(block_cache))
+                return _build_in(ws.path, converter, request, key, logs, timeout, cancel)
 
-    logs = []
+        work_dir = WORK_DIR / uuid.uuid4().hex
+        work_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            return _build_in(work_dir, IncrementalConverter(block_cache), request, key, logs, timeout, cancel)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def _build_in(work_dir: Path, converter: IncrementalConverter, request: RenderRequest, key: str,
+              logs: list, timeout: float = None, cancel=None) -> dict:
+    tex_path = work_dir / "document.tex"
+    pdf_path = work_dir / "document.pdf"
 
     try:
-        # 1. Write the source content
-        md_path.write_text(request.content, encoding="utf-8")
-        logs.append(f"> Writing document.md... Done.")
-        
-        # 2. Initialize and run core renderer (conversion only)
+        # 1. Initialize and run core renderer on the in-memory source (conversion only)
+        fmt = formats.get(request.template, DOC_DIR) if request.compile else None
         renderer = LaTeXRenderer(
-            input_path=str(md_path), 
+            input_path="document.md", 
             output_path=str(tex_path), 
-            template=request.template
+            template=request.template,
+            fmt=fmt,
+            converter=converter,
+            templates=templates,
+            assets=assets,
+            images=images,
+            mode=request.mode
         )
         
-        if not renderer.render():
+        if not renderer.render(source=request.content):
             logs.append("> Error: Markdown to LaTeX conversion failed.")
             return {"success": False, "logs": "\n".join(logs)}
         
-        logs.append(f"> LaTeX source generated at {tex_path.name}")
+        timings = renderer.timings
+        blocks = converter.last.to_dict()
+        logs.append(f"> LaTeX source generated at {tex_path.name} "
+                    f"({len(blocks['changed'])}/{blocks['total']} blocks changed)")
             
-        # 3. Handle Compilation manually to capture logs
+        # 2. Handle Compilation manually to capture logs
         if request.compile:
-            logs.append("> Starting LaTeXmk compilation...")
+            logs.append("> Starting draft compilation (single xelatex pass)..." if request.mode == "draft"
+                        else "> Starting LaTeXmk compilation...")
             
-            # Replicate resource copying (since we aren't calling renderer.compile)
+            # Replicate resource linking (since we aren't calling renderer.compile)
             renderer._copy_resources(DOC_DIR)
+            if renderer.image_bytes_saved > 0:
+                logs.append(f"> Optimized images: {renderer.image_bytes_saved // 1024} KiB saved")
+
+            cmd = compile_command("document.tex", mode=request.mode)
+            if fmt:
+                cmd = compile_command("document.tex", fmt=FormatCache.install(fmt, work_dir), mode=request.mode)
+                logs.append(f"> Using precompiled preamble {fmt.name}")
             
-            cmd = ["latexmk", "-pdf", "-pdflatex=xelatex %O %S", "-interaction=nonstopmode", "document.tex"]
-            
-            # Run compilation and capture output
-            process = subprocess.run(
-                cmd, 
-                cwd=job_dir, 
-                capture_output=True, 
-                text=True,
-                encoding="utf-8"
-            )
-            
-            # Combine stdout and stderr
-            compile_output = process.stdout + "\n" + process.stderr
-            logs.append(compile_output)
+            # Each output line is appended as soon as xelatex emits it, for /events streaming
+            passes = TexPasses(logs.append)
+            try:
+                with timings.stage("compile"):
+                    process = backend.run(cmd, work_dir, timeout=timeout, on_line=passes, cancel=cancel)
+                    if process.returncode != 0 and fmt and FormatCache.is_format_error(process.stdout):
+                        # e.g. dumped before a TeX Live upgrade; the next build dumps a fresh one
+                        logs.append(f"> Precompiled preamble {fmt.name} was rejected, compiling without it")
+                        FormatCache.discard(fmt)
+                        fmt = renderer.fmt = None
+                        if not renderer.render(source=request.content):
+                            raise RuntimeError("Markdown to LaTeX conversion failed")
+                        cmd = compile_command("document.tex", mode=request.mode)
+                        process = backend.run(cmd, work_dir, timeout=timeout, on_line=passes, cancel=cancel)
+            except (CompileTimeout, CompileCancelled) as e:
+                logs.append(f"> Error: {e}")
+                return {
+                    "success": False,
+                    "logs": "\n".join(logs),
+                    "detail": "LaTeX compilation timed out." if isinstance(e, CompileTimeout)
+                              else "LaTeX compilation cancelled."
+                }
             
+            passes.finish()
+            for seconds in passes.durations:
+                TEX_PASS_SECONDS.observe(seconds)
+            TEX_PASSES.observe(len(passes.durations))
             if process.returncode != 0:
-                logs.append(f"> Error: Compilation failed with exit code {process.returncode}")
+                # The raw output has already been streamed; the result carries located errors only
+                errors = renderer.tex_errors(process.stdout)
+                summary = [line for line in logs if line.startswith(">")]
+                summary += [f"> TeX Error: line {err}" for err in errors]
+                summary.append(f"> Error: Compilation failed with exit code {process.returncode}")
+                logs.append(summary[-1])
                 return {
                     "success": False, 
-                    "logs": "\n".join(logs),
+                    "errors": [err.to_dict() for err in errors],
+                    "logs": "\n".join(summary if errors else logs),
                     "detail": "LaTeX compilation failed."
                 }
             
-            logs.append("> Compilation successful. Cleaning up...")
-            renderer.clean()
-            logs.append("> Ready.")
+            logs.append("> Compilation successful. Publishing artifacts...")
+
+        # 3. Copy artifacts into the content-addressed cache; intermediates stay in work_dir.
+        # A .tex built against a format contains \endofdump and is not standalone, so keep it out.
+        # A session workspace may hold a PDF from an earlier save, so only publish one we just built.
+        artifacts = [] if fmt else ["document.tex"]
+        if request.compile:
+            artifacts.append("document.pdf")
+        with timings.stage("publish"):
+            cache.publish(key, work_dir, artifacts)
+        logs.append("> Ready.")
+        for stage, seconds in timings.stages.items():
+            STAGE_SECONDS.observe(seconds, stage)
 
         return {
             "success": True,
-            "job_id": job_id,
+            "job_id": key,
+            "cached": False,
+            "blocks": blocks,
+            "timings": timings.to_dict(),
+            "passes": [round(t, 4) for t in passes.durations] if request.compile else [],
             "logs": "\n".join(logs),
-            "pdf_url": f"/build/{job_id}/document.pdf" if pdf_path.exists() else None
+            "pdf_url": _artifact_url(key) if request.compile and pdf_path.exists() else None
         }
 
     except Exception as e:
         logs.append(f"> System Error: {str(e)}")
         return {"success": False, "logs": "\n".join(logs)}
 
+def _run_job(job) -> dict:
+    QUEUE_WAIT_SECONDS.observe(time.time() - job.created_at)
+    return _timed_build(*job.payload, logs=job.logs, timeout=job.timeout, cancel=job.cancel_event)
+
+def _timed_build(request: RenderRequest, key: str, logs: list, timeout: float = None,
+                 cancel=None) -> dict:
+    start = time.perf_counter()
+    result = run_build(request, key, logs, timeout, cancel)
+    RENDER_SECONDS.observe(time.perf_counter() - start, str(request.compile).lower())
+    RENDERS.inc("ok" if result.get("success") else "failed")
+    return result
+
+jobs = JobQueue(
+    _run_job,
+    workers=COMPILE_WORKERS,
+    max_pending=QUEUE_SIZE,
+    timeout=JOB_TIMEOUT,
+)
+
+def _warm_template(template: str) -> bool:
+    # Same path as a user's compile, so the format dump, asset store and backend are warmed too
+    request = RenderRequest(content=WARMUP_DOCUMENT, template=template, compile=True)
+    result = run_build(request, _cache_key(request), [], timeout=JOB_TIMEOUT)
+    return result.get("success", False)
+
+def _warmup_steps() -> list:
+    if not WARMUP:
+        return []
+    # Without fontconfig there is no font cache to build
+    steps = [("fonts", prime_fonts)] if shutil.which("fc-cache") else []
+    steps += [(f"template:{name}", lambda name=name: _warm_template(name)) for name in templates.names()]
+    return steps
+
+warmup = Warmup(_warmup_steps())
+
+@app.on_event("startup")
+def start_warmup():
+    warmup.start()
+
+def _validate_session(request: RenderRequest):
+    if request.session_id is not None:
+        try:
+            WorkspaceManager.validate(request.session_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+def _lint_result(errors: list) -> dict:
+    logs = [f"> Math Error: line {err}" for err in errors]
+    logs.append(f"> Found {len(errors)} math error(s), compilation skipped.")
+    return {
+        "success": False,
+        "errors": [err.to_dict() for err in errors],
+        "logs": "\n".join(logs),
+        "detail": "Math errors found, compilation skipped."
+    }
+
+async def _submit(request: RenderRequest):
+    """Queues a compile job, or records an already finished one on a cache hit."""
+    _validate_session(request)
+    key = await run_in_threadpool(_cache_key, request)
+    if cache.lookup(key):
+        RENDERS.inc("cached")
+        # The session already has its newest result, so an older compile of it is moot
+        return jobs.add_finished((request, key), _cached_result(key), supersede_key=request.session_id)
+    if request.compile:
+        # Math errors TeX would stop on are reported without taking a compile slot
+        errors = await run_in_threadpool(lint_markdown, request.content)
+        if errors:
+            RENDERS.inc("rejected")
+            return jobs.add_finished((request, key), _lint_result(errors), supersede_key=request.session_id)
+    try:
+        # Identical in-flight compiles are shared; a newer save from the same session
+        # kills the compile it makes obsolete
+        return jobs.submit((request, key), dedupe_key=key, supersede_key=request.session_id)
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+@app.post("/api/render")
+async def render_pdf(request: RenderRequest):
+    """
+    Main endpoint for rendering. Captures and returns real-time logs.
+    Compiles go through the job queue; identical inputs are served from the cache.
+    """
+    if not request.compile:
+        _validate_session(request)
+        # Conversion only: skip the compile queue but keep it off the event loop
+        key = await run_in_threadpool(_cache_key, request)
+        return await run_in_threadpool(_timed_build, request, key, [])
+
+    job = await _submit(request)
+    await asyncio.wait([asyncio.wrap_future(job.future)])
+    return _job_result(job)
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: RenderRequest):
+    """Submits a render job and returns immediately with its id."""
+    request.compile = True
+    job = await _submit(request)
+    return job.to_dict()
+
+def _get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def _job_result(job) -> dict:
+    if job.superseded_by:
+        return {"success": False, "logs": "\n".join(job.logs), "superseded_by": job.superseded_by,
+                "detail": "Superseded by a newer submission from this session."}
+    if job.status == "failed":
+        return {"success": False, "logs": "\n".join(job.logs), "detail": job.error}
+    if job.result is None:
+        return {"success": False, "logs": "\n".join(job.logs), "detail": "Job cancelled."}
+    return job.result
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Returns the state of a job along with the log lines collected so far."""
+    job = _get_job(job_id)
+    status = job.to_dict()
+    status["logs"] = "\n".join(job.logs)
+    return status
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Returns the render result, or 202 with the current status while pending."""
+    job = _get_job(job_id)
+    if not job.done:
+        return JSONResponse(status_code=202, content=job.to_dict())
+    return _job_result(job)
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, session_id: Optional[str] = None):
+    """
+    Kills the running latexmk process of a job, or drops it from the queue.
+    A job other sessions are also waiting for keeps running for them.
+    """
+    _get_job(job_id)
+    return jobs.cancel(job_id, owner=session_id).to_dict()
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events stream of a job: one `log` event per output line while
+    it runs, then a single `done` event carrying the final result.
+    """
+    job = _get_job(job_id)
+
+    async def events():
+        sent = 0
+        while True:
+            finished = job.done
+            lines = job.logs[sent:]
+            sent += len(lines)
+            for line in lines:
+                for part in line.split("\n"):
+                    yield f"event: log\ndata: {part}\n\n"
+            if finished:
+                break
+            await asyncio.sleep(0.1)
+        yield f"event: done\ndata: {json.dumps(_job_result(job))}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint."""
+    return Response(content=metrics.render(), media_type=Registry.CONTENT_TYPE)
+
+@app.get("/api/ready")
+async def get_readiness():
+    """
+    Readiness probe: 503 until the startup warmup has finished, so no traffic
+    reaches an instance whose font caches and formats are still cold.
+    """
+    state = warmup.to_dict()
+    return JSONResponse(state, status_code=200 if warmup.ready else 503)
+
+@app.get("/api/queue")
+async def get_queue_stats():
+    """Returns worker pool size, current queue depth and coalesced/superseded job counts."""
+    return jobs.stats()
+
+# Read at scrape time; defined after `jobs` exists
+for _name, _help, _func in [
+    ("lxr_queue_depth", "Compile jobs waiting for a worker", lambda: jobs.stats()["queued"]),
+    ("lxr_compiles_in_flight", "Compile jobs currently running", lambda: jobs.stats()["running"]),
+    ("lxr_workers", "Size of the compile worker pool", lambda: jobs.workers),
+    ("lxr_cache_bytes", "Bytes held by the artifact cache", lambda: cache.stats()["bytes"]),
+    ("lxr_cache_entries", "Entries in the artifact cache", lambda: cache.stats()["entries"]),
+    ("lxr_sessions", "Live editing-session workspaces", lambda: workspaces.stats()["workspaces"]),
+    ("lxr_block_cache_blocks", "Rendered Markdown blocks held in memory", lambda: len(block_cache)),
+    ("lxr_ready", "1 once the startup warmup has finished", lambda: int(warmup.ready)),
+]:
+    metrics.register(Gauge(_name, _help, _func))
+for _name, _help, _func in [
+    ("lxr_jobs_coalesced_total", "Submissions attached to an identical in-flight compile",
+     lambda: jobs.coalesced),
+    ("lxr_jobs_superseded_total", "Compiles cancelled by a newer submission of the same session",
+     lambda: jobs.superseded),
+    ("lxr_cache_hits_total", "Artifact cache hits", lambda: cache.hits),
+    ("lxr_cache_misses_total", "Artifact cache misses", lambda: cache.misses),
+    ("lxr_cache_evictions_total", "Artifact cache evictions", lambda: cache.evictions),
+]:
+    metrics.register(CounterFunc(_name, _help, _func))
+
+@app.api_route("/artifacts/{key}/{digest}/{name}", methods=["GET", "HEAD"])
+async def get_artifact(key: str, digest: str, name: str, request: Request):
+    """
+    Serves a published artifact under its content hash: cacheable forever,
+    with a strong ETag, 304 on If-None-Match and single byte ranges so PDF
+    viewers can fetch pages progressively.
+    """
+    found = cache.artifact(key, name)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    path, full_digest = found
+    if not full_digest.startswith(digest):
+        # Rebuilt since this URL was issued; point at the current bytes
+        return RedirectResponse(_artifact_url(key, name), status_code=302)
+
+    etag = strong_etag(full_digest)
+    size = path.stat().st_size
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE,
+        "Accept-Ranges": "bytes",
+    }
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    start, end, status = 0, size - 1, 200
+    if byte_range:
+        (start, end), status = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    if request.method == "HEAD" or size == 0:
+        return Response(status_code=status, headers=headers, media_type=media_type)
+    return StreamingResponse(iter_file(path, start, end), status_code=status,
+                             headers=headers, media_type=media_type)
+
+@app.middleware("http")
+async def touch_served_artifacts(request, call_next):
+    """Serving a cached PDF counts as a use, so the janitor keeps recently viewed entries."""
+    parts = request.url.path.split("/")
+    if len(parts) > 3 and parts[1] == "build":
+        cache.touch(parts[2])
+    return await call_next(request)
+
 # Static file serving
 app.mount("/build", StaticFiles(directory=str(BUILD_DIR)), name="build")
 
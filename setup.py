@@ -9,13 +9,18 @@ setup(
     install_requires=[
         "mistune>=3.0",
         "python-frontmatter",
+        "PyYAML",
         "fastapi",
         "uvicorn",
         "python-multipart",
     ],
+    extras_require={
+        "images": ["Pillow"],
+    },
     entry_points={
         "console_scripts": [
             "lxrender=latexrender.main:main",
+            "lxrender-worker=latexrender.worker:main",
         ],
     },
     python_requires=">=3.8",
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from latexrender.assets import AssetStore, link_or_copy
+from latexrender.main import LaTeXRenderer
+
+
+class TestResourceMaterialization(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.doc = self.tmp / "doc"
+        self.doc.mkdir()
+        (self.doc / "matnoble.cls").write_text(r"\includegraphics[height=1em]{logo.png}")
+        (self.doc / "logo.png").write_bytes(b"logo")
+        (self.doc / "wechat_converted.png").write_bytes(b"qr")
+        (self.doc / "used.png").write_bytes(b"same-bytes")
+        (self.doc / "copy-of-used.png").write_bytes(b"same-bytes")
+        (self.doc / "unused.png").write_bytes(b"unused")
+        self.store = AssetStore(self.tmp / "assets")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _build(self, name, body):
+        out = self.tmp / name
+        renderer = LaTeXRenderer("in.md", str(out / "document.tex"), assets=self.store)
+        self.assertTrue(renderer.render(source=body))
+        renderer._copy_resources(self.doc)
+        return out
+
+    def test_only_referenced_resources_are_linked(self):
+        out = self._build("job1", "![a](doc/used.png)\n\n![b](doc/copy-of-used.png)")
+        self.assertTrue((out / "matnoble.cls").exists())
+        self.assertTrue((out / "doc" / "used.png").exists())
+        self.assertTrue((out / "logo.png").exists())
+        self.assertTrue((out / "wechat_converted.png").exists())
+        self.assertFalse((out / "doc" / "unused.png").exists())
+
+        # Identical images are stored once and shared by inode across builds
+        other = self._build("job2", "![a](doc/used.png)")
+        self.assertTrue(os.path.samefile(out / "doc" / "used.png", out / "doc" / "copy-of-used.png"))
+        self.assertTrue(os.path.samefile(out / "doc" / "used.png", other / "doc" / "used.png"))
+
+    def test_building_inside_resource_dir_keeps_sources(self):
+        renderer = LaTeXRenderer("in.md", str(self.doc / "note.tex"), assets=self.store)
+        renderer.render(source="text")
+        renderer._copy_resources(self.doc)
+        cls = self.doc / "matnoble.cls"
+        self.assertEqual(cls.stat().st_nlink, 1)
+        self.assertIn("includegraphics", cls.read_text())
+
+    def test_escaping_urls_are_ignored(self):
+        out = self._build("job3", "![x](../doc/used.png)\n\n![y](http://example.com/used.png)")
+        self.assertEqual(sorted(p.name for p in (out).rglob("used.png")), [])
+
+    def test_symlinks_stored_files_across_filesystems(self):
+        src = self.store.add(self.doc / "used.png")
+        cross_device = OSError(18, "Invalid cross-device link")
+        with mock.patch("latexrender.assets.os.link", side_effect=cross_device), \
+                mock.patch("latexrender.assets._reflink", return_value=False):
+            self.assertEqual(link_or_copy(src, self.tmp / "a.png", symlink=True), "symlink")
+            # Sources that may change are still copied
+            self.assertEqual(link_or_copy(self.doc / "used.png", self.tmp / "b.png"), "copy")
+        self.assertTrue((self.tmp / "a.png").is_symlink())
+        self.assertEqual((self.tmp / "a.png").read_bytes(), b"same-bytes")
+        self.assertFalse((self.tmp / "b.png").is_symlink())
+
+
+if __name__ == '__main__':
+    unittest.main()
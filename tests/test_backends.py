@@ -0,0 +1,115 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from latexrender.backends import SpoolBackend, WorkerLost
+from latexrender.compiler import CompileCancelled, CompileTimeout
+from latexrender.worker import Worker
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Stands in for latexmk: prints a banner, writes the PDF and an aux file, sleeps on request
+FAKE_LATEXMK = """#!/bin/sh
+for a in "$@"; do last="$a"; done
+echo "This is XeTeX, fake run on $last"
+if grep -q slow "$last"; then sleep 30; fi
+printf '%%PDF-1.4 %s' "$(cat "$last")" > "${last%.tex}.pdf"
+echo aux > "${last%.tex}.aux"
+echo "Output written on ${last%.tex}.pdf"
+"""
+
+
+@unittest.skipUnless(os.name == "posix", "fake latexmk is a shell script")
+class TestSpoolBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        bin_dir = self.tmp / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "latexmk").write_text(FAKE_LATEXMK)
+        (bin_dir / "latexmk").chmod(0o755)
+        self.env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+                        PYTHONPATH=str(ROOT))
+        self.spool = self.tmp / "spool"
+        self.backend = SpoolBackend(self.spool, poll=0.02)
+        self.workers = []
+
+    def tearDown(self):
+        for proc in self.workers:
+            proc.kill()
+            proc.wait()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _start_workers(self, n):
+        for i in range(n):
+            self.workers.append(subprocess.Popen(
+                [sys.executable, "-m", "latexrender.worker", str(self.spool), "--name", f"w{i}", "--poll", "0.02"],
+                env=self.env, cwd=ROOT, stdout=subprocess.DEVNULL))
+
+    def _work_dir(self, name, text="hello"):
+        work = self.tmp / name
+        work.mkdir()
+        (work / "document.tex").write_text(text)
+        return work
+
+    def test_worker_processes_compile_concurrently(self):
+        self._start_workers(2)
+        results, lines = {}, []
+
+        def build(i):
+            work = self._work_dir(f"job{i}", f"doc {i}")
+            results[i] = (work, self.backend.run(["latexmk", "document.tex"], work, timeout=20,
+                                                 on_line=lines.append))
+
+        threads = [threading.Thread(target=build, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for i, (work, process) in results.items():
+            self.assertEqual(process.returncode, 0)
+            self.assertIn("This is XeTeX", process.stdout)
+            # Outputs come back into the caller's work dir
+            self.assertEqual((work / "document.pdf").read_text(), f"%PDF-1.4 doc {i}")
+            self.assertTrue((work / "document.aux").exists())
+        self.assertEqual(sum("Output written" in line for line in lines), 4)
+        stats = self.backend.stats()
+        self.assertEqual(stats["jobs"], {"pending": 0, "running": 0, "done": 0})
+        self.assertEqual(stats["workers"], ["w0", "w1"])
+
+    def test_cancel_kills_the_remote_run(self):
+        self._start_workers(1)
+        work = self._work_dir("slow", "slow")
+        cancel = threading.Event()
+        threading.Timer(0.5, cancel.set).start()
+        start = time.monotonic()
+        with self.assertRaises(CompileCancelled):
+            self.backend.run(["latexmk", "document.tex"], work, timeout=20, cancel=cancel)
+        self.assertLess(time.monotonic() - start, 5)
+        # The worker drops the job and is free again
+        process = self.backend.run(["latexmk", "document.tex"], self._work_dir("next"), timeout=20)
+        self.assertEqual(process.returncode, 0)
+
+    def test_timeout_without_workers(self):
+        with self.assertRaises(CompileTimeout):
+            self.backend.run(["latexmk", "document.tex"], self._work_dir("a"), timeout=0.3)
+        self.assertEqual(self.backend.stats()["jobs"]["pending"], 0)
+
+    def test_lost_worker(self):
+        backend = SpoolBackend(self.spool, poll=0.02, lease=0.3)
+        # A worker that claims the job and then dies
+        threading.Timer(0.1, lambda: Worker(self.spool).claim()).start()
+        with self.assertRaises(WorkerLost):
+            backend.run(["latexmk", "document.tex"], self._work_dir("a"), timeout=10)
+        self.assertEqual(backend.stats()["jobs"]["running"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from latexrender.batch import expand_inputs, run_batch
+
+FAKE_LATEXMK = """#!/bin/sh
+for a in "$@"; do last="$a"; done
+printf '%%PDF-1.4' > "${last%.tex}.pdf"
+"""
+
+
+class TestBatchMode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        (self.tmp / "ch1").mkdir()
+        for name in ("a.md", "b.md", "ch1/c.md"):
+            (self.tmp / name).write_text(f"# {name}\n\n$x$", encoding="utf-8")
+        # Broken frontmatter makes the conversion of this file fail
+        (self.tmp / "ch1/broken.md").write_text("---\ntitle: [unclosed\n---\nbody", encoding="utf-8")
+        (self.tmp / "notes.txt").write_text("not markdown")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_expands_directories_and_globs(self):
+        files = expand_inputs([str(self.tmp), str(self.tmp / "*.md")])
+        self.assertEqual(sorted(p.name for p in files), ["a.md", "b.md", "broken.md", "c.md"])
+
+    def test_failure_does_not_abort_batch_and_outputs_are_skipped_later(self):
+        inputs = expand_inputs([str(self.tmp)])
+        results = run_batch(inputs, jobs=2, check="hash")
+        status = {Path(r["input"]).name: r["status"] for r in results}
+        self.assertEqual(status, {"a.md": "ok", "b.md": "ok", "broken.md": "failed", "c.md": "ok"})
+        self.assertTrue((self.tmp / "ch1" / "c.tex").exists())
+
+        results = run_batch(inputs, jobs=2, check="hash")
+        status = {Path(r["input"]).name: r["status"] for r in results}
+        self.assertEqual(status["a.md"], "skipped")
+        self.assertEqual(status["broken.md"], "failed")
+
+        (self.tmp / "a.md").write_text("# changed", encoding="utf-8")
+        results = run_batch(inputs, jobs=1, check="hash")
+        self.assertEqual(results[0]["status"], "ok")
+
+    def test_outputs_of_another_mode_are_rebuilt(self):
+        inputs = [self.tmp / "a.md"]
+        for check in ("mtime", "hash"):
+            self.assertEqual(run_batch(inputs, jobs=1, check=check, mode="draft")[0]["status"], "ok")
+            self.assertEqual(run_batch(inputs, jobs=1, check=check, mode="draft")[0]["status"], "skipped")
+            self.assertEqual(run_batch(inputs, jobs=1, check=check)[0]["status"], "ok")
+            self.assertIn(r"\tableofcontents", (self.tmp / "a.tex").read_text(encoding="utf-8"))
+            self.assertEqual(run_batch(inputs, jobs=1, check=check)[0]["status"], "skipped")
+
+    @unittest.skipUnless(os.name == "posix", "fake latexmk is a shell script")
+    def test_changed_image_or_template_settings_rebuild(self):
+        doc = self.tmp / "doc"
+        doc.mkdir()
+        (doc / "matnoble.cls").write_text(r"\LoadClass{article}")
+        (doc / "fig.png").write_bytes(b"png-1")
+        bin_dir = self.tmp / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "latexmk").write_text(FAKE_LATEXMK)
+        (bin_dir / "latexmk").chmod(0o755)
+        inputs = [self.tmp / "a.md"]
+        inputs[0].write_text("# A\n\n![f](doc/fig)\n", encoding="utf-8")
+        path = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+        with mock.patch.dict(os.environ, PATH=path):
+            for i, check in enumerate(("mtime", "hash")):
+                build = dict(jobs=1, compile=True, resource_dir=doc, check=check)
+                self.assertEqual(run_batch(inputs, **build)[0]["status"], "ok")
+                self.assertEqual(run_batch(inputs, **build)[0]["status"], "skipped")
+                # The extensionless reference resolves to fig.png, as in the build
+                (doc / "fig.png").write_bytes(f"png-{i + 2}".encode())
+                self.assertEqual(run_batch(inputs, **build)[0]["status"], "ok")
+                (doc / "matnoble.yml").write_text(f"preamble: '% v{i}'\n")
+                self.assertEqual(run_batch(inputs, **build)[0]["status"], "ok")
+                self.assertEqual(run_batch(inputs, **build)[0]["status"], "skipped")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from benchmarks.bench_convert import compare, growth, run
+from benchmarks.corpus import KINDS, format_size, generate, parse_size
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+
+    def test_corpus_is_deterministic_and_sized(self):
+        for kind in KINDS:
+            doc = generate(kind, 4096, seed=1)
+            self.assertEqual(doc, generate(kind, 4096, seed=1))
+            self.assertGreaterEqual(len(doc.encode("utf-8")), 4096)
+            self.assertTrue(doc.startswith("---\n"))
+
+    def test_sizes_round_trip(self):
+        self.assertEqual(parse_size("10k"), 10240)
+        self.assertEqual(parse_size("50m"), 50 * 1024 * 1024)
+        self.assertEqual(format_size(parse_size("1m")), "1m")
+
+    def test_report_and_comparison(self):
+        report = run([2048], repeat=1, pattern=r"^parse/(math|table)/", log=lambda _: None)
+        keys = [r["key"] for r in report["results"]]
+        self.assertEqual(keys, ["parse/math/2k", "parse/table/2k"])
+        self.assertEqual(report["schema"], 1)
+
+        baseline = {"results": [dict(r, min=r["min"] / 2) for r in report["results"]]}
+        rows = compare(report, baseline, threshold=0.5)
+        self.assertTrue(all(row["regression"] for row in rows))
+        self.assertFalse(any(row["regression"] for row in compare(report, report)))
+
+    def test_math_tokenizer_scales_linearly(self):
+        report = run([8 << 10, 128 << 10], repeat=3, pattern=r"^parse/(dollars|escaped)/", log=lambda _: None)
+        exponents = growth(report)
+        self.assertEqual(sorted(exponents), ["parse/dollars", "parse/escaped"])
+        # Quadratic scanning would give ~2 over a 16x size range
+        for key, k in exponents.items():
+            self.assertLess(k, 1.5, key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from latexrender.cache import ArtifactCache
+
+
+class TestArtifactCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.resources = self.tmp / "doc"
+        self.resources.mkdir()
+        (self.resources / "matnoble.cls").write_text("% cls v1")
+        (self.resources / "a.png").write_bytes(b"image-a")
+        (self.resources / "unused.png").write_bytes(b"unused")
+        self.cache = ArtifactCache(self.tmp / "build", max_bytes=1024, max_age=3600, min_idle=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _key(self, content="# Hi\n\n![a](doc/a.png)"):
+        return ArtifactCache.compute_key(content, "matnoble", self.resources, ["latexmk"])
+
+    def _publish(self, key, size=10):
+        work = self.tmp / f"work-{key[:8]}"
+        work.mkdir()
+        (work / "document.pdf").write_bytes(b"x" * size)
+        self.cache.publish(key, work, ["document.pdf", "document.tex"])
+
+    def test_key_depends_on_inputs(self):
+        key = self._key()
+        self.assertEqual(key, self._key())
+        self.assertNotEqual(key, self._key("# Changed\n\n![a](doc/a.png)"))
+
+        (self.resources / "unused.png").write_bytes(b"changed")
+        self.assertEqual(key, self._key())
+
+        (self.resources / "a.png").write_bytes(b"image-a2")
+        self.assertNotEqual(key, self._key())
+
+        key = self._key()
+        (self.resources / "matnoble.cls").write_text("% cls v2")
+        self.assertNotEqual(key, self._key())
+
+    def test_key_follows_images_the_build_uses(self):
+        (self.resources / "b.png").write_bytes(b"image-b")
+        (self.resources / "c.jpg").write_bytes(b"image-c")
+        content = "![b](doc/sub/b.png) ![c](c)"
+        key = self._key(content)
+        # Like the build, a path with subdirectories resolves by file name, and "c" finds c.jpg
+        (self.resources / "b.png").write_bytes(b"image-b2")
+        self.assertNotEqual(key, self._key(content))
+        key = self._key(content)
+        (self.resources / "c.jpg").write_bytes(b"image-c2")
+        self.assertNotEqual(key, self._key(content))
+
+        # A logo pulled in by the class counts even though no Markdown mentions it
+        (self.resources / "matnoble.cls").write_text("\\includegraphics{logo}")
+        (self.resources / "logo.pdf").write_bytes(b"logo-1")
+        key = self._key()
+        (self.resources / "logo.pdf").write_bytes(b"logo-2")
+        self.assertNotEqual(key, self._key())
+
+    def test_lookup_counts_hits_and_misses(self):
+        key = self._key()
+        self.assertIsNone(self.cache.lookup(key))
+        self._publish(key)
+        self.assertEqual(self.cache.lookup(key), self.cache.entry_dir(key) / "document.pdf")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_evicts_by_bytes_and_age(self):
+        old, new = "a" * 64, "b" * 64
+        self._publish(old, size=600)
+        self.cache.touch(old, at=time.time() - 10)
+        self._publish(new, size=600)
+        # Publishing never evicts on the caller's thread
+        self.assertTrue(self.cache.entry_dir(old).exists())
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertFalse(self.cache.entry_dir(old).exists())
+        self.assertTrue(self.cache.entry_dir(new).exists())
+        self.assertEqual(self.cache.stats()["bytes"], 600)
+
+        self.cache.touch(new, at=time.time() - 7200)
+        self.cache.evict()
+        self.assertFalse(self.cache.entry_dir(new).exists())
+        self.assertIsNone(self.cache.lookup(new))
+
+    def test_pinned_and_recently_used_entries_are_kept(self):
+        self.cache.min_idle = 60
+        a, b, c = "a" * 64, "b" * 64, "c" * 64
+        self._publish(a, size=600)
+        self._publish(b, size=600)
+        self.assertEqual(self.cache.evict(), 0)
+
+        self.cache.touch(a, at=time.time() - 120)
+        self.cache.touch(b, at=time.time() - 120)
+        with self.cache.pin(a):
+            self.assertEqual(self.cache.evict(), 1)
+            self.assertTrue(self.cache.entry_dir(a).exists())
+            self.assertFalse(self.cache.entry_dir(b).exists())
+        self._publish(c, size=600)
+        self.cache.touch(a, at=time.time() - 120)
+        self.cache.evict()
+        self.assertFalse(self.cache.entry_dir(a).exists())
+        self.assertTrue(self.cache.entry_dir(c).exists())
+
+    def test_index_survives_restart(self):
+        key = "d" * 64
+        self._publish(key, size=100)
+        self.cache.touch(key, at=time.time() - 50)
+        self.cache.evict()
+        reopened = ArtifactCache(self.tmp / "build", max_bytes=1024, max_age=3600)
+        self.assertEqual(reopened.stats()["bytes"], 100)
+        self.assertIsNotNone(reopened.lookup(key))
+        self.assertAlmostEqual(reopened.entry_dir(key).stat().st_mtime, time.time() - 50, delta=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
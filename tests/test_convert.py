@@ -0,0 +1,53 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from latexrender.compiler import compile_command
+from latexrender.convert import convert_markdown
+from latexrender.renderer import get_markdown_parser
+from latexrender.utils import escape_latex
+
+
+class TestConvertMarkdown(unittest.TestCase):
+
+    def test_escape_latex(self):
+        self.assertEqual(escape_latex(r"50% of $x_1 & {y}"), r"50\% of \$x\_1 \& \{y\}")
+        self.assertEqual(escape_latex("a\\b~c^d#"),
+                         r"a\textbackslash{}b\textasciitilde{}c\textasciicircum{}d\#")
+
+    def test_string_in_string_out(self):
+        tex = convert_markdown("---\ntitle: Notes\n---\n\n# Intro\n\n$x^2$", template="matnoble")
+        self.assertIn(r"\documentclass{matnoble}", tex)
+        self.assertIn(r"\title{Notes}", tex)
+        self.assertIn(r"\section{Intro}", tex)
+        self.assertIn(r"\( x^2 \)", tex)
+
+    def test_teaching_fields_go_to_preamble(self):
+        tex = convert_markdown("---\ncourse: 高等数学\n---\n\nbody", template="matnoble-teaching")
+        self.assertIn(r"\course{高等数学}", tex)
+        self.assertIn(r"\maketitle", tex)
+
+    def test_draft_mode(self):
+        final = convert_markdown("# Intro\n\n![a](doc/a.png)")
+        draft = convert_markdown("# Intro\n\n![a](doc/a.png)", mode="draft")
+        self.assertIn(r"\tableofcontents", final)
+        self.assertNotIn(r"\tableofcontents", draft)
+        self.assertNotIn(r"\setkeys{Gin}{draft}", final)
+        # Set after the preamble so a precompiled format does not swallow it
+        tex = convert_markdown("body", fmt=True, mode="draft")
+        self.assertLess(tex.index(r"\endofdump"), tex.index(r"\setkeys{Gin}{draft}"))
+
+        self.assertEqual(compile_command("d.tex", mode="draft")[0], "xelatex")
+        self.assertEqual(compile_command("d.tex")[0], "latexmk")
+        with self.assertRaises(ValueError):
+            compile_command("d.tex", mode="fast")
+
+    def test_shared_parser_is_thread_safe(self):
+        self.assertIs(get_markdown_parser(), get_markdown_parser())
+        docs = [f"# Doc {i}\n\n| a | b |\n|---|---|\n| {i} | $x_{i}$ |\n\n- item {i}" for i in range(50)]
+        expected = [convert_markdown(d) for d in docs]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            self.assertEqual(list(pool.map(convert_markdown, docs)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
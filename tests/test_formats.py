@@ -0,0 +1,120 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from latexrender.compiler import CompileTimeout
+from latexrender.formats import FormatCache
+from latexrender.main import LaTeXRenderer
+
+DOC_DIR = Path(__file__).resolve().parent.parent / "doc"
+
+# Stand-in for `xelatex -ini`: writes <jobname>.fmt, or fails if FAIL is in the class
+FAKE_ENGINE = """#!/bin/sh
+[ "$1" = "--version" ] && { echo "XeTeX 3.14 (TeX Live $(cat "$(dirname "$0")/version"))"; exit 0; }
+for a in "$@"; do
+  case "$a" in -jobname=*) name="${a#-jobname=}";; esac
+done
+grep -q FAIL *.cls && exit 1
+echo dumped > "$name.fmt"
+"""
+
+# latexmk that refuses any -fmt format, like TeX after an upgrade, and otherwise succeeds
+STALE_FORMAT_LATEXMK = """#!/bin/sh
+for a in "$@"; do
+  case "$a" in *-fmt*) echo "---! x.fmt was written by xetex"; echo "(Fatal format file error; I'm stymied)"; exit 1;; esac
+  last="$a"
+done
+grep -q endofdump "$last" && exit 1
+printf '%%PDF-1.4' > "${last%.tex}.pdf"
+"""
+
+
+@unittest.skipUnless(os.name == "posix", "fake engine is a shell script")
+class TestFormatCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.doc = self.tmp / "doc"
+        self.doc.mkdir()
+        (self.doc / "matnoble.cls").write_text("% v1")
+        (self.tmp / "version").write_text("2023")
+        engine = self.tmp / "fake-xelatex"
+        engine.write_text(FAKE_ENGINE)
+        engine.chmod(engine.stat().st_mode | stat.S_IEXEC)
+        self.formats = FormatCache(self.tmp / "fmt", engine=str(engine))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_builds_once_and_rebuilds_when_cls_changes(self):
+        first = self.formats.get("matnoble", self.doc)
+        self.assertTrue(first.exists())
+        self.assertEqual(self.formats.get("matnoble", self.doc), first)
+
+        (self.doc / "matnoble.cls").write_text("% v2")
+        second = self.formats.get("matnoble", self.doc)
+        self.assertNotEqual(first, second)
+        self.assertFalse(first.exists())
+
+    def test_failed_dump_falls_back(self):
+        (self.doc / "matnoble.cls").write_text("% FAIL")
+        self.assertIsNone(self.formats.get("matnoble", self.doc))
+        self.assertEqual(len(list((self.tmp / "fmt").glob("*.failed"))), 1)
+
+    def test_classes_with_native_fonts_are_not_dumped(self):
+        for name in ("matnoble", "matnoble-teaching"):
+            shutil.copy(DOC_DIR / f"{name}.cls", self.doc / f"{name}.cls")
+            with mock.patch("latexrender.formats.run_latexmk") as run:
+                self.assertIsNone(self.formats.get(name, self.doc))
+            run.assert_not_called()
+        # Fonts set up in the settings' preamble come after the dump point
+        (self.doc / "plain.cls").write_text("\\LoadClass{article}\n% \\RequirePackage{xeCJK} in plain.yml\n")
+        self.assertIsNotNone(self.formats.get("plain", self.doc))
+
+    def test_engine_upgrade_gives_a_new_format(self):
+        first = self.formats.get("matnoble", self.doc)
+        (self.tmp / "version").write_text("2024")
+        upgraded = FormatCache(self.tmp / "fmt", engine=self.formats.engine)
+        self.assertNotEqual(upgraded.get("matnoble", self.doc).name, first.name)
+
+    def test_transient_failures_are_retried(self):
+        broken = FormatCache(self.tmp / "fmt", engine=str(self.tmp / "missing-xelatex"))
+        self.assertIsNone(broken.get("matnoble", self.doc))
+        self.assertEqual(list((self.tmp / "fmt").glob("*.failed")), [])
+        with mock.patch("latexrender.formats.run_latexmk", side_effect=CompileTimeout("slow")):
+            self.assertIsNone(self.formats.get("matnoble", self.doc))
+        self.assertIsNotNone(self.formats.get("matnoble", self.doc))
+
+    def test_rejected_format_is_dropped_and_compile_retried(self):
+        fmt = self.formats.get("matnoble", self.doc)
+        bin_dir = self.tmp / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "latexmk").write_text(STALE_FORMAT_LATEXMK)
+        (bin_dir / "latexmk").chmod(0o755)
+        md = self.tmp / "note.md"
+        md.write_text("# Hi")
+        renderer = LaTeXRenderer(str(md), str(self.tmp / "out" / "note.tex"), fmt=fmt)
+        self.assertTrue(renderer.render())
+        with mock.patch.dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}"):
+            self.assertTrue(renderer.compile(clean=False))
+        self.assertFalse(fmt.exists())
+        self.assertIsNone(renderer.fmt)
+        self.assertTrue((self.tmp / "out" / "note.pdf").exists())
+
+    def test_renderer_marks_end_of_preamble_only_with_format(self):
+        fmt = self.formats.get("matnoble", self.doc)
+        md = self.tmp / "note.md"
+        md.write_text("# Hi")
+        for use_fmt, expected in ((fmt, True), (None, False)):
+            renderer = LaTeXRenderer(str(md), str(self.tmp / "out" / "note.tex"), fmt=use_fmt)
+            self.assertTrue(renderer.render())
+            tex = renderer.output_path.read_text(encoding="utf-8")
+            self.assertEqual("\\endofdump" in tex, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from latexrender.images import ImageOptimizer
+from latexrender.main import LaTeXRenderer
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+@unittest.skipUnless(Image is not None, "Pillow is not installed")
+class TestImageOptimizer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.doc = self.tmp / "doc"
+        self.doc.mkdir()
+        self.optimizer = ImageOptimizer(self.tmp / "images", dpi=100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _photo(self, name, size, mode="RGB"):
+        path = self.doc / name
+        img = Image.effect_noise(size, 64).convert(mode)
+        if name.endswith(".jpg"):
+            img.save(path, quality=98)
+        else:
+            img.save(path)
+        return path
+
+    def test_large_image_is_downsampled_and_cached(self):
+        src = self._photo("big.jpg", (3000, 1500))
+        out = self.optimizer.process(src)
+        self.assertNotEqual(out, src)
+        self.assertEqual(out.suffix, ".jpg")
+        with Image.open(out) as img:
+            self.assertEqual(img.width, self.optimizer.max_width)
+            self.assertEqual(img.height, round(1500 * self.optimizer.max_width / 3000))
+        self.assertLess(out.stat().st_size, src.stat().st_size)
+
+        self.assertEqual(self.optimizer.process(src), out)
+        stats = self.optimizer.stats()
+        self.assertEqual((stats["processed"], stats["reused"]), (2, 1))
+        self.assertGreater(stats["bytes_saved"], 0)
+
+    def test_cmyk_is_normalized(self):
+        src = self._photo("print.jpg", (2000, 1000), mode="CMYK")
+        with Image.open(self.optimizer.process(src)) as img:
+            self.assertEqual(img.mode, "RGB")
+
+    def test_original_kept_when_not_smaller(self):
+        src = self.doc / "tiny.png"
+        Image.new("L", (4, 4)).save(src)
+        self.assertEqual(self.optimizer.process(src), src)
+
+    def test_non_raster_passes_through(self):
+        src = self.doc / "figure.pdf"
+        src.write_bytes(b"%PDF-1.5")
+        self.assertEqual(self.optimizer.process(src), src)
+
+    def test_renderer_places_optimized_copy(self):
+        src = self._photo("big.png", (2500, 800))
+        out = self.tmp / "job"
+        renderer = LaTeXRenderer("in.md", str(out / "document.tex"), images=self.optimizer)
+        self.assertTrue(renderer.render(source="![a](doc/big.png)"))
+        renderer._copy_resources(self.doc)
+        with Image.open(out / "doc" / "big.png") as img:
+            self.assertEqual(img.width, self.optimizer.max_width)
+        self.assertGreater(renderer.image_bytes_saved, 0)
+        # The source image is never modified
+        with Image.open(src) as img:
+            self.assertEqual(img.width, 2500)
+
+
+if __name__ == "__main__":
+    unittest.main()
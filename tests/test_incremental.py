@@ -0,0 +1,36 @@
+import unittest
+from pathlib import Path
+
+import frontmatter
+
+from latexrender.incremental import BlockCache, IncrementalConverter, split_blocks
+from latexrender.renderer import get_markdown_parser
+
+EXAMPLE = Path(__file__).parent.parent / "example.md"
+
+
+class TestIncrementalConversion(unittest.TestCase):
+
+    def test_blocks_cover_the_source(self):
+        body = "# A\n\npara\n\n```\ncode\n\nstill code\n```\n\n$$\nx\n\ny\n$$\n\n1. one\n\n2. two\n"
+        blocks = split_blocks(body)
+        self.assertEqual("".join(blocks), body)
+        self.assertEqual(len(blocks), 5)
+        self.assertTrue(blocks[2].startswith("```") and "still code" in blocks[2])
+
+    def test_matches_full_conversion(self):
+        body = frontmatter.loads(EXAMPLE.read_text(encoding="utf-8")).content
+        self.assertEqual(IncrementalConverter().convert(body).tex, get_markdown_parser()(body))
+
+    def test_only_changed_blocks_are_rendered(self):
+        converter = IncrementalConverter(BlockCache())
+        first = converter.convert("# Title\n\nfirst\n\nsecond\n")
+        self.assertEqual((first.changed, first.rendered), ([0, 1, 2], 3))
+
+        second = converter.convert("# Title\n\nfirst edited\n\nsecond\n")
+        self.assertEqual((second.changed, second.rendered), ([1], 1))
+        self.assertIn("first edited", second.tex)
+
+
+if __name__ == '__main__':
+    unittest.main()
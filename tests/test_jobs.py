@@ -0,0 +1,149 @@
+import sys
+import threading
+import time
+import unittest
+
+from latexrender.compiler import CompileCancelled, CompileTimeout, run_latexmk
+from latexrender.jobs import JobQueue, QueueFull
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def test_runs_jobs_and_records_results(self):
+        jobs = JobQueue(lambda job: job.payload * 2, workers=2, max_pending=4)
+        job = jobs.submit(21)
+        self.assertEqual(job.future.result(timeout=5), 42)
+        self.assertEqual(jobs.get(job.id).status, "done")
+
+    def test_handler_exception_marks_job_failed(self):
+        def handler(job):
+            raise RuntimeError("boom")
+
+        job = JobQueue(handler, workers=1).submit(None)
+        with self.assertRaises(RuntimeError):
+            job.future.result(timeout=5)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "boom")
+
+    def test_rejects_work_when_queue_is_full(self):
+        release = threading.Event()
+        jobs = JobQueue(lambda job: release.wait(5), workers=1, max_pending=1)
+        first = jobs.submit(1)
+        while first.status != "running":
+            time.sleep(0.01)
+        jobs.submit(2)
+        with self.assertRaises(QueueFull) as ctx:
+            jobs.submit(3)
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+        release.set()
+
+    def test_cancelled_job_is_skipped_when_dequeued(self):
+        release = threading.Event()
+        jobs = JobQueue(lambda job: release.wait(5), workers=1, max_pending=2)
+        jobs.submit(1)
+        queued = jobs.submit(2)
+        jobs.cancel(queued.id)
+        release.set()
+        self.assertIsNone(queued.future.result(timeout=5))
+        self.assertEqual(queued.status, "cancelled")
+
+    def test_identical_submissions_share_one_run(self):
+        release = threading.Event()
+        runs = []
+
+        def handler(job):
+            runs.append(job.payload)
+            release.wait(5)
+            return job.payload
+
+        jobs = JobQueue(handler, workers=2)
+        first = jobs.submit("a", dedupe_key="k", supersede_key="tab1")
+        second = jobs.submit("a", dedupe_key="k", supersede_key="tab2")
+        self.assertIs(first, second)
+        release.set()
+        self.assertEqual(first.future.result(timeout=5), "a")
+        # Once finished, the same key starts a fresh run
+        self.assertIsNot(jobs.submit("a", dedupe_key="k"), first)
+        self.assertEqual(jobs.stats()["coalesced"], 1)
+
+    def test_newer_submission_cancels_older_one(self):
+        def handler(job):
+            job.cancel_event.wait(5)
+            return "killed" if job.cancel_event.is_set() else "done"
+
+        jobs = JobQueue(handler, workers=2)
+        old = jobs.submit(1, dedupe_key="v1", supersede_key="tab1")
+        while old.status != "running":
+            time.sleep(0.01)
+        new = jobs.submit(2, dedupe_key="v2", supersede_key="tab1")
+        self.assertEqual(old.future.result(timeout=5), "killed")
+        self.assertEqual((old.status, old.superseded_by), ("cancelled", new.id))
+        self.assertFalse(new.cancel_event.is_set())
+        new.cancel()
+
+    def test_shared_job_survives_until_all_sessions_move_on(self):
+        release = threading.Event()
+        jobs = JobQueue(lambda job: release.wait(5), workers=1)
+        shared = jobs.submit(1, dedupe_key="v1", supersede_key="tab1")
+        jobs.submit(1, dedupe_key="v1", supersede_key="tab2")
+        jobs.submit(2, dedupe_key="v2", supersede_key="tab1")
+        self.assertFalse(shared.cancel_event.is_set())
+        jobs.submit(3, dedupe_key="v3", supersede_key="tab2")
+        self.assertTrue(shared.cancel_event.is_set())
+        self.assertEqual(jobs.stats()["superseded"], 1)
+        release.set()
+
+    def test_finished_result_supersedes_running_compile(self):
+        jobs = JobQueue(lambda job: job.cancel_event.wait(5), workers=1)
+        old = jobs.submit(1, dedupe_key="v1", supersede_key="tab1")
+        cached = jobs.add_finished(2, "from cache", supersede_key="tab1")
+        self.assertTrue(old.cancel_event.is_set())
+        self.assertEqual(old.superseded_by, cached.id)
+        # A later submission does not try to supersede the finished one
+        self.assertFalse(jobs.submit(3, supersede_key="tab1").cancel_event.is_set())
+
+    def test_cancel_only_withdraws_the_callers_interest(self):
+        jobs = JobQueue(lambda job: job.cancel_event.wait(5), workers=1)
+        shared = jobs.submit(1, dedupe_key="v1", supersede_key="tab1")
+        jobs.submit(1, dedupe_key="v1", supersede_key="tab2")
+        jobs.cancel(shared.id, owner="tab1")
+        self.assertFalse(shared.cancel_event.is_set())
+        jobs.cancel(shared.id, owner="tab2")
+        self.assertTrue(shared.cancel_event.is_set())
+
+        # Without an owner, a cancel stands for the only submitter
+        solo = jobs.submit(2, supersede_key="tab3")
+        jobs.cancel(solo.id)
+        self.assertTrue(solo.cancel_event.is_set())
+
+
+class TestRunLatexmk(unittest.TestCase):
+
+    def test_captures_merged_output(self):
+        cmd = [sys.executable, "-c", "import sys; print('out'); print('err', file=sys.stderr)"]
+        result = run_latexmk(cmd, cwd=".")
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("out", result.stdout)
+        self.assertIn("err", result.stdout)
+
+    def test_streams_lines_while_running(self):
+        seen = []
+        script = "import time\nfor i in range(3):\n    print(i, flush=True)\n    time.sleep(0.05)"
+        run_latexmk([sys.executable, "-c", script], cwd=".", on_line=seen.append)
+        self.assertEqual(seen, ["0", "1", "2"])
+
+    def test_cancel_kills_process(self):
+        cancel = threading.Event()
+        threading.Timer(0.3, cancel.set).start()
+        with self.assertRaises(CompileCancelled):
+            run_latexmk([sys.executable, "-c", "import time; time.sleep(30)"], cwd=".", cancel=cancel)
+
+    def test_kills_runaway_process(self):
+        start = time.time()
+        with self.assertRaises(CompileTimeout):
+            run_latexmk([sys.executable, "-c", "import time; time.sleep(30)"], cwd=".", timeout=0.5)
+        self.assertLess(time.time() - start, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
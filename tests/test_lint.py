@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from latexrender.lint import check_formula, lint_markdown, parse_tex_log
+from latexrender.main import LaTeXRenderer
+
+DOC = "---\ntitle: T\n---\n\n# One\n\nSome $x^2$ text.\n\n$$\n\\frac{a}{b\n$$\n"
+
+
+class TestMathLint(unittest.TestCase):
+
+    def test_location_after_frontmatter(self):
+        errors = lint_markdown(DOC)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].message, "Unclosed brace '{'")
+        self.assertEqual((errors[0].line, errors[0].column), (10, 9))
+
+    def test_valid_math_passes(self):
+        text = ("Inline $\\{a\\} + 50\\%$ and\n\n$$\n\\begin{aligned} a &= b \\\\ c &= d \\end{aligned}\n$$\n"
+                "\n$\\left( x \\right)$\n")
+        self.assertEqual(lint_markdown(text), [])
+
+    def test_code_is_ignored(self):
+        text = "Use `$a_{$` in code.\n\n```\n$\\frac{$\n```\n"
+        self.assertEqual(lint_markdown(text), [])
+
+    def test_dollars_outside_math_are_ignored(self):
+        # Only what the parser turns into math is checked, so these documents still build
+        for text in ["Shell:\n\n    echo $HOME # note $PATH\n",
+                     "See [x](http://a.com/$a#b$).\n",
+                     "See <http://x.com/$a#b$>.\n",
+                     "Intro\n\n<div>\n$a#b$ costs $5 # each$\n</div>\n"]:
+            self.assertEqual(lint_markdown(text), [], text)
+
+    def test_location_after_skipped_dollars(self):
+        text = "Run\n\n    echo $x{ # $\n\n[x](http://a.com/$x{$) and $x{$\n"
+        errors = lint_markdown(text)
+        self.assertEqual([(e.line, e.column) for e in errors], [(5, 30)])
+
+    def test_common_errors(self):
+        messages = [m for _, m in check_formula("a & b # c^", display=False)]
+        self.assertEqual(len(messages), 3)
+        self.assertIn("'^' is missing its argument", messages)
+        self.assertTrue(check_formula("\\begin{matrix} a \\end{pmatrix}", display=True))
+        self.assertTrue(check_formula("\\left( a", display=True))
+
+
+class TestTexErrorMapping(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_parse_log(self):
+        log = ("(./document.tex\n! Undefined control sequence.\n<recently read> \\foo\n"
+               "l.42 $\\foo\n                 $\n"
+               "./appendix.tex:7: Missing $ inserted.\n<inserted text>\nl.7 x_\n")
+        self.assertEqual(parse_tex_log(log), [
+            (None, 42, "Undefined control sequence.", "$\\foo"),
+            ("appendix.tex", 7, "Missing $ inserted.", "x_"),
+        ])
+
+    def test_errors_map_to_markdown_lines(self):
+        source = "---\ntitle: T\n---\n\nFirst paragraph.\n\nSecond $\\foo$ paragraph.\n"
+        renderer = LaTeXRenderer("in.md", str(self.tmp / "document.tex"))
+        self.assertTrue(renderer.render(source=source))
+        tex_lines = (self.tmp / "document.tex").read_text(encoding="utf-8").splitlines()
+        line = next(i for i, text in enumerate(tex_lines, 1) if "\\foo" in text)
+        errors = renderer.tex_errors(f"./document.tex:{line}: Undefined control sequence.\nl.{line} Second $\\foo\n")
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].line, 7)
+        self.assertEqual(errors[0].source, "tex")
+        # Errors in the preamble have no Markdown line
+        self.assertIsNone(renderer.tex_errors("./document.tex:1: Oops.\n")[0].line)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import os
 from latexrender.main import convert_md_to_tex
+from latexrender.mathspans import iter_math
 from latexrender.renderer import get_markdown_parser # To access the regex patterns for comparison if needed
 
 # Define a temporary directory for test files
@@ -78,6 +79,22 @@ class TestMathRendering(unittest.TestCase):
         tex_output = self._run_conversion_and_read_output(md_content, "spaced_math")
         self.assertIn(expected_inline, tex_output)
 
+    def test_escaped_dollar_does_not_close_math(self):
+        parser = get_markdown_parser()
+        self.assertEqual(parser(r"$a \$ b$"), "\\( a \\$ b \\)\n\n")
+        self.assertEqual(parser(r"$$x \$$ y$$"), "\\[x \\$$ y\\]\n\n\n")
+        # "\\" is a TeX line break, so the dollar after it still closes
+        self.assertEqual(parser(r"$a\\$ b"), "\\( a\\\\ \\) b\n\n")
+        self.assertEqual(parser(r"price \$5"), "price \\$5\n\n")
+
+    def test_unclosed_openers_stay_text(self):
+        parser = get_markdown_parser()
+        self.assertEqual(parser("$$ a $b$"), "\\$\\(  a  \\)b\\$\n\n")
+        self.assertEqual(parser("$" * 7), "\\[$\\]\n\\$\\$\n\n")
+        # The lint walks spans with the same rules as the parser
+        self.assertEqual(list(iter_math("$$ a $b$")), [(2, 5, False)])
+        self.assertEqual(list(iter_math("$$a$$ $b\\$c$")), [(2, 3, True), (7, 11, False)])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
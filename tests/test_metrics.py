@@ -0,0 +1,70 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from latexrender.main import LaTeXRenderer
+from latexrender.metrics import Counter, CounterFunc, Gauge, Histogram, Registry, StageTimer, TexPasses
+
+
+class TestTimings(unittest.TestCase):
+
+    def test_stage_timer_accumulates_in_order(self):
+        timer = StageTimer()
+        with timer.stage("convert"):
+            pass
+        with timer.stage("template"):
+            pass
+        timer.add("convert", 1.0)
+        self.assertEqual(list(timer.stages), ["convert", "template"])
+        self.assertGreaterEqual(timer.stages["convert"], 1.0)
+
+    def test_tex_passes_counts_engine_banners(self):
+        seen = []
+        passes = TexPasses(seen.append)
+        for line in ["Rc files read:", "This is XeTeX, Version 3.141592653", "Output written",
+                     "Run number 2 of rule 'pdflatex'", "This is XeTeX, Version 3.141592653"]:
+            passes(line)
+        self.assertEqual(passes.count, 2)
+        passes.finish()
+        self.assertEqual(len(passes.durations), 2)
+        self.assertEqual(len(seen), 5)
+
+    def test_renderer_records_conversion_stages(self):
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            renderer = LaTeXRenderer("in.md", str(tmp / "out.tex"))
+            self.assertTrue(renderer.render(source="---\ntitle: T\n---\n# Hi\n\n$x$"))
+            self.assertEqual(list(renderer.timings.stages),
+                             ["frontmatter", "scan", "convert", "template", "write"])
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+class TestPrometheusExposition(unittest.TestCase):
+
+    def test_render(self):
+        registry = Registry()
+        hist = registry.register(Histogram("lxr_t_seconds", "help", ["stage"], buckets=(0.1, 1)))
+        counter = registry.register(Counter("lxr_t_total", "help", ["status"]))
+        registry.register(Gauge("lxr_t_depth", "help", lambda: 3))
+        registry.register(CounterFunc("lxr_t_hits_total", "help", lambda: 7))
+        hist.observe(0.05, "convert")
+        hist.observe(0.1, "convert")
+        hist.observe(5, "convert")
+        counter.inc("ok")
+        counter.inc("ok")
+
+        text = registry.render()
+        self.assertIn('lxr_t_seconds_bucket{stage="convert",le="0.1"} 2', text)
+        self.assertIn('lxr_t_seconds_bucket{stage="convert",le="1.0"} 2', text)
+        self.assertIn('lxr_t_seconds_bucket{stage="convert",le="+Inf"} 3', text)
+        self.assertIn('lxr_t_seconds_count{stage="convert"} 3', text)
+        self.assertIn('lxr_t_total{status="ok"} 2', text)
+        self.assertIn("# TYPE lxr_t_depth gauge\nlxr_t_depth 3", text)
+        # Totals kept elsewhere are still counters, so rate() handles restarts
+        self.assertIn("# TYPE lxr_t_hits_total counter\nlxr_t_hits_total 7", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
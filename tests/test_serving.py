@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from latexrender.cache import ArtifactCache
+from latexrender.serving import RangeNotSatisfiable, etag_matches, iter_file, parse_range, strong_etag
+
+
+class TestConditionalRequests(unittest.TestCase):
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range("bytes=900-", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=990-5000", 1000), (990, 999))
+        self.assertEqual(parse_range("bytes=-5000", 1000), (0, 999))
+        # Whole file for a missing header, other units, multiple or malformed ranges
+        for header in (None, "items=0-1", "bytes=0-1,5-6", "bytes=a-b"):
+            self.assertIsNone(parse_range(header, 1000))
+        for header in ("bytes=1000-", "bytes=5-1", "bytes=-0"):
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, 1000)
+
+    def test_etag_matching(self):
+        etag = strong_etag("abc")
+        self.assertTrue(etag_matches('"abc"', etag))
+        self.assertTrue(etag_matches('"x", W/"abc"', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"abcd"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+class TestArtifactDigests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.work = self.tmp / "work"
+        self.work.mkdir()
+        self.cache = ArtifactCache(self.tmp / "build")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_digest_follows_content(self):
+        key = "k" * 64
+        (self.work / "document.pdf").write_bytes(b"%PDF v1")
+        self.cache.publish(key, self.work, ["document.pdf"])
+        path, first = self.cache.artifact(key, "document.pdf")
+        self.assertEqual(b"".join(iter_file(path, 1, 3)), b"PDF")
+
+        (self.work / "document.pdf").write_bytes(b"%PDF v2")
+        self.cache.publish(key, self.work, ["document.pdf"])
+        self.assertNotEqual(self.cache.artifact(key, "document.pdf")[1], first)
+        self.assertIsNone(self.cache.artifact(key, "document.tex"))
+
+        # Entries found on disk at startup are hashed on first use
+        reopened = ArtifactCache(self.tmp / "build")
+        self.assertEqual(reopened.artifact(key, "document.pdf"), self.cache.artifact(key, "document.pdf"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from latexrender.incremental import iter_blocks, split_blocks
+from latexrender.main import LaTeXRenderer
+from latexrender.streaming import lint_file
+
+DOC = """---
+title: Streaming
+author: Me
+---
+
+  # Intro
+
+Text with $x^2$ and a [reference][ref] and ![fig](images/a.png).
+
+```python
+x = 1
+
+y = 2
+```
+
+$$
+a = b
+
+c = d
+$$
+
+- one
+- two
+
+  continued
+
+> quote
+
+[ref]: https://example.com
+"""
+
+
+class TestStreamingRender(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        (self.tmp / "in.md").write_text(DOC, encoding="utf-8")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _render(self, name, **kwargs):
+        renderer = LaTeXRenderer(str(self.tmp / "in.md"), str(self.tmp / name), **kwargs)
+        self.assertTrue(renderer.render())
+        return renderer, (self.tmp / name).read_text(encoding="utf-8")
+
+    def test_iter_blocks_matches_split_blocks(self):
+        body = DOC.split("---\n", 2)[2].replace("[ref]: https://example.com\n", "")
+        self.assertEqual(list(iter_blocks(body.splitlines(keepends=True))), split_blocks(body))
+
+    def test_output_matches_in_memory_render(self):
+        full, expected = self._render("full.tex")
+        stream, streamed = self._render("stream.tex", streaming=True)
+        self.assertEqual(streamed, expected)
+        self.assertIn("\\href{https://example.com}", streamed)
+        self.assertEqual(stream.image_urls, full.image_urls)
+        self.assertEqual(list(self.tmp.glob(".*.part")), [])
+
+    def test_errors_map_to_markdown_lines(self):
+        renderer, tex = self._render("stream.tex", streaming=True)
+        line = next(i for i, text in enumerate(tex.splitlines(), 1) if "\\item one" in text)
+        errors = renderer.tex_errors(f"./stream.tex:{line}: Something.\n")
+        self.assertEqual(errors[0].line, 22)
+
+    def test_lint_file(self):
+        (self.tmp / "bad.md").write_text(DOC.replace("$x^2$", "$x^{2$"), encoding="utf-8")
+        errors = lint_file(self.tmp / "bad.md")
+        self.assertEqual([(e.line, e.column) for e in errors], [(8, 14)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from latexrender.cache import ArtifactCache
+from latexrender.convert import convert_markdown
+from latexrender.templates import TemplateRegistry
+
+
+class TestTemplateRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        (self.tmp / "plain.cls").write_text(r"\LoadClass{article}")
+        self.registry = TemplateRegistry(self.tmp, check_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _touch(self, path: Path, text: str):
+        # Same-second rewrites must still look changed
+        path.write_text(text)
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    def test_settings_drive_header_and_preamble(self):
+        (self.tmp / "plain.yml").write_text("header: maketitle\nfields:\n  course: course\n"
+                                            "preamble: \\usepackage{xcolor}\n")
+        tex = convert_markdown("---\ncourse: 线性代数\n---\n\nbody", self.registry.get("plain"))
+        self.assertIn(r"\documentclass{plain}", tex)
+        self.assertIn("\\usepackage{xcolor}\n\\course{线性代数}", tex)
+        self.assertIn(r"\maketitle", tex)
+        self.assertNotIn("tcolorbox", tex)
+
+    def test_hot_reload(self):
+        self.assertEqual(self.registry.names(), ["plain"])
+        digest = self.registry.get("plain").digest
+
+        self._touch(self.tmp / "plain.cls", r"\LoadClass{report}")
+        self.assertNotEqual(self.registry.get("plain").digest, digest)
+        self.assertEqual(self.registry.reloads, 1)
+
+        (self.tmp / "other.cls").write_text("")
+        (self.tmp / "plain.cls").unlink()
+        self.assertEqual(self.registry.names(), ["other"])
+
+    def test_custom_layout_is_watched(self):
+        (self.tmp / "plain.yml").write_text("layout: plain-layout.tex\n")
+        (self.tmp / "plain-layout.tex").write_text("%(doc_class)s|%(content)s")
+        self.assertEqual(convert_markdown("hi", self.registry.get("plain")), "plain|hi\n\n")
+
+        self._touch(self.tmp / "plain-layout.tex", "[%(content)s]")
+        self.assertEqual(convert_markdown("hi", self.registry.get("plain")), "[hi\n\n]")
+
+    def test_broken_settings_keep_last_good_version(self):
+        (self.tmp / "plain.yml").write_text("header: maketitle\n")
+        self.assertEqual(self.registry.get("plain").header({}), r"\maketitle")
+        self._touch(self.tmp / "plain.yml", "header: [unclosed\n")
+        self.assertEqual(self.registry.get("plain").header({}), r"\maketitle")
+
+    def test_digest_replaces_cls_in_cache_key(self):
+        spec = self.registry.get("plain")
+        key = ArtifactCache.compute_key("x", "plain", self.tmp, template_digest=spec.digest)
+        self.assertNotEqual(key, ArtifactCache.compute_key("x", "plain", self.tmp))
+        self.assertEqual(key, ArtifactCache.compute_key("x", "plain", None, template_digest=spec.digest))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import threading
+import unittest
+
+from latexrender.warmup import Warmup
+
+
+class TestWarmup(unittest.TestCase):
+
+    def test_ready_only_after_all_steps(self):
+        release = threading.Event()
+        order = []
+
+        def slow():
+            release.wait(5)
+            order.append("slow")
+            return True
+
+        warmup = Warmup([("fonts", slow), ("template:a", lambda: order.append("a") or True)])
+        self.assertEqual(warmup.to_dict()["status"], "pending")
+        warmup.start()
+        self.assertFalse(warmup.wait(0.1))
+        state = warmup.to_dict()
+        self.assertEqual((state["status"], state["remaining"]), ("warming", 2))
+
+        release.set()
+        self.assertTrue(warmup.wait(5))
+        self.assertEqual(order, ["slow", "a"])
+        self.assertEqual(warmup.to_dict()["status"], "ready")
+
+    def test_failed_steps_are_reported_not_fatal(self):
+        def broken():
+            raise OSError("no xelatex")
+
+        warmup = Warmup([("template:a", broken), ("template:b", lambda: False), ("fonts", lambda: True)])
+        warmup.run()
+        self.assertTrue(warmup.ready)
+        steps = warmup.to_dict()["steps"]
+        self.assertEqual([s["ok"] for s in steps], [False, False, True])
+        self.assertEqual(steps[0]["error"], "no xelatex")
+
+    def test_no_steps_is_ready_at_once(self):
+        warmup = Warmup([])
+        warmup.start().join()
+        self.assertTrue(warmup.ready)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from latexrender.incremental import BlockCache, IncrementalConverter
+from latexrender.main import LaTeXRenderer
+from latexrender.watch import Watcher
+
+# Counts its runs and leaves an aux file behind, like a real latexmk
+FAKE_LATEXMK = """#!/bin/sh
+for a in "$@"; do last="$a"; done
+echo run >> runs.txt
+printf '%%PDF-1.4' > "${last%.tex}.pdf"
+echo aux > "${last%.tex}.aux"
+"""
+
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.doc = self.tmp / "doc"
+        self.doc.mkdir()
+        (self.doc / "matnoble.cls").write_text(r"\LoadClass{article}")
+        (self.doc / "fig.png").write_bytes(b"png-1")
+        self.md = self.tmp / "note.md"
+        self.md.write_text("# Intro\n\n![f](doc/fig.png)\n")
+        self.renderer = LaTeXRenderer(str(self.md), str(self.tmp / "out" / "note.tex"),
+                                      converter=IncrementalConverter(BlockCache()))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _rewrite(self, path: Path, data: bytes):
+        path.write_bytes(data)
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    def test_rebuilds_only_on_content_changes(self):
+        watcher = Watcher(self.renderer, self.doc, compile=False)
+        self.assertTrue(watcher.build(force=True))
+        self.assertIn(self.doc / "fig.png", watcher.watched_paths())
+
+        # Saved without edits: seen as a change, but nothing to rebuild
+        self._rewrite(self.md, self.md.read_bytes())
+        self.assertTrue(watcher.changed())
+        self.assertIsNone(watcher.build())
+
+        self._rewrite(self.md, b"# Intro\n\nmore\n")
+        self.assertTrue(watcher.build())
+        self.assertIn("more", (self.tmp / "out" / "note.tex").read_text())
+        self.assertEqual(self.renderer.converter.last.changed, [1])
+        self.assertEqual(watcher.builds, 2)
+
+    def test_debounces_bursts_of_saves(self):
+        watcher = Watcher(self.renderer, self.doc, compile=False, debounce=0.3, poll=0.02)
+        stop = threading.Event()
+        thread = threading.Thread(target=watcher.serve, args=(stop,))
+        thread.start()
+        try:
+            time.sleep(0.1)
+            for i in range(5):
+                self._rewrite(self.md, f"# Intro\n\nedit {i}\n".encode())
+                time.sleep(0.05)
+            time.sleep(0.6)
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(watcher.builds, 2)
+        self.assertIn("edit 4", (self.tmp / "out" / "note.tex").read_text())
+
+    @unittest.skipUnless(os.name == "posix", "fake latexmk is a shell script")
+    def test_image_change_recompiles_and_keeps_intermediates(self):
+        bin_dir = self.tmp / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "latexmk").write_text(FAKE_LATEXMK)
+        (bin_dir / "latexmk").chmod(0o755)
+        out = self.tmp / "out"
+        with mock.patch.dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}"):
+            watcher = Watcher(self.renderer, self.doc, compile=True)
+            self.assertTrue(watcher.build(force=True))
+            tex_mtime = (out / "note.tex").stat().st_mtime_ns
+            self._rewrite(self.doc / "fig.png", b"png-2")
+            self.assertTrue(watcher.build())
+        self.assertEqual((out / "runs.txt").read_text().count("run"), 2)
+        self.assertTrue((out / "note.aux").exists())
+        # Only the image changed, so the .tex was not rewritten
+        self.assertEqual((out / "note.tex").stat().st_mtime_ns, tex_mtime)
+        self.assertEqual((out / "doc" / "fig.png").read_bytes(), b"png-2")
+
+
+if __name__ == "__main__":
+    unittest.main()
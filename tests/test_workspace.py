@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from latexrender import workspace
+from latexrender.compiler import remove_intermediates
+from latexrender.workspace import WorkspaceManager, scratch_root
+
+
+class TestWorkspaceManager(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.manager = WorkspaceManager(self.tmp / "sessions", idle_timeout=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_rejects_unsafe_session_ids(self):
+        for bad in ("", "../etc", "a/b", "x" * 65):
+            with self.assertRaises(ValueError):
+                WorkspaceManager.validate(bad)
+
+    def test_reuses_directory_between_builds(self):
+        with self.manager.acquire("tab1") as ws:
+            (ws.path / "document.aux").write_text("aux")
+            ws.state["seen"] = True
+        with self.manager.acquire("tab1") as ws:
+            self.assertEqual((ws.path / "document.aux").read_text(), "aux")
+            self.assertTrue(ws.state["seen"])
+
+    def test_serializes_builds_of_one_session(self):
+        order = []
+
+        def build(tag):
+            with self.manager.acquire("tab1"):
+                order.append(f"{tag}-start")
+                time.sleep(0.1)
+                order.append(f"{tag}-end")
+
+        threads = [threading.Thread(target=build, args=(i,)) for i in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(order[0][0], order[1][0])
+
+    def test_expires_idle_workspaces(self):
+        with self.manager.acquire("old") as ws:
+            path = ws.path
+        self.manager._workspaces["old"].last_used = time.time() - 120
+        self.manager.expire()
+        self.assertFalse(path.exists())
+        self.assertEqual(self.manager.stats()["workspaces"], 0)
+
+
+class TestScratch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_scratch_root_prefers_setting_then_shm(self):
+        self.assertEqual(scratch_root(str(self.tmp / "s"), self.tmp / "build"), self.tmp / "s")
+        with mock.patch.object(workspace, "SHM_DIR", self.tmp):
+            self.assertEqual(scratch_root(None, self.tmp / "build", min_free=0).parent, self.tmp)
+            # Not enough free space on tmpfs: back to the build dir
+            self.assertEqual(scratch_root(None, self.tmp / "build", min_free=1 << 60), self.tmp / "build")
+        with mock.patch.object(workspace, "SHM_DIR", self.tmp / "missing"):
+            self.assertEqual(scratch_root(None, self.tmp / "build", min_free=0), self.tmp / "build")
+
+    def test_remove_intermediates_keeps_outputs(self):
+        for name in ("document.tex", "document.pdf", "document.aux", "document.log",
+                     "document.xdv", "document.fdb_latexmk", "other.aux"):
+            (self.tmp / name).write_text("x")
+        self.assertEqual(remove_intermediates(self.tmp, "document.tex"), 4)
+        self.assertEqual(sorted(p.name for p in self.tmp.iterdir()),
+                         ["document.pdf", "document.tex", "other.aux"])
+
+
+if __name__ == '__main__':
+    unittest.main()
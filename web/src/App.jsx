@@ -33,6 +33,16 @@ const DEFAULT_MARKDOWN = [
   '```'
 ].join('\n');
 
+// 每个浏览器标签页一个会话 ID，服务器据此复用编译工作区
+const getSessionId = () => {
+  let id = sessionStorage.getItem('latex_render_session');
+  if (!id) {
+    id = Math.random().toString(36).slice(2) + Date.now().toString(36);
+    sessionStorage.setItem('latex_render_session', id);
+  }
+  return id;
+};
+
 function App() {
   const [markdown, setMarkdown] = useState(() => {
     return localStorage.getItem('latex_render_content') || DEFAULT_MARKDOWN;
@@ -51,6 +61,10 @@ function App() {
   const [isSaved, setIsSaved] = useState(true);
   
   const logEndRef = useRef(null);
+  const jobRef = useRef(null);
+  // 每次提交递增；只有最新一次提交可以更新日志和状态
+  const renderSeqRef = useRef(0);
+  const sessionIdRef = useRef(getSessionId());
 
   // 监听快捷键
   useEffect(() => {
@@ -97,53 +111,93 @@ function App() {
     fetchTemplates();
   }, []);
 
+  // 通过 SSE 实时接收编译日志，直到收到 done 事件
+  const streamJob = (jobId, isLatest) => new Promise((resolve, reject) => {
+    const source = new EventSource(`/api/jobs/${jobId}/events`);
+    source.addEventListener('log', (e) => {
+      if (isLatest()) setLogs(prev => prev + e.data + '\n');
+    });
+    source.addEventListener('done', (e) => {
+      source.close();
+      resolve(JSON.parse(e.data));
+    });
+    source.onerror = () => {
+      source.close();
+      reject(new Error("日志流连接中断"));
+    };
+  });
+
+  // 编译进行中也可再次提交 (Ctrl + Enter)：服务器会终止同一会话中被取代的旧编译
   const handleRender = async () => {
-    if (loading) return;
+    const seq = ++renderSeqRef.current;
+    const isLatest = () => renderSeqRef.current === seq;
     setLoading(true);
     setLogs("Starting render process...\n");
     try {
-      const res = await fetch('/api/render', {
+      const res = await fetch('/api/jobs', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           content: markdown,
           template: selectedTemplate,
-          compile: true
+          compile: true,
+          session_id: sessionIdRef.current
         })
       });
-      
-      const data = await res.json();
+
+      const job = await res.json();
+      if (!res.ok) {
+        const retry = res.headers.get('Retry-After');
+        throw new Error(retry ? `服务器繁忙，请 ${retry} 秒后重试` : (job.detail || "提交编译任务失败"));
+      }
+
+      if (!isLatest()) return;
+      jobRef.current = job.job_id;
+      const data = await streamJob(job.job_id, isLatest);
+      // 同一会话已提交了更新的版本，这次结果作废，不算失败
+      if (!isLatest() || data.superseded_by) return;
       if (data.logs) setLogs(data.logs);
 
-      if (!res.ok || data.success === false) {
+      if (data.success === false) {
         setIsLogExpanded(true); // 编译失败，自动展开控制台
         throw new Error(data.detail || "编译失败，请检查控制台日志");
       }
 
       if (data.pdf_url) {
-        setPdfUrl(`${data.pdf_url}?t=${new Date().getTime()}`);
+        setPdfUrl(data.pdf_url);
         setIsLogExpanded(false); // 编译成功，收起控制台保持整洁
       }
     } catch (err) {
+      if (!isLatest()) return;
       setLogs(prev => prev + `\n> Fatal Error: ${err.message}\n`);
       setIsLogExpanded(true);
     } finally {
-      setLoading(false);
+      if (isLatest()) {
+        jobRef.current = null;
+        setLoading(false);
+      }
+    }
+  };
+
+  const handleCancel = async () => {
+    if (!jobRef.current) return;
+    try {
+      await fetch(`/api/jobs/${jobRef.current}/cancel?session_id=${encodeURIComponent(sessionIdRef.current)}`, { method: 'POST' });
+    } catch (err) {
+      console.error("Failed to cancel job:", err);
     }
   };
 
   const handleCopyTex = async () => {
     try {
-      const res = await fetch('/api/render', {
+      const res = await fetch('/api/convert', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ content: markdown, template: selectedTemplate, compile: false })
+        body: JSON.stringify({ content: markdown, template: selectedTemplate })
       });
       const data = await res.json();
-      // 使用已有的静态挂载路径
-      const texRes = await fetch(`/build/${data.job_id}/document.tex`);
-      const texContent = await texRes.text();
-      await navigator.clipboard.writeText(texContent);
+      if (!data.success) throw new Error(data.detail);
+      await navigator.clipboard.writeText(data.tex);
       setCopySuccess(true);
       setTimeout(() => setCopySuccess(false), 2000);
     } catch (err) {
@@ -364,6 +418,9 @@ function App() {
                     <span className="text-[10px] text-white font-bold uppercase tracking-widest">系统控制台</span>
                  </div>
                  <div className="flex items-center gap-1">
+                    {loading && (
+                      <button onClick={(e) => { e.stopPropagation(); handleCancel(); }} className="p-1 hover:bg-white/10 rounded" title="取消编译"><X className="w-3 h-3 text-white/50" /></button>
+                    )}
                     <button onClick={(e) => { e.stopPropagation(); setLogs(""); }} className="p-1 hover:bg-white/10 rounded"><Trash2 className="w-3 h-3 text-white/50" /></button>
                     {isLogExpanded ? <Minimize2 className="w-3 h-3 text-white" /> : <Maximize2 className="w-3 h-3 text-white" />}
                  </div>